@@ -0,0 +1,153 @@
+# async_crud.py
+# crud.py의 조회 함수들을 AsyncSession으로 옮긴 파일, async 라우터(GET)에서 사용
+from __future__ import annotations
+
+from itertools import groupby
+from typing import Dict, List, Tuple
+from sqlalchemy import exists, func, select
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException
+
+import models, schemas
+from crud import QuestionType, build_vote_results, get_expire_line, valid_question_filter, visible_comment_filter, \
+    vote_results_query
+from pagination import Page, paginate
+
+
+async def get_user(db: AsyncSession, user_id: int) -> models.User:
+    db_user = await db.get(models.User, user_id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="user is not found")
+    elif db_user.is_deleted:
+        raise HTTPException(status_code=405, detail="user is deleted")
+    return db_user
+
+
+async def get_question(db: AsyncSession, question_id: int) -> models.Question | None:
+    return await db.get(models.Question, question_id)
+
+
+async def get_question_version(db: AsyncSession, question_id: int):
+    ''' ETag 비교용으로 질문 전체 대신 버전 컬럼만 조회, 없으면 None '''
+    result = await db.execute(select(models.Question.type, models.Question.expired, models.Question.created_at,
+                                     models.Question.updated_at).where(models.Question.id == question_id))
+    return result.first()
+
+
+async def get_vote_result_version(db: AsyncSession, question_id: int):
+    ''' 투표 결과 버전: 질문 type, 선택지 수, 투표수 합, 가장 최근 updated_at 을 한 번에 조회, 질문이 없으면 None '''
+    result = await db.execute(
+        select(models.Question.type, func.count(models.VoteOption.id).label("options"),
+               func.coalesce(func.sum(models.VoteOption.count), 0).label("total"),
+               func.max(models.VoteOption.updated_at).label("updated_at"))
+        .outerjoin(models.VoteOption, (models.VoteOption.question_id == models.Question.id)
+                   & (models.VoteOption.is_deleted == False))
+        .where(models.Question.id == question_id).group_by(models.Question.id, models.Question.type))
+    return result.first()
+
+
+def check_valid_question(question):
+    ''' 질문(또는 get_question_version 결과)이 링크로 열 수 있는 질문인지 확인 '''
+    if question is None:
+        raise HTTPException(status_code=404, detail="Question is not found")
+    # 만료 처리 전이라도 24시간이 지났으면 만료된 링크
+    if question.expired or question.created_at <= get_expire_line():
+        raise HTTPException(status_code=404, detail="expired Link")
+
+
+async def get_valid_questions(db: AsyncSession, question_id: int) -> models.Question:
+    question = await get_question(db=db, question_id=question_id)
+    check_valid_question(question)
+    return question
+
+
+async def get_comment(db: AsyncSession, comment_id: int) -> models.Comment | None:
+    result = await db.execute(select(models.Comment).where(models.Comment.id == comment_id)
+                              .where(models.Comment.is_deleted == False))
+    return result.scalar()
+
+
+# 목록 API(D-2, D-7, D-8)는 ORM 객체 대신 schemas.Comment 필드 순서의 컬럼만 조회해서 그대로 인코딩 (fastjson)
+comment_columns = (models.Comment.content, models.Comment.question_id, models.Comment.id, models.Comment.type,
+                   models.Comment.created_at, models.Comment.updated_at)
+
+
+async def get_comments_by_questionid(db: AsyncSession, question_id: int, page: Page | None = None) -> List[Row]:
+    stmt = select(*comment_columns).where(models.Comment.question_id == question_id).where(*visible_comment_filter())
+    comments = (await db.execute(paginate(stmt, models.Comment, page))).all()
+    return page.rows(comments) if page else comments
+
+
+async def has_valid_question(db: AsyncSession, user_id: int) -> bool:
+    result = await db.execute(select(exists().where(*valid_question_filter(user_id))))
+    return result.scalar()
+
+
+async def get_valid_comments(db: AsyncSession, user_id: int, type: str, page: Page | None = None) -> List[Row]:
+    stmt = select(*comment_columns).join(models.Question, models.Comment.question_id == models.Question.id) \
+        .where(*valid_question_filter(user_id)).where(models.Comment.type == type).where(*visible_comment_filter())
+    comments = (await db.execute(paginate(stmt, models.Comment, page))).all()
+    if page:
+        comments = page.rows(comments)
+
+    # user_id check, 유효한(삭제/만료되지 않은) 질문이 하나도 없으면 404
+    if not comments and not await has_valid_question(db, user_id):
+        raise HTTPException(status_code=404, detail="Non existent user_id")
+    return comments
+
+
+async def get_valid_votequestions_by_userid(db: AsyncSession, user_id: int) -> List[models.Question]:
+    result = await db.execute(select(models.Question).where(*valid_question_filter(user_id))
+                              .where(models.Question.type == QuestionType.vote))
+    return result.scalars().all()
+
+
+async def get_expired_questions_by_userid(db: AsyncSession, user_id: int, page: Page | None = None) -> List[Row]:
+    # D-6 응답과 cursor에 필요한 컬럼만
+    stmt = select(models.Question.id, models.Question.content, models.Question.type, models.Question.created_at) \
+        .where(models.Question.is_deleted == False) \
+        .where(models.Question.user_id == user_id).where(models.Question.expired == True)
+    questions = (await db.execute(paginate(stmt, models.Question, page))).all()
+    return page.rows(questions) if page else questions
+
+
+# question id가 일치하는 옵션 모두 리스트로 반환
+async def get_vote_options(db: AsyncSession, question_id: int) -> List[models.VoteOption]:
+    result = await db.execute(select(models.VoteOption).where(models.VoteOption.question_id == question_id)
+                              .where(models.VoteOption.is_deleted == False))
+    return result.scalars().all()
+
+
+async def get_comments_by_questionids(db: AsyncSession, question_ids: List[int]) -> Dict[int, List[Row]]:
+    ''' 여러 질문의 답변(id, content)을 한 번에 조회해서 질문별로 묶음, 질문 안에서는 get_comments_by_questionid와 같은 순서 '''
+    if not question_ids:
+        return {}
+    result = await db.execute(select(models.Comment.question_id, models.Comment.id, models.Comment.content)
+                              .where(models.Comment.question_id.in_(question_ids)).where(*visible_comment_filter())
+                              .order_by(models.Comment.question_id, models.Comment.created_at, models.Comment.id))
+    return {question_id: list(group) for question_id, group in groupby(result.all(), key=lambda row: row.question_id)}
+
+
+async def get_vote_options_by_questionids(db: AsyncSession, question_ids: List[int]) -> Dict[int, List[Row]]:
+    ''' 여러 질문의 투표 선택지(id, content, count)를 한 번에 조회해서 질문별로 묶음 '''
+    if not question_ids:
+        return {}
+    result = await db.execute(select(models.VoteOption.question_id, models.VoteOption.id, models.VoteOption.content,
+                                     models.VoteOption.count)
+                              .where(models.VoteOption.question_id.in_(question_ids))
+                              .where(models.VoteOption.is_deleted == False)
+                              .order_by(models.VoteOption.question_id, models.VoteOption.id))
+    return {question_id: list(group) for question_id, group in groupby(result.all(), key=lambda row: row.question_id)}
+
+
+async def get_vote_results(db: AsyncSession, question_id: int) -> List[Tuple[int, schemas.VoteResult]]:
+    result = await db.execute(vote_results_query(models.Question.id == question_id))
+    return build_vote_results(result.all())
+
+
+async def get_valid_vote_results_by_userid(db: AsyncSession, user_id: int) -> List[Tuple[int, schemas.VoteResult]]:
+    ''' user의 유효한 투표 질문들의 결과를 한 번에 조회 '''
+    result = await db.execute(vote_results_query(*valid_question_filter(user_id),
+                                                 models.Question.type == QuestionType.vote))
+    return build_vote_results(result.all())
@@ -0,0 +1,57 @@
+# benchmarks/async_vs_sync.py
+# 같은 조회를 sync(def + Session, 스레드풀)와 async(async def + AsyncSession)로 처리할 때 초당 요청 수 비교
+#
+# python benchmarks/async_vs_sync.py [--db-url mysql+pymysql://...] [--concurrency 200]
+
+import argparse
+
+from common import Server, run_load, seed_questions, seed_user, setup_database
+
+
+def build_app():
+    from fastapi import Depends, FastAPI
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import Session
+
+    import async_crud, crud, schemas
+    from database import get_async_db, get_db
+
+    app = FastAPI()
+
+    @app.get("/sync/{question_id}", response_model=schemas.Question)
+    def sync_question(question_id: int, db: Session = Depends(get_db)):
+        return crud.get_question(db, question_id)
+
+    @app.get("/async/{question_id}", response_model=schemas.Question)
+    async def async_question(question_id: int, db: AsyncSession = Depends(get_async_db)):
+        return await async_crud.get_question(db, question_id)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db-url")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    database = setup_database(args.db_url)
+    db = database.SessionLocal()
+    user = seed_user(db)
+    question_ids = seed_questions(db, user.id, 100, 0)
+    db.close()
+
+    with Server(build_app(), port=args.port):
+        for mode in ("sync", "async"):
+            result = run_load("127.0.0.1", args.port,
+                              lambda i: (mode, "GET", f"/{mode}/{question_ids[i % len(question_ids)]}", b"", None),
+                              args.concurrency, args.requests)
+            stats = result["endpoints"][mode]
+            print(f"{mode:>5}: {result['rps']:8.1f} req/s  p50 {stats['p50_ms']:.1f} ms  "
+                  f"p99 {stats['p99_ms']:.1f} ms  status {stats['status']}")
+
+
+if __name__ == "__main__":
+    main()
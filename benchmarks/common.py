@@ -0,0 +1,208 @@
+# benchmarks/common.py
+# 벤치마크 공통 코드: 로컬 DB 연결, 쿼리 수 측정, 데이터 생성
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+# 기본값은 임시 폴더의 sqlite, 로컬 MySQL로 재려면 --db-url로 명시 (환경의 DATABASE_URL은 쓰지 않음)
+DEFAULT_DB_URL = "sqlite:///" + os.path.join(tempfile.gettempdir(), "tikitaka_bench.sqlite3")
+
+
+def check_disposable(db_url: str):
+    ''' 테이블을 지워도 되는 DB인지 확인: 임시 폴더의 sqlite 파일이거나 DB 이름에 bench, test가 들어간 DB만 허용 '''
+    from sqlalchemy.engine import make_url
+
+    url = make_url(db_url)
+    if url.get_backend_name() == "sqlite":
+        path = os.path.realpath(url.database or "")
+        if url.database and path.startswith(os.path.realpath(tempfile.gettempdir()) + os.sep):
+            return
+    elif any(word in (url.database or "").lower() for word in ("bench", "test")):
+        return
+    sys.exit(f"refusing to drop tables in {url.render_as_string(hide_password=True)}: "
+             "use a sqlite file in the temp directory or a database named *bench* / *test*")
+
+
+def setup_database(db_url: str = None):
+    ''' 벤치마크용 DB(db_url, 없으면 임시 sqlite)를 DATABASE_URL로 지정하고 테이블을 새로 만든 뒤 database 모듈을 반환
+    운영/개발 DB를 지우지 않도록 check_disposable을 통과한 DB만 사용 '''
+    db_url = db_url or DEFAULT_DB_URL
+    check_disposable(db_url)
+    os.environ["DATABASE_URL"] = db_url
+    import database, models
+
+    models.Base.metadata.drop_all(bind=database.engine)
+    models.Base.metadata.create_all(bind=database.engine)
+    return database
+
+
+class QueryCounter:
+    ''' with 블록 안에서 실행된 SQL 문을 모두 기록 '''
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        self.executed = []  # (statement, parameters, executemany)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+        self.executed.append((statement, parameters, executemany))
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._before_cursor_execute)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+def measure(fn, repeat: int = 20) -> float:
+    ''' fn을 repeat번 실행한 시간의 중앙값(ms) '''
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def seed_user(db, insta_id: str = "bench"):
+    import models, schemas
+
+    user = models.User(schemas.UserCreate(insta_id=insta_id, username=insta_id, full_name=insta_id,
+                                          follower=0, following=0, profile_image_url=""))
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def seed_questions(db, user_id: int, n_questions: int, comments_per_question: int,
+                   stale_ratio: float = 0.0, comment_types=("text", "sound"),
+                   comment_spacing: timedelta = timedelta(0)):
+    ''' 질문 n개와 질문마다 답변을 만든다. stale_ratio 만큼은 24시간이 지난 질문
+    comment_spacing을 주면 답변 created_at을 그 간격으로 과거부터 차례로 둠 '''
+    import models
+
+    now = datetime.now()
+    n_stale = int(n_questions * stale_ratio)
+    questions = []
+    for i in range(n_questions):
+        stmt = models.Question.__table__.insert().values(
+            content=f"question {i}", user_id=user_id, type="normal", comment_type="anything",
+            expired=False, is_deleted=False,
+            created_at=now - timedelta(days=2) if i < n_stale else now - timedelta(minutes=i % 600),
+            updated_at=now)
+        questions.append(db.execute(stmt).inserted_primary_key[0])
+
+    rows = [{"type": comment_types[j % len(comment_types)], "content": f"comment {j}", "question_id": question_id,
+             "created_at": now - (comments_per_question - j) * comment_spacing, "updated_at": now}
+            for question_id in questions for j in range(comments_per_question)]
+    if rows:
+        db.execute(models.Comment.__table__.insert(), rows)
+    db.commit()
+    return questions
+
+
+class Server:
+    ''' uvicorn으로 app을 별도 스레드에서 띄우는 context manager '''
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 8765):
+        import uvicorn
+
+        self.host, self.port = host, port
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning",
+                                                    lifespan="on"))
+
+    def __enter__(self):
+        import threading
+
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+async def http_request(reader, writer, method: str, path: str, body: bytes = b"", headers: dict = None):
+    ''' keep-alive 커넥션으로 HTTP/1.1 요청 하나를 보내고 (status, headers, body)를 반환 '''
+    lines = [f"{method} {path} HTTP/1.1", "Host: bench", f"Content-Length: {len(body)}"]
+    lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    response_headers = {}
+    for line in header_lines:
+        if line:
+            k, v = line.split(":", 1)
+            response_headers[k.strip().lower()] = v.strip()
+    length = int(response_headers.get("content-length", 0))
+    response_body = await reader.readexactly(length) if length else b""
+    return int(status_line.split()[1]), response_headers, response_body
+
+
+def run_load(host: str, port: int, next_request, concurrency: int, total: int) -> dict:
+    ''' concurrency개의 커넥션으로 total개 요청을 보내고 처리량과 지연시간 분포를 반환
+    next_request(i) -> (name, method, path, body, headers) '''
+    import asyncio
+
+    latencies = {}
+    statuses = {}
+
+    async def worker(counter):
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while True:
+                i = next(counter, None)
+                if i is None:
+                    return
+                name, method, path, body, headers = next_request(i)
+                start = time.perf_counter()
+                status, _, _ = await http_request(reader, writer, method, path, body, headers)
+                latencies.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+                statuses.setdefault(name, {}).setdefault(status, 0)
+                statuses[name][status] += 1
+        finally:
+            writer.close()
+
+    async def main():
+        counter = iter(range(total))
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(counter) for _ in range(concurrency)))
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(main())
+    return {"elapsed_s": elapsed, "rps": total / elapsed,
+            "endpoints": {name: summarize(samples, elapsed) | {"status": statuses[name]}
+                          for name, samples in latencies.items()}}
+
+
+def percentile(sorted_samples: list, p: float) -> float:
+    index = min(len(sorted_samples) - 1, int(round(p / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def summarize(samples: list, elapsed: float) -> dict:
+    samples = sorted(samples)
+    return {"requests": len(samples), "rps": len(samples) / elapsed,
+            "p50_ms": percentile(samples, 50), "p95_ms": percentile(samples, 95),
+            "p99_ms": percentile(samples, 99)}
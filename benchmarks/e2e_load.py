@@ -0,0 +1,286 @@
+# benchmarks/e2e_load.py
+# 서비스 전체 처리량 측정: 로컬 DB에 데이터(e2e_seed)를 넣고 가짜 인스타그램/S3를 바라보게 한 main.app을
+# uvicorn 프로세스로 띄운 뒤, 링크 열기(C-2), 투표(C-4), 텍스트 답변(C-5), inbox(D-7/D-8/D-9), 답변 목록(D-2),
+# 투표 결과(D-5), 히스토리(D-6), 로그인(A-3)을 섞어서 보내고 엔드포인트별 p50/p95/p99, 처리량을 JSON으로 출력
+#
+# python benchmarks/e2e_load.py [--db-url mysql+pymysql://...] [--requests 20000] [--concurrency 32]
+#                               [--mix link=30,vote=10] [--output result.json]
+# 음성 답변(C-6)은 ffmpeg와 실제 webm 파일이 필요해서 --voice-file을 줄 때만 섞음 (업로드는 fake_s3로)
+
+import argparse
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+from datetime import datetime
+
+from common import DEFAULT_DB_URL, ROOT, run_load, setup_database
+from e2e_seed import seed
+from fake_instagram import FakeInstagram  # 프로젝트 루트의 fake_instagram.py
+from fake_s3 import FakeS3
+
+# 키: (리포트 이름, 기본 비중)
+WORKLOAD = {
+    "link": ("C-2 link open", 25),
+    "vote": ("C-4 vote", 15),
+    "comment": ("C-5 text comment", 10),
+    "inbox": ("D-7 inbox text", 15),
+    "inbox_sound": ("D-8 inbox sound", 5),
+    "inbox_vote": ("D-9 inbox vote", 5),
+    "comments": ("D-2 question comments", 5),
+    "vote_result": ("D-5 vote result", 8),
+    "history": ("D-6 history", 10),
+    "login": ("A-3 login", 2),
+    "voice": ("C-6 voice comment", 0),
+}
+
+PAGE_LIMIT = 20
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+class Workload:
+    ''' 요청 i마다 비중에 따라 엔드포인트를 고르고, 대상 user/질문은 인기 가중치로 고름 (인기 user 링크에 몰림) '''
+
+    def __init__(self, data: dict, mix: dict, voice_file: bytes = None, rng: random.Random = None):
+        self.rng = rng or random.Random(2)
+        self.data = data
+        self.voice_file = voice_file
+        self.keys = [key for key, weight in mix.items() if weight > 0]
+        self.cum_weights = self._cumulative([mix[key] for key in self.keys])
+        self.users = (data["user_ids"], self._cumulative(data["user_weights"]))
+        self.ranks = (list(range(len(data["user_ids"]))), self.users[1])
+        weight_of = dict(zip(data["user_ids"], data["user_weights"]))
+        self.history_users = (data["users_with_history"],
+                              self._cumulative([weight_of[u] for u in data["users_with_history"]]))
+        self.vote_users = (data["users_with_votes"],
+                           self._cumulative([weight_of[u] for u in data["users_with_votes"]]))
+        self.normal_questions = self._by_weight(data["valid_normal"])
+        self.vote_questions = self._by_weight(data["valid_vote"])
+        self.all_questions = self._by_weight(data["valid_normal"] + data["valid_vote"])
+
+    @staticmethod
+    def _cumulative(weights: list) -> list:
+        total, result = 0.0, []
+        for weight in weights:
+            total += weight
+            result.append(total)
+        return result
+
+    def _by_weight(self, pairs: list) -> tuple:
+        return [item for item, _ in pairs], self._cumulative([weight for _, weight in pairs])
+
+    def _pick(self, population: tuple):
+        items, cum_weights = population
+        return self.rng.choices(items, cum_weights=cum_weights)[0]
+
+    def __call__(self, i: int):
+        ''' common.run_load의 next_request: (name, method, path, body, headers) '''
+        key = self.rng.choices(self.keys, cum_weights=self.cum_weights)[0]
+        return (WORKLOAD[key][0],) + getattr(self, key)()
+
+    def link(self):
+        return "GET", f"/api/v1/questions/url/?question_id={self._pick(self.all_questions)}", b"", None
+
+    def vote(self):
+        option_id = self.rng.choice(self.data["options_by_question"][self._pick(self.vote_questions)])
+        return "PUT", f"/api/v1/comments/vote/{option_id}", b"", None
+
+    def comment(self):
+        body = json.dumps({"content": "bench comment", "question_id": self._pick(self.normal_questions)}).encode()
+        return "POST", "/api/v1/comments/text", body, JSON_HEADERS
+
+    def inbox(self):
+        return "GET", f"/api/v1/comments/users/{self._pick(self.users)}/text?limit={PAGE_LIMIT}", b"", None
+
+    def inbox_sound(self):
+        return "GET", f"/api/v1/comments/users/{self._pick(self.users)}/sound?limit={PAGE_LIMIT}", b"", None
+
+    def inbox_vote(self):
+        return "GET", f"/api/v1/comments/users/{self._pick(self.vote_users)}/vote", b"", None
+
+    def comments(self):
+        return "GET", f"/api/v1/comments/questions/{self._pick(self.normal_questions)}?limit={PAGE_LIMIT}", b"", None
+
+    def vote_result(self):
+        return "GET", f"/api/v1/comments/vote/{self._pick(self.vote_questions)}", b"", None
+
+    def history(self):
+        return "GET", f"/api/v1/questions/history/{self._pick(self.history_users)}?limit={PAGE_LIMIT}", b"", None
+
+    def login(self):
+        # seed의 insta_id(순위)가 토큰, fake_instagram이 같은 id로 프로필을 돌려줌
+        return "PUT", "/api/v1/users/by-access-token", b"", {"access-token": str(self._pick(self.ranks))}
+
+    def voice(self):
+        boundary = uuid.uuid4().hex
+        body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"question_id\"\r\n\r\n"
+                f"{self._pick(self.normal_questions)}\r\n"
+                f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"bench.webm\"\r\n"
+                f"Content-Type: audio/webm\r\n\r\n").encode() + self.voice_file + f"\r\n--{boundary}--\r\n".encode()
+        return "POST", "/api/v1/comments/voice", body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def parse_mix(text: str) -> dict:
+    mix = {key: weight for key, (_, weight) in WORKLOAD.items()}
+    for part in filter(None, (text or "").split(",")):
+        key, weight = part.split("=")
+        if key not in WORKLOAD:
+            raise SystemExit(f"unknown workload {key}, one of {', '.join(WORKLOAD)}")
+        mix[key] = float(weight)
+    return mix
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# 띄운 서버의 관리자 토큰, /metrics 조회에 필요
+ADMIN_TOKEN = "bench-admin"
+
+
+def metrics_request(port: int) -> urllib.request.Request:
+    return urllib.request.Request(f"http://127.0.0.1:{port}/metrics", headers={"admin-token": ADMIN_TOKEN})
+
+
+def start_server(port: int, workers: int, env: dict) -> subprocess.Popen:
+    ''' main.app을 uvicorn 프로세스로 띄우고 응답할 때까지 기다림 (questions.txt 때문에 cwd는 프로젝트 루트) '''
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                                "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+                                "--no-access-log"], cwd=ROOT, env=os.environ | env)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("server exited during startup")
+        try:
+            urllib.request.urlopen(metrics_request(port), timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("server did not start")
+
+
+METRIC_LINE = re.compile(r'^tikitaka_(http_request_db_queries|http_request_db_seconds)_(sum|count)'
+                         r'\{method="(\w+)",route="([^"]+)"\} (\S+)$')
+
+
+def server_metrics(port: int) -> dict:
+    ''' /metrics의 라우트별 요청당 쿼리 수, DB 시간 합계 {(method, route): {metric_kind: value}} '''
+    text = urllib.request.urlopen(metrics_request(port), timeout=5).read().decode()
+    result = {}
+    for line in text.splitlines():
+        match = METRIC_LINE.match(line)
+        if match:
+            metric, kind, method, route, value = match.groups()
+            result.setdefault((method, route), {})[f"{metric}_{kind}"] = float(value)
+    return result
+
+
+def server_summary(before: dict, after: dict) -> dict:
+    ''' 측정 구간(before~after)의 라우트별 요청당 평균 쿼리 수와 DB 시간 '''
+    summary = {}
+    for (method, route), values in sorted(after.items()):
+        base = before.get((method, route), {})
+        delta = {key: value - base.get(key, 0) for key, value in values.items()}
+        requests = delta.get("http_request_db_queries_count", 0)
+        if requests:
+            summary[f"{method} {route}"] = {
+                "requests": int(requests),
+                "db_queries_per_request": round(delta["http_request_db_queries_sum"] / requests, 2),
+                "db_ms_per_request": round(delta["http_request_db_seconds_sum"] * 1000 / requests, 3)}
+    return summary
+
+
+def rounded(value):
+    if isinstance(value, float):
+        return round(value, 3)
+    if isinstance(value, dict):
+        return {key: rounded(item) for key, item in value.items()}
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db-url")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--questions", type=int, default=4, help="user당 평균 유효한 질문 수")
+    parser.add_argument("--history", type=int, default=10, help="user당 평균 만료 질문 수")
+    parser.add_argument("--comments", type=int, default=50000)
+    parser.add_argument("--votes", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--warmup", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker 수, 1보다 크면 서버 지표는 한 worker 것만")
+    parser.add_argument("--mix", help="비중 변경, 예: link=30,vote=10 (키: " + ", ".join(WORKLOAD) + ")")
+    parser.add_argument("--voice-file", help="C-6에 보낼 webm 파일, 주면 voice 비중 기본값 2")
+    parser.add_argument("--insta-delay", type=float, default=0.02, help="가짜 인스타그램 응답 지연(초)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="결과 JSON 파일, 없으면 stdout")
+    args = parser.parse_args()
+
+    db_url = args.db_url or DEFAULT_DB_URL
+    database = setup_database(db_url)
+    db = database.SessionLocal()
+    start = time.perf_counter()
+    data = seed(db, args.users, args.questions, args.history, args.comments, args.votes,
+                rng=random.Random(args.seed))
+    db.close()
+    database.engine.dispose()
+    seed_s = time.perf_counter() - start
+
+    mix = parse_mix(args.mix)
+    voice_file = None
+    if args.voice_file:
+        with open(args.voice_file, "rb") as f:
+            voice_file = f.read()
+        mix["voice"] = mix["voice"] or 2
+    else:
+        mix["voice"] = 0
+    workload = Workload(data, mix, voice_file, rng=random.Random(args.seed + 1))
+
+    port = free_port()
+    with FakeInstagram(delay=args.insta_delay) as insta, FakeS3() as s3:
+        env = {"DATABASE_URL": db_url, "LOG_LEVEL": "WARNING", "ADMIN_TOKEN": ADMIN_TOKEN,
+               "INSTA_API_URL": insta.url, "INSTA_GRAPH_URL": insta.url, "INSTA_WEB_URL": insta.url,
+               **s3.env()}
+        server = start_server(port, args.workers, env)
+        try:
+            if args.warmup:
+                run_load("127.0.0.1", port, workload, args.concurrency, args.warmup)
+            before = server_metrics(port)
+            result = run_load("127.0.0.1", port, workload, args.concurrency, args.requests)
+            after = server_metrics(port)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+        report = {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "config": {key: value for key, value in vars(args).items() if key != "output"}
+                      | {"db": db_url.split(":")[0], "mix": mix},
+            "seed": data["counts"] | {"seconds": seed_s},
+            "elapsed_s": result["elapsed_s"],
+            "rps": result["rps"],
+            "endpoints": dict(sorted(result["endpoints"].items())),
+            "server": server_summary(before, after),
+            "fakes": {"instagram_requests": insta.requests, "s3_uploads": s3.uploads},
+        }
+
+    output = json.dumps(rounded(report), indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
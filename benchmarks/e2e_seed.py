@@ -0,0 +1,114 @@
+# benchmarks/e2e_seed.py
+# e2e_load.py용 데이터 생성: 인기 편중(Zipf)된 user, 최근 24시간에 퍼진 유효한 질문과 지난 만료 질문,
+# 인기 user에 몰린 답변 수와 투표수를 Core bulk insert로 넣음
+
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam
+
+# 투표 질문 비율, 음성 답변 비율
+VOTE_RATIO = 0.2
+SOUND_RATIO = 0.2
+
+
+def zipf_weights(n: int, s: float) -> list:
+    ''' 순위 i(0부터)의 가중치 1 / (i + 1)^s '''
+    return [1 / (i + 1) ** s for i in range(n)]
+
+
+def seed(db, users: int, questions_per_user: int, history_per_user: int, comments: int, votes: int,
+         skew: float = 1.1, rng: random.Random = None) -> dict:
+    ''' 데이터를 넣고 워크로드가 고를 id와 가중치를 반환
+    users명 각각 유효한 질문 약 questions_per_user개(최근 24시간), 만료 질문 약 history_per_user개(1~30일 전),
+    답변 comments개와 투표 votes표를 질문 주인의 인기 가중치에 따라 나눔 '''
+    import models
+
+    rng = rng or random.Random(1)
+    now = datetime.now()
+    popularity = zipf_weights(users, skew)
+
+    for start in range(0, users, 1000):
+        # insta_id는 fake_instagram이 access_token을 그대로 id로 돌려주므로 A-3에서 토큰으로 사용
+        rows = [{"insta_id": str(i), "username": f"user_{i}", "full_name": f"user {i}",
+                 "follower": rng.randint(0, 5000), "following": rng.randint(0, 1000),
+                 "profile_image_url": f"https://example.com/{i}.jpg",
+                 "is_deleted": False, "created_at": now - timedelta(days=60), "updated_at": now}
+                for i in range(start, min(users, start + 1000))]
+        db.execute(models.User.__table__.insert(), rows)
+    user_ids = [row.id for row in db.query(models.User.id).order_by(models.User.id)]
+
+    question_rows = []
+    for rank, user_id in enumerate(user_ids):
+        # 인기 user일수록 질문도 조금 더 많이 올림
+        boost = 1 + 2 * popularity[rank] / popularity[0]
+        for _ in range(max(1, round(rng.expovariate(1 / (questions_per_user * boost))))):
+            created_at = now - timedelta(seconds=rng.uniform(60, 23 * 3600))
+            question_rows.append((user_id, rank, created_at, False))
+        for _ in range(round(rng.expovariate(1 / history_per_user)) if history_per_user else 0):
+            created_at = now - timedelta(days=rng.uniform(1, 30))
+            question_rows.append((user_id, rank, created_at, True))
+
+    rows = [{"content": f"question {i}", "user_id": user_id, "comment_type": "anything",
+             "type": "vote" if rng.random() < VOTE_RATIO else "normal", "expired": expired, "is_deleted": False,
+             "created_at": created_at, "updated_at": created_at}
+            for i, (user_id, rank, created_at, expired) in enumerate(question_rows)]
+    db.execute(models.Question.__table__.insert(), rows)
+    questions = db.query(models.Question.id, models.Question.user_id, models.Question.type,
+                         models.Question.expired, models.Question.created_at).order_by(models.Question.id).all()
+
+    rank_of = {user_id: rank for rank, user_id in enumerate(user_ids)}
+    normal = [q for q in questions if q.type == "normal"]
+    vote = [q for q in questions if q.type == "vote"]
+
+    # 투표 질문마다 선택지 2~4개
+    option_rows = [{"num": num + 1, "content": f"option {num + 1}", "count": 0, "question_id": q.id,
+                    "is_deleted": False, "created_at": q.created_at, "updated_at": q.created_at}
+                   for q in vote for num in range(rng.randint(2, 4))]
+    if option_rows:
+        db.execute(models.VoteOption.__table__.insert(), option_rows)
+    options = db.query(models.VoteOption.id, models.VoteOption.question_id).order_by(models.VoteOption.id).all()
+    options_by_question = {}
+    for option in options:
+        options_by_question.setdefault(option.question_id, []).append(option.id)
+
+    # 답변 수, 투표수는 질문 주인의 인기 가중치에 비례 (한 질문에 몰리는 긴 꼬리)
+    comment_rows = []
+    if normal and comments:
+        weights = [popularity[rank_of[q.user_id]] for q in normal]
+        for q in rng.choices(normal, weights=weights, k=comments):
+            sound = rng.random() < SOUND_RATIO
+            created_at = min(now, q.created_at + timedelta(seconds=rng.uniform(0, 3600)))
+            comment_rows.append({"type": "sound" if sound else "text", "question_id": q.id,
+                                 "content": f"https://bench.s3/{q.id}.webm" if sound else "comment",
+                                 "is_deleted": False, "created_at": created_at, "updated_at": created_at})
+        for start in range(0, len(comment_rows), 5000):
+            db.execute(models.Comment.__table__.insert(), comment_rows[start:start + 5000])
+
+    if vote and votes:
+        weights = [popularity[rank_of[q.user_id]] for q in vote]
+        counts = {}
+        for q in rng.choices(vote, weights=weights, k=votes):
+            # 첫 선택지에 몰리는 편
+            option_ids = options_by_question[q.id]
+            option_id = rng.choices(option_ids, weights=zipf_weights(len(option_ids), 1.0))[0]
+            counts[option_id] = counts.get(option_id, 0) + 1
+        table = models.VoteOption.__table__
+        db.execute(table.update().where(table.c.id == bindparam("option_id")).values(count=bindparam("votes")),
+                   [{"option_id": option_id, "votes": count} for option_id, count in counts.items()])
+    db.commit()
+
+    valid = [q for q in questions if not q.expired]
+    return {
+        "user_ids": user_ids,
+        "user_weights": popularity,
+        "users_with_history": sorted({q.user_id for q in questions if q.expired}),
+        "users_with_votes": sorted({q.user_id for q in valid if q.type == "vote"}),
+        # (question_id, 주인 인기 가중치)
+        "valid_normal": [(q.id, popularity[rank_of[q.user_id]]) for q in valid if q.type == "normal"],
+        "valid_vote": [(q.id, popularity[rank_of[q.user_id]]) for q in valid if q.type == "vote"],
+        "options_by_question": options_by_question,
+        "counts": {"users": len(user_ids), "questions": len(questions), "valid_questions": len(valid),
+                   "vote_questions": len(vote), "vote_options": len(options), "comments": len(comment_rows),
+                   "votes": votes},
+    }
@@ -0,0 +1,65 @@
+# benchmarks/fake_s3.py
+# 로컬에서 띄우는 가짜 S3, storage.S3Uploader가 쓰는 PutObject(path-style)만 받아서 크기만 기록
+
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeS3:
+    ''' AWS_S3_ENDPOINT_URL로 지정하면 업로드를 받아주는 HTTP 서버 context manager, 본문은 저장하지 않음 '''
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, bucket: str = "bench"):
+        self.bucket = bucket
+        self.uploads = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, headers: dict = None):
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_PUT(self):
+                # Expect: 100-continue는 BaseHTTPRequestHandler가 처리
+                data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with fake._lock:
+                    fake.uploads += 1
+                    fake.bytes += len(data)
+                self._reply(200, {"ETag": f'"{hashlib.md5(data).hexdigest()}"'})
+
+            def do_HEAD(self):
+                self._reply(404)
+
+            def do_GET(self):
+                self._reply(404)
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+
+        self.server = Server((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def env(self) -> dict:
+        ''' storage.py가 이 서버로 업로드하도록 하는 환경변수 (storage import 전에 설정) '''
+        return {"AWS_S3_ENDPOINT_URL": self.url, "AWS_S3_BUCKET_NAME": self.bucket,
+                "AWS_ACCESS_KEY_ID": "bench", "AWS_SECRET_KEY": "bench"}
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
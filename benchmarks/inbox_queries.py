@@ -0,0 +1,76 @@
+# benchmarks/inbox_queries.py
+# D-7/D-8 inbox 조회(async_crud.get_valid_comments)의 쿼리 수와 응답 시간이 질문 수에 따라 어떻게 늘어나는지 측정
+#
+# python benchmarks/inbox_queries.py [--db-url mysql+pymysql://...]
+
+import argparse
+import asyncio
+from datetime import datetime
+
+from common import QueryCounter, measure, seed_questions, seed_user, setup_database
+
+
+def legacy_get_valid_comments(db, user_id: int, type: str):
+    ''' 변경 전 구현: 질문마다 만료 처리 commit + 답변 조회 후 python에서 type 필터 '''
+    import models
+
+    valid_questions = db.query(models.Question).filter(models.Question.user_id == user_id) \
+        .filter(models.Question.is_deleted == False).filter(models.Question.expired == False).all()
+    comments = []
+    for q in valid_questions:
+        if (datetime.now() - q.created_at).days >= 1:
+            q.expired = True
+            db.add(q)
+            db.commit()
+            db.refresh(q)
+            continue
+        db_comments = db.query(models.Comment).filter(models.Comment.question_id == q.id).all()
+        comments += [c for c in db_comments if c.type == type]
+    return comments
+
+
+def current_get_valid_comments(database, loop):
+    ''' 라우트가 쓰는 async_crud 구현을 sync 함수처럼 호출, 이벤트 루프는 측정 내내 하나만 사용 '''
+    import async_crud
+
+    async def run(user_id: int, type: str):
+        async with database.AsyncSessionLocal() as db:
+            return await async_crud.get_valid_comments(db, user_id=user_id, type=type)
+
+    return lambda db, user_id, type: loop.run_until_complete(run(user_id, type))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db-url")
+    parser.add_argument("--sizes", default="1,10,50,200")
+    parser.add_argument("--comments", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    database = setup_database(args.db_url)
+    loop = asyncio.new_event_loop()
+    impls = (("legacy", legacy_get_valid_comments, database.engine),
+             ("current", current_get_valid_comments(database, loop), database.async_engine.sync_engine))
+
+    print(f"{'questions':>9} {'impl':>7} {'queries':>8} {'median ms':>10}")
+    for i, size in enumerate(int(s) for s in args.sizes.split(",")):
+        db = database.SessionLocal()
+        for name, fn, engine in impls:
+            # 구현마다 새 user를 만들고 10%는 24시간 지난 질문으로 생성
+            user = seed_user(db, insta_id=f"{name}-{i}")
+            seed_questions(db, user.id, size, args.comments, stale_ratio=0.1)
+            with QueryCounter(engine) as counter:
+                expected = fn(db, user.id, "text")
+            elapsed = measure(lambda: fn(db, user.id, "text"), args.repeat)
+            print(f"{size:>9} {name:>7} {counter.count:>8} {elapsed:>10.2f}")
+            assert len(expected) == len(fn(db, user.id, "text"))
+        db.close()
+
+    # aiosqlite 커넥션 스레드가 남아 있으면 프로세스가 끝나지 않음
+    loop.run_until_complete(database.async_engine.dispose())
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
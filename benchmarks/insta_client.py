@@ -0,0 +1,94 @@
+# benchmarks/insta_client.py
+# 가짜 인스타그램 서버로 InstagramClient의 커넥션 재사용, timeout, 재시도, async 동시 호출, 프로필 캐시를 측정
+#
+# python benchmarks/insta_client.py [--calls 200] [--delay 0.05]
+
+import argparse
+import asyncio
+import time
+
+import requests
+
+from common import summarize  # sys.path에 프로젝트 루트 추가
+from fake_instagram import FakeInstagram  # 프로젝트 루트의 fake_instagram.py
+
+
+def timed(fn, n: int) -> list:
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name: str, samples: list, extra: str = ""):
+    stats = summarize(samples, sum(samples) / 1000)
+    print(f"{name:>24}: p50 {stats['p50_ms']:7.1f} ms  p95 {stats['p95_ms']:7.1f} ms  "
+          f"p99 {stats['p99_ms']:7.1f} ms  {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.05, help="느린 upstream 응답 지연(초)")
+    args = parser.parse_args()
+
+    from insta import InstagramClient
+
+    # 1. 커넥션 재사용: 세션 없는 requests.get과 풀을 쓰는 client
+    with FakeInstagram() as fake:
+        samples = timed(lambda i: requests.get(f"{fake.url}/me?fields=username&access_token={i}", timeout=5).json(),
+                        args.calls)
+        report("requests.get", samples, f"connections {fake.connections}")
+
+    with FakeInstagram() as fake:
+        client = InstagramClient(profile_ttl=0, **fake.client_kwargs())
+        samples = timed(lambda i: client.get_user_info(str(i)), args.calls)
+        report("client.get_user_info", samples, f"connections {fake.connections} requests {fake.requests}")
+
+    # 2. read timeout보다 느린 upstream은 timeout 안에 실패로 끝남
+    with FakeInstagram(delay=1.0) as fake:
+        client = InstagramClient(read_timeout=0.2, retries=0, profile_ttl=0, **fake.client_kwargs())
+        samples = timed(lambda i: client.get_user_info(str(i)), 5)
+        report("slow upstream (1s)", samples, "read_timeout 0.2s")
+
+    # 3. 503이 섞인 upstream은 backoff 재시도로 대부분 성공
+    with FakeInstagram(fail_rate=0.3) as fake:
+        client = InstagramClient(retries=3, backoff=0.01, profile_ttl=0, **fake.client_kwargs())
+        results = []
+        samples = timed(lambda i: results.append(client.get_user_info(str(i))), args.calls)
+        ok = sum(result is not None for result in results)
+        report("flaky upstream (30% 503)", samples, f"ok {ok}/{args.calls} requests {fake.requests}")
+
+    # 4. async 라우터에서 동시에 호출해도 이벤트 루프를 막지 않음
+    with FakeInstagram(delay=args.delay) as fake:
+        client = InstagramClient(profile_ttl=0, **fake.client_kwargs())
+
+        async def run():
+            start = time.perf_counter()
+            await asyncio.gather(*(client.aget_user_info(str(i)) for i in range(args.calls)))
+            return time.perf_counter() - start
+
+        elapsed = asyncio.run(run())
+        sequential = args.calls * 2 * args.delay
+        print(f"{'async x' + str(args.calls):>24}: {elapsed:.2f} s (sequential would be ~{sequential:.2f} s), "
+              f"connections {fake.connections}")
+
+    # 5. 같은 유저의 동시 요청은 upstream 호출 한 번(토큰 -> username, username -> 프로필)으로 합쳐지고
+    #    TTL 동안은 캐시에서 바로 반환
+    with FakeInstagram(delay=args.delay) as fake:
+        client = InstagramClient(profile_ttl=60, **fake.client_kwargs())
+
+        async def burst():
+            await asyncio.gather(*(client.aget_user_info("same-user") for _ in range(args.calls)))
+
+        asyncio.run(burst())
+        coalesced = fake.requests
+        samples = timed(lambda i: client.get_user_info("same-user"), args.calls)
+        report("cached get_user_info", samples,
+               f"upstream requests {fake.requests} (burst {coalesced}) profiles {client.profiles.stats()}")
+
+
+if __name__ == "__main__":
+    main()
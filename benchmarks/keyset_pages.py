@@ -0,0 +1,71 @@
+# benchmarks/keyset_pages.py
+# D-2 답변 목록을 전체로 받을 때와 keyset 페이지(첫 페이지, 마지막 근처 페이지)로 받을 때 응답 시간 비교
+# 답변 수가 늘어나도 페이지 응답 시간은 일정해야 함
+#
+# python benchmarks/keyset_pages.py [--db-url mysql+pymysql://...] [--sizes 1000,10000,50000]
+
+import argparse
+from datetime import timedelta
+
+from common import measure, seed_questions, seed_user, setup_database
+
+
+def build_app():
+    from fastapi import FastAPI
+
+    from database import async_engine
+    from routers import comments
+
+    app = FastAPI()
+    app.include_router(comments.router)
+    app.add_event_handler("shutdown", async_engine.dispose)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db-url")
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    database = setup_database(args.db_url)
+    from fastapi.testclient import TestClient
+
+    import models, pagination
+
+    db = database.SessionLocal()
+    user = seed_user(db)
+    print(f"{'comments':>9} {'full ms':>9} {'first page ms':>14} {'deep page ms':>13} {'offset ms':>10}")
+    with TestClient(build_app()) as client:
+        for size in (int(s) for s in args.sizes.split(",")):
+            question_id = seed_questions(db, user.id, 1, size, comment_types=("text",),
+                                         comment_spacing=timedelta(seconds=1))[0]
+            path = f"/api/v1/comments/questions/{question_id}"
+
+            # 끝에서 두 번째 페이지의 cursor
+            rows = db.query(models.Comment.created_at, models.Comment.id) \
+                .filter(models.Comment.question_id == question_id) \
+                .order_by(models.Comment.created_at, models.Comment.id) \
+                .offset(size - 2 * args.limit).limit(1).all()
+            cursor = pagination.encode_cursor(*rows[0])
+
+            first = client.get(path, params={"limit": args.limit})
+            assert len(first.json()) == args.limit and pagination.NEXT_CURSOR_HEADER in first.headers
+            deep = client.get(path, params={"limit": args.limit, "cursor": cursor})
+            assert len(deep.json()) == args.limit
+
+            full_ms = measure(lambda: client.get(path), args.repeat)
+            first_ms = measure(lambda: client.get(path, params={"limit": args.limit}), args.repeat)
+            deep_ms = measure(lambda: client.get(path, params={"limit": args.limit, "cursor": cursor}), args.repeat)
+            # 비교용: 같은 위치를 OFFSET으로 읽는 쿼리
+            offset_ms = measure(lambda: db.query(models.Comment).filter(models.Comment.question_id == question_id)
+                                .order_by(models.Comment.created_at, models.Comment.id)
+                                .offset(size - 2 * args.limit).limit(args.limit).all(), args.repeat)
+            print(f"{size:>9} {full_ms:>9.1f} {first_ms:>14.1f} {deep_ms:>13.1f} {offset_ms:>10.1f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
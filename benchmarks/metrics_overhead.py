@@ -0,0 +1,66 @@
+# benchmarks/metrics_overhead.py
+# MetricsMiddleware와 engine 이벤트가 요청마다 더하는 시간(µs)을 ASGI 앱을 직접 호출해서 측정 (네트워크, DB 제외)
+#
+# python benchmarks/metrics_overhead.py [--requests 20000]
+
+import argparse
+import asyncio
+import time
+
+from common import setup_database
+
+
+async def call(app, n: int) -> float:
+    ''' app에 GET 요청 n번, 요청당 평균 µs '''
+    scope = {"type": "http", "method": "GET", "path": "/ping", "raw_path": b"/ping", "root_path": "",
+             "query_string": b"", "headers": [], "scheme": "http", "server": ("bench", 80),
+             "http_version": "1.1"}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(n):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) * 1e6 / n
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db-url")
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    setup_database(args.db_url)
+    import metrics
+    from fastapi import FastAPI
+
+    def build(with_metrics: bool):
+        app = FastAPI()
+
+        @app.get("/ping")
+        async def ping():
+            return {}
+
+        if with_metrics:
+            app.add_middleware(metrics.MetricsMiddleware)
+        return app
+
+    async def run():
+        results = {}
+        for name, app in (("plain", build(False)), ("metrics", build(True))):
+            await call(app, 1000)  # warm up
+            results[name] = await call(app, args.requests)
+        return results
+
+    results = asyncio.run(run())
+    for name, us in results.items():
+        print(f"{name:>8} {us:8.1f} µs/request")
+    print(f"overhead {results['metrics'] - results['plain']:8.1f} µs/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/serialization.py
+# 목록 API(D-2) 응답을 만드는 비용을 항목당 µs로 변경 전(ORM 객체 -> response_model 검증 -> jsonable_encoder -> json)과
+# 현재(컬럼 조회 Row -> dict -> orjson)로 비교, 조회 포함/인코딩만 두 가지로 잼
+#
+# python benchmarks/serialization.py [--db-url mysql+pymysql://...] [--sizes 10 100 1000]
+
+import argparse
+import asyncio
+from datetime import timedelta
+from typing import List
+
+from common import measure, seed_questions, seed_user, setup_database
+
+# serialize_response가 async 함수라서 측정마다 루프를 새로 만들지 않도록 하나를 재사용
+loop = asyncio.new_event_loop()
+
+
+def legacy_serialize(field, objects) -> bytes:
+    ''' 변경 전: FastAPI가 response_model로 검증(orm_mode)하고 JSONResponse로 인코딩 '''
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+
+    content = loop.run_until_complete(serialize_response(field=field, response_content=objects))
+    return JSONResponse(content).body
+
+
+def current_serialize(rows) -> bytes:
+    import fastjson
+
+    return fastjson.dumps(fastjson.rows(rows))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db-url")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    database = setup_database(args.db_url)
+    import async_crud, models, schemas
+    from fastapi.utils import create_response_field
+    from sqlalchemy import select
+
+    field = create_response_field(name="response", type_=List[schemas.Comment])
+    db = database.SessionLocal()
+    user_id = seed_user(db).id
+
+    print(f"{'items':>6} {'impl':>8} {'encode µs/item':>15} {'query+encode µs/item':>21}")
+    for size in args.sizes:
+        question_id = seed_questions(db, user_id, 1, size, comment_spacing=timedelta(seconds=1))[0]
+        legacy_stmt = select(models.Comment).where(models.Comment.question_id == question_id) \
+            .order_by(models.Comment.created_at, models.Comment.id)
+        current_stmt = select(*async_crud.comment_columns).where(models.Comment.question_id == question_id) \
+            .order_by(models.Comment.created_at, models.Comment.id)
+
+        def legacy_query():
+            db.expunge_all()
+            return db.execute(legacy_stmt).scalars().all()
+
+        def current_query():
+            return db.execute(current_stmt).all()
+
+        objects, rows = legacy_query(), current_query()
+        # 응답 본문이 바이트 단위로 같아야 함
+        assert legacy_serialize(field, objects) == current_serialize(rows)
+
+        for name, query, serialize in (("legacy", legacy_query, lambda data: legacy_serialize(field, data)),
+                                       ("current", current_query, current_serialize)):
+            data = query()
+            encode = measure(lambda: serialize(data), args.repeat) * 1000 / size
+            total = measure(lambda: serialize(query()), args.repeat) * 1000 / size
+            print(f"{size:>6} {name:>8} {encode:>15.2f} {total:>21.2f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
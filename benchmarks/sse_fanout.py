@@ -0,0 +1,105 @@
+# benchmarks/sse_fanout.py
+# D-11 투표 결과 SSE 구독자 수천 명을 붙이고 투표(C-4) 후 모든 구독자가 새 결과를 받기까지 걸리는 시간 측정
+#
+# python benchmarks/sse_fanout.py [--db-url mysql+pymysql://...] [--subscribers 2000] [--votes 20]
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from common import ROOT, Server, http_request, percentile, seed_user, setup_database
+
+
+def seed_vote_question(db, user_id: int) -> tuple:
+    import crud, models, schemas
+
+    question_id = crud.create_vote_question(db, schemas.VoteCreate(content="bench vote", user_id=user_id,
+                                                                   option=["a", "b", "c"]))
+    options = db.query(models.VoteOption.id).filter(models.VoteOption.question_id == question_id).all()
+    return question_id, [option.id for option in options]
+
+
+async def subscribe(host: str, port: int, path: str):
+    ''' 스트림을 열고 첫 이벤트(현재 결과)까지 읽은 뒤 (reader, writer) 반환 '''
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")
+    await next_event(reader)
+    return reader, writer
+
+
+async def next_event(reader) -> dict:
+    ''' chunked 본문에서 다음 data: 줄을 찾음 (heartbeat 주석 줄과 chunk 길이 줄은 건너뜀) '''
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("stream closed")
+        if line.startswith(b"data: "):
+            return json.loads(line[6:])
+
+
+async def run(host: str, port: int, question_id: int, option_ids: list, n_subscribers: int, n_votes: int):
+    path = f"/api/v1/comments/vote/{question_id}/stream"
+    start = time.perf_counter()
+    streams = []
+    # 한꺼번에 연결하면 listen backlog가 넘치므로 나눠서 연결
+    for i in range(0, n_subscribers, 200):
+        streams += await asyncio.gather(*(subscribe(host, port, path)
+                                          for _ in range(min(200, n_subscribers - i))))
+    connect_s = time.perf_counter() - start
+
+    async def wait_for_total(reader, total: int) -> float:
+        while sum((await next_event(reader))["count"]) < total:
+            pass
+        return time.perf_counter()
+
+    # 투표를 보내고 구독자마다 마지막 투표까지 반영된 결과를 받은 시각을 잼
+    waiters = [asyncio.create_task(wait_for_total(reader, n_votes)) for reader, _ in streams]
+    reader, writer = await asyncio.open_connection(host, port)
+    vote_start = time.perf_counter()
+    for i in range(n_votes):
+        await http_request(reader, writer, "PUT", f"/api/v1/comments/vote/{option_ids[i % len(option_ids)]}")
+    votes_done = time.perf_counter()
+    received = await asyncio.wait_for(asyncio.gather(*waiters), timeout=60)
+    writer.close()
+
+    latencies = sorted((t - votes_done) * 1000 for t in received)
+    for _, stream_writer in streams:
+        stream_writer.close()
+    return {"subscribers": len(streams), "connect_s": round(connect_s, 2),
+            "votes_s": round(votes_done - vote_start, 3),
+            "delivery_p50_ms": round(percentile(latencies, 50), 1),
+            "delivery_p99_ms": round(percentile(latencies, 99), 1),
+            "delivery_max_ms": round(latencies[-1], 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db-url")
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--votes", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    database = setup_database(args.db_url)
+    db = database.SessionLocal()
+    user = seed_user(db)
+    question_id, option_ids = seed_vote_question(db, user.id)
+    db.close()
+
+    # main.app 시작 시 questions.txt를 상대 경로로 읽음
+    os.chdir(ROOT)
+    import main
+    from broker import broker
+
+    with Server(main.app, port=args.port):
+        result = asyncio.run(run("127.0.0.1", args.port, question_id, option_ids, args.subscribers, args.votes))
+        result["broker"] = broker.stats()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
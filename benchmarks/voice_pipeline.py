@@ -0,0 +1,90 @@
+# benchmarks/voice_pipeline.py
+# 음성 변조 한 건당 실행 시간과 최대 메모리(RSS)를 이전 구현(pydub, 임시 파일)과 비교
+#
+# python benchmarks/voice_pipeline.py [--input clip.webm] [--repeat 5]
+# --input이 없으면 ffmpeg로 10초짜리 테스트 음성을 만들어 사용
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT
+
+
+def legacy_voice_alteration(filepath: str, comment_id: int, temp_dir: str):
+    ''' 변경 전 구현: webm -> wav 파일 -> 다시 읽어서 변조 -> mp4 파일 '''
+    from pydub import AudioSegment
+
+    sound = AudioSegment.from_file(filepath, "webm")
+    sound.export(f"{temp_dir}/{comment_id}.wav", format="wav")
+    sound = AudioSegment.from_file(f"{temp_dir}/{comment_id}.wav", format=filepath[-3:])
+
+    octaves = 0.7
+    new_sample_rate = int(sound.frame_rate * (1.8 ** octaves))
+    hipitch_sound = sound._spawn(sound.raw_data, overrides={'frame_rate': new_sample_rate})
+    hipitch_sound = hipitch_sound.set_frame_rate(44100)
+    hipitch_sound.export(f"{temp_dir}/{comment_id}.mp4", format="mp4")
+
+
+def run_once(impl: str, input_path: str):
+    ''' 자식 프로세스에서 한 건 처리 후 시간과 메모리를 json으로 출력 '''
+    sys.path.append(ROOT)
+    start = time.perf_counter()
+    if impl == "legacy":
+        # 이전 라우터처럼 업로드를 파일로 저장한 뒤 변조하고 임시 파일 삭제
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(input_path, "rb") as src, open(f"{temp_dir}/1.webm", "wb") as dst:
+                dst.write(src.read())
+            legacy_voice_alteration(f"{temp_dir}/1.webm", 1, temp_dir)
+            with open(f"{temp_dir}/1.mp4", "rb") as f:
+                size = len(f.read())
+    else:
+        import voice_alteration
+
+        with open(input_path, "rb") as f:
+            size = len(voice_alteration.voice_alteration(f.read()))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"wall_s": elapsed, "output_bytes": size,
+                      "python_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                      "ffmpeg_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss}))
+
+
+def make_clip(seconds: int) -> str:
+    path = os.path.join(tempfile.gettempdir(), f"tikitaka_bench_{seconds}s.webm")
+    subprocess.run(["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-f", "lavfi",
+                    "-i", f"sine=frequency=220:duration={seconds}", "-c:a", "libopus", path], check=True)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input")
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--impls", default="legacy,current")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    input_path = args.input or make_clip(args.seconds)
+    if args.run:
+        return run_once(args.run, input_path)
+
+    print(f"{'impl':>8} {'wall ms':>9} {'python MB':>10} {'ffmpeg MB':>10}")
+    for impl in args.impls.split(","):
+        # 메모리를 따로 재기 위해 한 건마다 새 프로세스에서 실행
+        runs = [json.loads(subprocess.run([sys.executable, __file__, "--run", impl, "--input", input_path],
+                                          check=True, capture_output=True, text=True).stdout)
+                for _ in range(args.repeat)]
+        print(f"{impl:>8} {statistics.median(r['wall_s'] for r in runs) * 1000:>9.1f} "
+              f"{max(r['python_rss_kb'] for r in runs) / 1024:>10.1f} "
+              f"{max(r['ffmpeg_rss_kb'] for r in runs) / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# broker.py
+# 실시간 투표 결과(SSE) 전달용 pub/sub, 한 번 publish하면 채널의 모든 구독자에게 전달
+# 지금은 프로세스 안에서만 전달하는 InMemoryBroker만 있고, 워커를 여러 개 띄우면 같은 인터페이스로 redis 등을 붙임
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, Iterable, Set
+
+logger = logging.getLogger(__name__)
+
+# 구독자별로 쌓아둘 수 있는 메시지 수, 넘치면 느린 구독자로 보고 연결을 끊음
+SSE_QUEUE_SIZE = int(os.getenv('SSE_QUEUE_SIZE', '16'))
+# 메시지가 없을 때 연결 유지를 위해 보내는 주석 줄 간격(초)
+SSE_HEARTBEAT = float(os.getenv('SSE_HEARTBEAT', '15'))
+
+
+class Subscription:
+    ''' 채널 하나를 구독하는 async iterator, 끊기면(close, 느린 구독자) 반복이 끝남 '''
+
+    _closed = object()
+
+    def __init__(self, broker: Broker, channel: str, maxsize: int):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = False
+
+    def _deliver(self, message: str):
+        # 구독자의 이벤트 루프에서 실행
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # 밀린 메시지는 버리고 종료 표시만 남김
+            self.dropped = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(self._closed)
+            self.broker.unsubscribe(self)
+            logger.info("dropped slow subscriber on %s", self.channel)
+
+    async def get(self, timeout: float = None) -> str | None:
+        ''' 다음 메시지, timeout 동안 없으면 None, 구독이 끝났으면 StopAsyncIteration '''
+        try:
+            message = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if message is self._closed:
+            raise StopAsyncIteration
+        return message
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        return await self.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker(ABC):
+    ''' 채널 이름(question:{id}, user:{id})별 pub/sub 인터페이스
+    publish는 투표수 반영 스레드 등 이벤트 루프 밖에서도 호출할 수 있어야 함 '''
+
+    @abstractmethod
+    def subscribe(self, channel: str) -> Subscription:
+        ...
+
+    @abstractmethod
+    def unsubscribe(self, subscription: Subscription):
+        ...
+
+    @abstractmethod
+    def publish(self, channel: str, message: str) -> int:
+        ''' 전달한 구독자 수를 반환 '''
+
+    def active(self) -> bool:
+        ''' False면 publish할 메시지를 만들 필요가 없음, 외부 broker는 항상 True '''
+        return True
+
+
+class InMemoryBroker(Broker):
+
+    def __init__(self, queue_size: int = SSE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._channels: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(self, channel, self.queue_size)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def publish(self, channel: str, message: str) -> int:
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        if not subscribers:
+            return 0
+
+        # 구독자 수만큼이 아니라 이벤트 루프마다 한 번만 스레드를 넘어감
+        by_loop = {}
+        for subscription in subscribers:
+            by_loop.setdefault(subscription.loop, []).append(subscription)
+        for loop, subscriptions in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(self._fan_out, subscriptions, message)
+            except RuntimeError:  # 닫힌 루프
+                for subscription in subscriptions:
+                    self.unsubscribe(subscription)
+        self.published += 1
+        self.delivered += len(subscribers)
+        return len(subscribers)
+
+    @staticmethod
+    def _fan_out(subscriptions, message: str):
+        for subscription in subscriptions:
+            subscription._deliver(message)
+
+    def active(self) -> bool:
+        return bool(self._channels)
+
+    def stats(self) -> dict:
+        with self._lock:
+            channels = len(self._channels)
+            subscribers = sum(len(s) for s in self._channels.values())
+        return {"channels": channels, "subscribers": subscribers,
+                "published": self.published, "delivered": self.delivered}
+
+
+broker: Broker = InMemoryBroker()
+
+
+async def event_stream(subscription: Subscription, initial: Iterable[str] = (),
+                       heartbeat: float = SSE_HEARTBEAT) -> AsyncIterator[str]:
+    ''' text/event-stream 본문, 현재 상태(initial)를 먼저 보내고 이후 publish된 메시지를 전달
+    클라이언트가 끊으면 StreamingResponse가 취소하고 finally에서 구독 해제 '''
+    try:
+        for message in initial:
+            yield f"data: {message}\n\n"
+        while True:
+            message = await subscription.get(heartbeat)
+            yield ": ping\n\n" if message is None else f"data: {message}\n\n"
+    except StopAsyncIteration:
+        # 느린 구독자로 끊김, 클라이언트는 EventSource 재연결로 다시 구독
+        return
+    finally:
+        subscription.close()
@@ -0,0 +1,125 @@
+# cache.py
+# 외부 API 결과를 잠깐 저장해두는 TTL 캐시와 같은 키 동시 요청을 한 번으로 합치는 single-flight
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class SingleFlight:
+    ''' 같은 key로 동시에 들어온 호출 중 첫 호출만 fn을 실행하고 나머지는 그 결과(또는 예외)를 같이 받음 '''
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0  # 실제로 fn을 실행한 횟수
+        self.shared = 0  # 다른 호출의 결과를 받아간 횟수
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as ex:
+            call.error = ex
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class TTLCache:
+    ''' 만료 시간이 있는 LRU 캐시, 스레드 안전
+    get_or_load는 캐시에 없을 때 같은 key의 동시 로드를 하나로 합침 '''
+
+    def __init__(self, ttl: float, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key, default):
+        item = self._data.get(key)
+        if item is None or item[0] <= time.monotonic():
+            return default
+        self._data.move_to_end(key)
+        return item[1]
+
+    def get(self, key, default=None):
+        missing = object()
+        with self._lock:
+            value = self._lookup(key, missing)
+            if value is missing:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        ''' ttl을 주면 이 항목만 기본 ttl 대신 사용, 0 이하이면 저장하지 않음 '''
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_or_load(self, key, loader, ttl=None):
+        ''' 캐시에 있으면 반환, 없으면 loader()로 가져와 저장, loader의 예외는 저장하지 않음
+        ttl(result)로 결과마다 유지 시간을 정할 수 있음 '''
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+
+        def load():
+            # 앞선 로드가 끝난 직후 들어온 호출은 다시 가져오지 않음
+            with self._lock:
+                cached = self._lookup(key, missing)
+            if cached is not missing:
+                return cached
+            result = loader()
+            self.set(key, result, ttl(result) if ttl is not None else None)
+            return result
+
+        return self._flight.do(key, load)
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._data)
+        return {"size": size, "hits": self.hits, "misses": self.misses,
+                "loads": self._flight.executed, "coalesced": self._flight.shared}
@@ -2,13 +2,20 @@
 # db에 직접 접근하여 create, read, update, delete 하는 함수를 관리하는 파일
 from __future__ import annotations
 
-from typing import List
+from typing import Callable, Dict, List, Set, Tuple
+from sqlalchemy import bindparam, func, insert, select, update
 from sqlalchemy.orm import Session
-from fastapi import HTTPException
-from datetime import datetime
+from fastapi import BackgroundTasks, HTTPException
+from datetime import datetime, timedelta
 from enum import Enum, auto
+from itertools import groupby
 
+import logging
+import os
 import models, schemas
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
 
 
 # StrEnum을 상속받으면 CommentType.text 가 그대로 "text" 가 됨
@@ -45,6 +52,14 @@ class CommentType(StrEnum):
             return False
 
 
+class CommentStatus(StrEnum):
+    ''' 답변 상태 열겨형 변수, 음성 답변은 변조/업로드가 끝나야 done '''
+    queued = auto()
+    processing = auto()
+    done = auto()
+    failed = auto()
+
+
 class QuestionType(StrEnum):
     ''' 질문타입 열겨형 변수 '''
     vote = auto()
@@ -59,84 +74,63 @@ class QuestionType(StrEnum):
             return False
 
 
-def insert_questions(db: Session):
-    file = open("questions.txt", "r", encoding="utf-8")
-    lines = file.readlines()
-    for idx, line in enumerate(lines):
-        line = line.split("|")
-        row = models.RandomQuestion(content=line[0], type=line[1].strip())
-        db.add(row)
-    db.commit()
-    file.close()
-
-
-def get_questions_by_userid(db: Session, user_id: int):
-    return db.query(models.Question).filter(models.Question.user_id == user_id).all()
-
-
-def get_question_by_commentid(db: Session, comment_id: int):
-    comment = get_comment(db, comment_id)
-    if comment is None:
-        raise HTTPException(status_code=404, detail="comment is not found")
-    return db.query(models.Question).filter(models.Question.id == comment.question_id).first()
+# 랜덤 질문 목록 파일, 한 줄에 "질문 내용|타입"
+QUESTIONS_FILE = os.getenv('QUESTIONS_FILE', 'questions.txt')
 
 
-def get_comments_by_questionid(db: Session, question_id: int):
-    return db.query(models.Comment).filter(models.Comment.question_id == question_id).all()
+def read_question_file(path: str = QUESTIONS_FILE) -> Dict[Tuple[str, str], None]:
+    ''' 파일을 한 줄씩 읽어 (content, type) 목록을 순서대로 반환, 중복과 형식이 틀린 줄은 제외 '''
+    pairs = {}
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.split("|")
+            if len(line) < 2 or not line[0]:
+                continue
+            pairs[(line[0], line[1].strip())] = None
+    return pairs
 
 
-def get_comment(db: Session, comment_id: int) -> models.Comment | None:
-    return db.query(models.Comment).get(comment_id)
-
+def insert_questions(db: Session, existing: Set[Tuple[str, str]] = frozenset(), path: str = QUESTIONS_FILE) -> int:
+    ''' 파일의 질문 중 existing에 없는 (content, type)만 INSERT 한 번으로 추가하고 추가한 개수 반환 '''
+    rows = [{"content": content, "type": type, "created_at": datetime.now(), "updated_at": datetime.now()}
+            for content, type in read_question_file(path) if (content, type) not in existing]
+    if rows:
+        db.execute(insert(models.RandomQuestion.__table__).values(rows))
+        db.commit()
+    return len(rows)
+
+
+def sync_questions(db: Session, path: str = QUESTIONS_FILE) -> Dict[str, int]:
+    ''' 파일과 테이블을 비교해 새 질문은 추가하고 파일에서 빠진 질문은 삭제 '''
+    in_file = read_question_file(path)
+    rows = db.query(models.RandomQuestion.id, models.RandomQuestion.content, models.RandomQuestion.type).all()
+    removed_ids = [id for id, content, type in rows if (content, type) not in in_file]
+    if removed_ids:
+        db.query(models.RandomQuestion).filter(models.RandomQuestion.id.in_(removed_ids)) \
+            .delete(synchronize_session=False)
+    added = insert_questions(db, existing={(content, type) for _, content, type in rows}, path=path)
+    db.commit()
+    return {"added": added, "removed": len(removed_ids)}
 
-def get_valid_questions_by_userid(db: Session, user_id: int) -> List[models.Question] | None:
-    return db.query(models.Question).filter(models.Question.user_id == user_id).filter(
-        models.Question.is_deleted == False) \
-        .filter(models.Question.expired == False).all()
 
+# 질문은 생성 후 24시간이 지나면 만료
+QUESTION_LIFETIME = timedelta(days=1)
 
-def get_valid_votequestions_by_userid(db: Session, user_id: int) -> List[models.Question] | None:
-    return db.query(models.Question).filter(models.Question.user_id == user_id).filter(
-        models.Question.is_deleted == False) \
-        .filter(models.Question.type == QuestionType.vote).filter(models.Question.expired == False).all()
 
+def get_expire_line() -> datetime:
+    ''' 이 시각 이전에 생성된 질문은 만료된 질문 '''
+    return datetime.now() - QUESTION_LIFETIME
 
-def get_expired_questions_by_userid(db: Session, user_id: int) -> List[models.Question] | None:
-    return db.query(models.Question).filter(models.Question.is_deleted == False) \
-        .filter(models.Question.user_id == user_id).filter(models.Question.expired == True).all()
 
+def visible_comment_filter() -> tuple:
+    ''' 목록에 보여줄 답변 조건, 삭제된 답변과 변조/업로드가 끝나지 않았거나 실패한 음성 답변은 제외 '''
+    return (models.Comment.is_deleted == False, models.Comment.status == CommentStatus.done)
 
-def get_valid_comments(db: Session, user_id: int, type: str) -> List[models.Comment] | None:
-    # user_id check
-    valid_questions = get_valid_questions_by_userid(db, user_id)
-    if len(valid_questions) < 1:
-        raise HTTPException(status_code=404, detail="Non existent user_id")
 
-    comments = []
-    for q in valid_questions:
-        if (datetime.now() - q.created_at).days >= 1:
-            q.expired = True
-            db.add(q)
-            db.commit()
-            db.refresh(q)
-            continue
-        db_comments = get_comments_by_questionid(db, question_id=q.id)
-        comments += [c for c in db_comments if c.type == type]
-    return comments
-
-# def get_valid_soundcomments(db: Session, user_id: int):
-#     valid_questions = get_valid_questions_by_userid(db, user_id)
-#     comments = []
-#     for q in valid_questions:
-#         if (datetime.now() - q.created_at).days >= 1:
-#             q.expired = True
-#             db.add(q)
-#             db.commit()
-#             db.refresh(q)
-#             continue
-#         db_comments = get_comments_by_questionid(db, question_id=q.id)
-#         comments += [c for c in db_comments if c.type == "sound"]
-#     return comments
+def valid_question_filter(user_id: int) -> tuple:
+    ''' user의 삭제/만료되지 않은 질문 조건, async_crud의 조회에서 사용 '''
+    return (models.Question.user_id == user_id, models.Question.is_deleted == False,
+            models.Question.expired == False, models.Question.created_at > get_expire_line())
 
 
 def get_user(db: Session, user_id: int):
@@ -152,30 +146,52 @@ def get_question(db: Session, question_id: int) -> models.Question | None:
     return db.query(models.Question).filter(models.Question.id == question_id).first()
 
 
-def get_valid_questions(db: Session, question_id: int):
-    question = get_question(db=db, question_id=question_id)
-    if question is None:
-        raise HTTPException(status_code=404, detail="Question is not found")
-    if question.expired:  # question의 expired가 True면
-        raise HTTPException(status_code=404, detail="expired Link")  # 예외발생
-    elif (datetime.now() - question.created_at).days < 1:  # 24시간이 안 지났으면
-        return question  # 질문 반환
-    else:  # 24시간이 지났으면
-        question.expired = True  # question의 expired를 False로 변경
-        db.add(question)
+def expire_questions(db: Session, batch_size: int) -> int:
+    ''' 24시간이 지난 질문을 batch_size개씩 만료 처리하고 처리한 개수를 반환 '''
+    expire_line = get_expire_line()
+    total = 0
+    while True:
+        # ix_question_expiry(expired, created_at) 순서 그대로 읽도록 오래된 질문부터 (id 순이면 pk 전체 스캔)
+        ids = [id for (id,) in db.query(models.Question.id).filter(models.Question.expired == False)
+               .filter(models.Question.created_at <= expire_line)
+               .order_by(models.Question.created_at, models.Question.id).limit(batch_size)]
+        if not ids:
+            break
+        db.query(models.Question).filter(models.Question.id.in_(ids)) \
+            .update({models.Question.expired: True, models.Question.updated_at: datetime.now()},
+                    synchronize_session=False)
         db.commit()
-        db.refresh(question)
-        raise HTTPException(status_code=404, detail="expired Link")
+        total += len(ids)
+        if len(ids) < batch_size:
+            break
+    return total
+
 
+# 질문과 선택지를 한 번에 조회 (D-9, D-11, D-12 조회와 vote_counter의 broker 발행에서 같이 사용)
+def vote_results_query(*criteria):
+    ''' 투표 질문별 결과(선택지 순서대로)를 만들기 위한 행, criteria로 질문을 거름 '''
+    return select(models.Question.id, models.Question.user_id, models.Question.created_at,
+                  models.VoteOption.content, models.VoteOption.count, models.VoteOption.updated_at) \
+        .join(models.VoteOption, (models.VoteOption.question_id == models.Question.id)
+              & (models.VoteOption.is_deleted == False)) \
+        .where(*criteria).order_by(models.Question.id, models.VoteOption.num, models.VoteOption.id)
 
-def get_random_question(db: Session, question_type: str):
-    return db.query(models.RandomQuestion).filter(models.RandomQuestion.type == question_type).all()
 
+def build_vote_results(rows) -> List[Tuple[int, schemas.VoteResult]]:
+    ''' vote_results_query 결과를 질문별 (user_id, VoteResult)로 묶음 '''
+    results = []
+    for question_id, group in groupby(rows, key=lambda row: row.id):
+        group = list(group)
+        results.append((group[0].user_id, schemas.VoteResult(
+            question_id=question_id, options=[row.content for row in group], count=[row.count for row in group],
+            created_at=group[0].created_at, updated_at=max(row.updated_at for row in group))))
+    return results
 
-# question id가 일치하는 옵션 모두 리스트로 반환
-def get_vote_options(db: Session, question_id: int) -> List[models.VoteOption] | None:
-    options = db.query(models.VoteOption).filter(models.VoteOption.question_id == question_id).all()
-    return options
+
+def get_vote_results_by_option_ids(db: Session, vote_option_ids) -> List[Tuple[int, schemas.VoteResult]]:
+    ''' 선택지 id들이 속한 투표 질문들의 현재 결과 '''
+    question_ids = select(models.VoteOption.question_id).where(models.VoteOption.id.in_(list(vote_option_ids)))
+    return build_vote_results(db.execute(vote_results_query(models.Question.id.in_(question_ids))).all())
 
 
 def create_user(db: Session, user: schemas.UserCreate) -> models.User | None:
@@ -186,7 +202,7 @@ def create_user(db: Session, user: schemas.UserCreate) -> models.User | None:
         db.refresh(db_user)
         return db_user
     except Exception as ex:
-        print(ex)
+        logger.exception("failed to create user %s", user.insta_id)
         return ex
 
 
@@ -194,11 +210,13 @@ def update_user(db: Session, user: schemas.UserCreate):
     db_user = db.query(models.User).filter_by(insta_id=user.insta_id).first()
     if db_user == None:
         return -1  # 'insta_id_not_found'
-    db_user.username = user.username
-    db_user.full_name = user.full_name
-    db_user.follower = user.follower
-    db_user.following = user.following
-    db_user.profile_image_url = user.profile_image_url
+    # 프로필이 그대로면 쓰기 없이 반환
+    fields = ("username", "full_name", "follower", "following", "profile_image_url")
+    if not db_user.is_deleted and all(getattr(db_user, f) == getattr(user, f) for f in fields):
+        return db_user
+
+    for f in fields:
+        setattr(db_user, f, getattr(user, f))
     db_user.is_deleted = False
     db_user.updated_at = datetime.now()
 
@@ -208,7 +226,26 @@ def update_user(db: Session, user: schemas.UserCreate):
     return db_user
 
 
-def delete_user(db: Session, user_id: int):
+# 삭제할 질문이 이보다 많으면 (BackgroundTasks를 받은 경우) 응답 후 배치로 나눠 삭제
+DELETE_BATCH_SIZE = int(os.getenv('DELETE_BATCH_SIZE', '500'))
+
+
+def soft_delete_questions(db: Session, *criteria) -> int:
+    ''' criteria에 맞는 삭제 안 된 질문과 그 답변, 투표 선택지를 UPDATE 세 번으로 soft delete, commit은 호출하는 쪽에서
+    삭제한 질문 수를 반환 '''
+    now = datetime.now()
+    criteria = (models.Question.is_deleted == False, *criteria)
+    question_ids = select(models.Question.id).where(*criteria)
+    # 질문을 먼저 지우면 위 조건으로 자식을 찾을 수 없으므로 자식부터
+    for child in (models.Comment, models.VoteOption):
+        db.execute(update(child).where(child.question_id.in_(question_ids)).where(child.is_deleted == False)
+                   .values(is_deleted=True, updated_at=now).execution_options(synchronize_session=False))
+    result = db.execute(update(models.Question).where(*criteria)
+                        .values(is_deleted=True, updated_at=now).execution_options(synchronize_session=False))
+    return result.rowcount
+
+
+def delete_user(db: Session, user_id: int, background_tasks: BackgroundTasks | None = None):
     db_user = db.query(models.User).filter_by(id=user_id).first()
     if db_user == None:
         raise HTTPException(status_code=404, detail="user is not found")
@@ -217,29 +254,44 @@ def delete_user(db: Session, user_id: int):
 
     db_user.is_deleted = True
     db_user.updated_at = datetime.now()
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
 
-    # 해당 user가 가진 question까지 삭제
-    delete_question_by_user_id(db, user_id)
+    # 질문이 많은 계정은 user만 먼저 삭제하고 응답, 질문들은 응답 후 배치로 삭제
+    n_questions = db.query(func.count(models.Question.id)) \
+        .filter(models.Question.user_id == user_id, models.Question.is_deleted == False).scalar()
+    if background_tasks is not None and n_questions > DELETE_BATCH_SIZE:
+        db.commit()
+        background_tasks.add_task(delete_questions_in_batches, user_id)
+        return {}
 
+    # 해당 user가 가진 question, comment, vote option까지 한 트랜잭션으로 삭제
+    delete_question_by_user_id(db, user_id)
     return {}
 
 
 # question soft delete - user id로 삭제
-def delete_question_by_user_id(db: Session, user_id: int):
+def delete_question_by_user_id(db: Session, user_id: int) -> int:
     # user_id 해당되는 question데이터까지 삭제(soft)
-    db_questions = db.query(models.Question).filter_by(user_id=user_id, is_deleted=False).all()
+    deleted = soft_delete_questions(db, models.Question.user_id == user_id)
+    db.commit()
+    return deleted
 
-    if db_questions == None:
-        return
-    for q in db_questions:
-        q.is_deleted = True
-        q.updated_at = datetime.now()
-        db.add(q)
-        db.commit()
-        db.refresh(q)
+
+def delete_questions_in_batches(user_id: int, batch_size: int | None = None) -> int:
+    ''' 질문 batch_size개(기본 DELETE_BATCH_SIZE)씩 나눠서 삭제하고 배치마다 commit, 락을 짧게 잡기 위해 BackgroundTasks에서 사용 '''
+    batch_size = batch_size or DELETE_BATCH_SIZE
+    db = SessionLocal()
+    total = 0
+    try:
+        while True:
+            ids = [id for id, in db.query(models.Question.id)
+                   .filter(models.Question.user_id == user_id, models.Question.is_deleted == False)
+                   .order_by(models.Question.id).limit(batch_size)]
+            if not ids:
+                return total
+            total += soft_delete_questions(db, models.Question.id.in_(ids))
+            db.commit()
+    finally:
+        db.close()
 
 
 # question soft delete - question id로 삭제
@@ -250,11 +302,9 @@ def delete_question_by_question_id(db: Session, question_id: int):
     if db_question.is_deleted:
         raise HTTPException(status_code=405, detail="question is already deleted")
 
-    db_question.is_deleted = True
-    db_question.updated_at = datetime.now()
-    db.add(db_question)
+    # 답변, 투표 선택지까지 한 트랜잭션으로 삭제
+    soft_delete_questions(db, models.Question.id == question_id)
     db.commit()
-    db.refresh(db_question)
 
     return {}
 
@@ -307,48 +357,63 @@ def create_question(db: Session, question: schemas.QuestionCreate):
     return db_question
 
     
-def create_vote_question(db: Session, vote_question: schemas.BaseVote):
-    if get_user(db=db, user_id=vote_question.user_id) is None:  # user_id 존재여부 검사
-        raise HTTPException(status_code=404, detail="Non existent ID")
-
-    db_question = models.Question(vote_question, True) #vote 생성자 선택을 위한 인자 1
+def create_vote_question(db: Session, vote_question: schemas.VoteCreate) -> int:
+    ''' 투표 질문과 선택지를 한 트랜잭션으로 저장하고 질문 id를 반환
+    질문 INSERT 한 번, 선택지 multi-row INSERT 한 번, refresh 없음 '''
+    get_user(db=db, user_id=vote_question.user_id)  # user_id 존재여부, 삭제여부 검사
 
     if len(vote_question.content) > models.word_limit["Vote_content_limit"]:  # content 길이 검사
         raise HTTPException(status_code=404, detail="글자수 초과")
 
-    db.add(db_question)
-    db.commit()
-    db.refresh(db_question)
-    return db_question
+    db_question = models.Question(vote_question, True) #vote 생성자 선택을 위한 인자 1
+    try:
+        db.add(db_question)
+        db.flush()  # 질문 id 할당
+        question_id = db_question.id
+        now = datetime.now()
+        db.execute(insert(models.VoteOption.__table__).values(
+            [{"num": i + 1, "content": content, "count": 0, "question_id": question_id,
+              "created_at": now, "updated_at": now} for i, content in enumerate(vote_question.option)]))
+        db.commit()
+    except Exception:
+        # 선택지 저장에 실패하면 질문도 남기지 않음
+        db.rollback()
+        raise
+    return question_id
 
 
-def update_vote_count(db: Session, vote_option_id: int) -> models.VoteOption | None:
-    db_vote_option = db.query(models.VoteOption).filter_by(id=vote_option_id).first()
+def get_vote_option(db: Session, vote_option_id: int) -> models.VoteOption:
+    db_vote_option = db.query(models.VoteOption) \
+        .filter(models.VoteOption.id == vote_option_id, models.VoteOption.is_deleted == False).first()
     if db_vote_option is None:
         raise HTTPException(status_code=404, detail="vote_option not found")
-    db_vote_option.count += 1
-    db_vote_option.updated_at = datetime.now()
-    db.add(db_vote_option)
-    db.commit()
-    db.refresh(db_vote_option)
     return db_vote_option
 
 
-# 투표 질문 선택지 생성
-def create_vote_option(db: Session, question_id: int, option: List[str]):
-    created_option = []
-
-    if get_question(db=db, question_id=question_id) is None:
-        raise HTTPException(status_code=404, detail="Non existent Question")
+def update_vote_count(db: Session, vote_option_id: int) -> models.VoteOption | None:
+    # 읽고 더해서 쓰면 동시 투표 시 증가분이 사라지므로 DB에서 count = count + 1 로 처리
+    updated = db.query(models.VoteOption) \
+        .filter(models.VoteOption.id == vote_option_id, models.VoteOption.is_deleted == False) \
+        .update({models.VoteOption.count: models.VoteOption.count + 1,
+                 models.VoteOption.updated_at: datetime.now()}, synchronize_session=False)
+    if updated == 0:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="vote_option not found")
+    db.commit()
+    return get_vote_option(db, vote_option_id)
 
-    for i in range(0, len(option)):  # 옵션의 개수만큼 vote comment에 저장
-        db_vote_option = models.VoteOption(num=i + 1, content=option[i], question_id=question_id)
-        db.add(db_vote_option)
-        db.commit()
-        db.refresh(db_vote_option)
-        created_option.append(option[i])
 
-    return created_option
+def add_vote_counts(db: Session, increments: Dict[int, int]):
+    ''' {vote_option_id: 증가량} 을 한 트랜잭션, 한 번의 executemany로 반영 '''
+    if not increments:
+        return
+    now = datetime.now()
+    table = models.VoteOption.__table__
+    stmt = update(table).where(table.c.id == bindparam("option_id")) \
+        .values(count=table.c.count + bindparam("increment"), updated_at=bindparam("now"))
+    db.execute(stmt, [{"option_id": option_id, "increment": n, "now": now}
+                      for option_id, n in increments.items()])
+    db.commit()
 
 
 def create_comment(db: Session, comment: schemas.CommentCreate) -> models.Comment | None:
@@ -361,13 +426,18 @@ def create_comment(db: Session, comment: schemas.CommentCreate) -> models.Commen
     return db_comment
 
 
-def create_sound_comment(db: Session, question_id: int):
+def create_sound_comment(db: Session, question_id: int, on_created: Callable[[int], None] | None = None):
+    ''' url 없이 queued 상태로 저장, on_created(comment_id)는 commit 전에 호출되고 예외가 나면 저장하지 않음 '''
     if not CommentType.compare_two_type(get_question_comment_type(db, question_id), CommentType.sound):
         raise HTTPException(status_code=405, detail="unsupported comment_type")
-    db_comment = models.Comment(content="", type=CommentType.sound, question_id=question_id)
+    db_comment = models.Comment(content="", type=CommentType.sound, question_id=question_id,
+                                status=CommentStatus.queued)
     if db_comment is None:
         raise HTTPException(status_code=500, detail="Internal Server Error")
     db.add(db_comment)
+    db.flush()
+    if on_created is not None:
+        on_created(db_comment.id)
     db.commit()
     db.refresh(db_comment)
     return db_comment
@@ -377,11 +447,19 @@ def update_sound_comment(db: Session, comment_id: int, content: str):
     db_voice_comment = db.query(models.Comment).get(comment_id)
     if db_voice_comment:
         db_voice_comment.content = content
+        db_voice_comment.status = CommentStatus.done
         db.commit()
         db.refresh(db_voice_comment)
 
     return db_voice_comment
 
 
+def fail_sound_comment(db: Session, comment_id: int):
+    ''' 변조/업로드를 끝내 못한 음성 답변은 failed로 남겨 목록(D-8)에서 빠지게 함 '''
+    db.query(models.Comment).filter(models.Comment.id == comment_id) \
+        .update({models.Comment.status: CommentStatus.failed}, synchronize_session=False)
+    db.commit()
+
+
 def get_question_comment_type(db: Session, question_id: int):
     return get_question(db=db, question_id=question_id).comment_type
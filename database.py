@@ -1,11 +1,19 @@
 # database.py
 # database 연결과 관련된 파일
 
-from sqlalchemy import create_engine
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from dotenv import load_dotenv
 
+from metrics import Histogram
+
 
 
 import os
@@ -13,18 +21,133 @@ import os
 # 환경변수 로드
 load_dotenv()
 
-# DB 주소
-DB_URL = (f"mysql+pymysql://{os.getenv('MYSQL_USER')}" +
+# DB 주소, DATABASE_URL이 있으면 그 주소를 사용 (로컬 DB로 벤치마크할 때 등)
+DB_URL = os.getenv('DATABASE_URL') or (f"mysql+pymysql://{os.getenv('MYSQL_USER')}" +
           f":{os.getenv('MYSQL_ROOT_PASSWORD')}@{os.getenv('MYSQL_HOST')}" +
           f":{os.getenv('MYSQL_PORT')}/{os.getenv('MYSQL_DATABASE')}?charset=utf8mb4")
 
+# 읽기 전용 replica 주소, DATABASE_REPLICA_URL 또는 MYSQL_REPLICA_HOST(계정, DB 이름은 primary와 같음)
+# 둘 다 없으면 읽기도 primary로
+DB_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL') or (os.getenv('MYSQL_REPLICA_HOST') and (
+    f"mysql+pymysql://{os.getenv('MYSQL_USER')}:{os.getenv('MYSQL_ROOT_PASSWORD')}" +
+    f"@{os.getenv('MYSQL_REPLICA_HOST')}:{os.getenv('MYSQL_REPLICA_PORT', os.getenv('MYSQL_PORT'))}" +
+    f"/{os.getenv('MYSQL_DATABASE')}?charset=utf8mb4"))
+# false로 두면 replica가 설정되어 있어도 읽기를 primary로 (replica 장애, 지연이 클 때)
+DB_READ_FROM_REPLICA = os.getenv('DB_READ_FROM_REPLICA', 'true').lower() in ('1', 'true', 'yes')
+
+# sqlite는 스레드풀에서 같은 커넥션을 쓰기 위해 옵션 필요
+connect_args = {"check_same_thread": False} if DB_URL.startswith("sqlite") else {}
+
+# 커넥션 풀 설정, MySQL은 wait_timeout이 지난 idle 커넥션을 끊으므로 recycle, pre_ping 사용
+pool_options = {
+    "pool_size": int(os.getenv('DB_POOL_SIZE', '5')),
+    "max_overflow": int(os.getenv('DB_MAX_OVERFLOW', '10')),
+    "pool_timeout": float(os.getenv('DB_POOL_TIMEOUT', '30')),
+    "pool_recycle": int(os.getenv('DB_POOL_RECYCLE', '1800')),
+    "pool_pre_ping": os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes'),
+}
+
+
+class PoolStats:
+    ''' 커넥션 풀의 checkout 대기 시간(ms)과 invalidate 횟수 '''
+
+    def __init__(self):
+        self.checkout_wait = Histogram([1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000])
+        self.invalidations = 0
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception):
+        self.invalidations += 1
+
+
+def timed_pool(base, stats: PoolStats):
+    ''' 커넥션을 얻을 때까지 기다린 시간을 stats에 기록하는 풀 클래스 '''
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return base._do_get(self)
+        finally:
+            stats.checkout_wait.observe((time.perf_counter() - start) * 1000)
+
+    # 풀을 다시 만들 때(dispose 등)도 같은 stats를 쓰도록 클래스에 묶어둠
+    # 로거 이름이 sqlalchemy.pool 아래로 유지되도록 __module__도 그대로 둠
+    return type(f"Timed{base.__name__}", (base,), {"_do_get": _do_get, "__module__": base.__module__})
+
+
+def pool_status(engine, stats: PoolStats) -> dict:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "invalidations": stats.invalidations,
+        "checkout_wait_ms": stats.checkout_wait.snapshot(),
+    }
+
 
 # sqlalchemy 엔진, main.py에서 사용
-engine = create_engine(DB_URL, encoding = 'utf8')
+pool_stats = PoolStats()
+engine = create_engine(DB_URL, encoding = 'utf8', connect_args=connect_args,
+                       poolclass=timed_pool(QueuePool, pool_stats), **pool_options)
+event.listen(engine, "invalidate", pool_stats.on_invalidate)
 
 # 데이터베이스 세션클래스, 이를 이용해 생성한 인스턴스로 DB에 접근해서 CRUD가능
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# async 라우터용 엔진, 같은 DB에 비동기 드라이버(aiomysql)로 접속
+async_drivers = {"mysql+pymysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+db_url = make_url(DB_URL)
+ASYNC_DB_URL = db_url.set(drivername=async_drivers.get(db_url.drivername, db_url.drivername))
+async_pool_stats = PoolStats()
+async_engine = create_async_engine(ASYNC_DB_URL, poolclass=timed_pool(AsyncAdaptedQueuePool, async_pool_stats),
+                                   **pool_options)
+event.listen(async_engine.sync_engine, "invalidate", async_pool_stats.on_invalidate)
+
+# 비동기 세션클래스, async_crud.py에서 사용
+AsyncSessionLocal = sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine, class_=AsyncSession)
+
+
+class ReadOnlySession(Session):
+    ''' replica용 세션, 객체를 추가/수정/삭제한 채 flush하면 예외 (쓰기는 primary 세션으로) '''
+
+
+@event.listens_for(ReadOnlySession, "before_flush")
+def reject_writes(session, flush_context, instances):
+    if session.new or session.dirty or session.deleted:
+        raise InvalidRequestError("read-only session: write with get_db / get_async_db")
+
+
+# 읽기 전용 엔진과 세션, replica가 없거나 DB_READ_FROM_REPLICA=false면 primary 엔진을 같이 씀
+# 방금 쓴 내용을 바로 읽어야 하는 조회(로그인 직후 user, 작성한 답변, 음성 작업 상태)는 replica 지연 때문에 primary 사용
+read_replica = bool(DB_REPLICA_URL) and DB_READ_FROM_REPLICA
+if read_replica:
+    replica_url = make_url(DB_REPLICA_URL)
+    read_pool_stats = PoolStats()
+    replica_connect_args = {"check_same_thread": False} if replica_url.get_backend_name() == "sqlite" else {}
+    read_engine = create_engine(replica_url, encoding='utf8', connect_args=replica_connect_args,
+                                poolclass=timed_pool(QueuePool, read_pool_stats), **pool_options)
+    event.listen(read_engine, "invalidate", read_pool_stats.on_invalidate)
+    async_read_pool_stats = PoolStats()
+    async_read_engine = create_async_engine(
+        replica_url.set(drivername=async_drivers.get(replica_url.drivername, replica_url.drivername)),
+        poolclass=timed_pool(AsyncAdaptedQueuePool, async_read_pool_stats), **pool_options)
+    event.listen(async_read_engine.sync_engine, "invalidate", async_read_pool_stats.on_invalidate)
+else:
+    read_engine, read_pool_stats = engine, pool_stats
+    async_read_engine, async_read_pool_stats = async_engine, async_pool_stats
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine, class_=ReadOnlySession)
+AsyncReadSessionLocal = sessionmaker(autoflush=False, expire_on_commit=False, bind=async_read_engine,
+                                     class_=AsyncSession, sync_session_class=ReadOnlySession)
+
+
+def engines() -> dict:
+    ''' 이름별 (sync engine, PoolStats), replica를 쓰면 read, async_read가 추가됨 (풀 상태, 지표용) '''
+    result = {"sync": (engine, pool_stats), "async": (async_engine.sync_engine, async_pool_stats)}
+    if read_replica:
+        result["read"] = (read_engine, read_pool_stats)
+        result["async_read"] = (async_read_engine.sync_engine, async_read_pool_stats)
+    return result
+
 # DB모델이나 클래스를 만들기 위해 선언한 클래스(후에 상속해서 사용)
 Base = declarative_base()
 
@@ -34,4 +157,24 @@ def get_db():
         db = SessionLocal()
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db():
+    ''' 읽기 전용 세션 (replica가 없으면 primary) '''
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db():
+    ''' GET 라우트용 읽기 전용 비동기 세션 (replica가 없으면 primary) '''
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -0,0 +1,33 @@
+# etags.py
+# 조회 API의 ETag 생성과 If-None-Match 비교, 버전(updated_at, 투표수 합 등)만 조회해서 304로 응답할 때 사용
+
+import hashlib
+from typing import Optional
+
+from fastapi import Response
+
+# 캐시는 하되 매번 ETag로 재검증
+REVALIDATE = "no-cache"
+
+
+def make_etag(*parts) -> str:
+    ''' 버전을 이루는 값들로 만든 strong ETag '''
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def matches(if_none_match: Optional[str], etag: str) -> bool:
+    ''' If-None-Match는 "a", "b" 목록이나 W/"a", * 일 수 있음 '''
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": REVALIDATE})
+
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = REVALIDATE
@@ -0,0 +1,62 @@
+# expiry.py
+# 24시간이 지난 질문을 주기적으로 만료 처리하는 스케줄러, main.py 시작 시 실행
+
+import logging
+import os
+import threading
+
+import crud
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# 만료 처리 주기(초)와 한 번에 UPDATE할 질문 수
+EXPIRY_INTERVAL = float(os.getenv('EXPIRY_INTERVAL', '60'))
+EXPIRY_BATCH_SIZE = int(os.getenv('EXPIRY_BATCH_SIZE', '500'))
+
+
+class ExpiryScheduler:
+    ''' interval마다 crud.expire_questions를 batch_size 단위로 실행 '''
+
+    def __init__(self, interval: float = EXPIRY_INTERVAL, batch_size: int = EXPIRY_BATCH_SIZE):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="expiry-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def sweep(self) -> int:
+        db = SessionLocal()
+        try:
+            count = crud.expire_questions(db, self.batch_size)
+        except Exception:
+            db.rollback()
+            logger.exception("question expiry sweep failed")
+            return 0
+        finally:
+            db.close()
+        logger.info("expired %d questions", count)
+        return count
+
+    def _run(self):
+        # 시작하자마자 한 번 처리하고 이후 interval마다 반복
+        while True:
+            self.sweep()
+            if self._stop.wait(self.interval):
+                break
+
+
+scheduler = ExpiryScheduler()
@@ -0,0 +1,102 @@
+# fake_instagram.py
+# 로컬에서 띄우는 가짜 인스타그램 API, 응답 지연과 실패를 주입할 수 있음 (tests/, benchmarks/에서 사용)
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeInstagram:
+    ''' insta.InstagramClient가 호출하는 엔드포인트만 흉내내는 HTTP 서버 context manager
+    delay: 모든 응답 전 대기 시간(초), fail_rate: 503으로 응답할 확률, fail_first: 처음 몇 개 요청을 503으로 응답할지 '''
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0, fail_rate: float = 0.0,
+                 fail_first: int = 0):
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.fail_first = fail_first
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body: dict):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _handle(self):
+                with fake._lock:
+                    fake.requests += 1
+                    failing = fake.requests <= fake.fail_first
+                if fake.delay:
+                    time.sleep(fake.delay)
+                if failing or (fake.fail_rate and random.random() < fake.fail_rate):
+                    return self._reply(503, {"error": "unavailable"})
+
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                token = query.get("access_token", ["token"])[0]
+                if url.path == "/oauth/access_token":
+                    self._reply(200, {"access_token": "short-token", "user_id": 1})
+                elif url.path in ("/access_token", "/refresh_access_token"):
+                    self._reply(200, {"access_token": f"long-{token}", "token_type": "bearer",
+                                      "expires_in": 5184000})
+                elif url.path == "/me":
+                    self._reply(200, {"username": f"user_{token}", "id": token})
+                elif url.path == "/api/v1/users/web_profile_info/":
+                    username = query["username"][0]
+                    self._reply(200, {"data": {"user": {
+                        "id": username.removeprefix("user_"), "full_name": username,
+                        "edge_followed_by": {"count": 100}, "edge_follow": {"count": 50},
+                        "profile_pic_url": f"https://example.com/{username}.jpg"}}})
+                else:
+                    self._reply(404, {"error": "not found"})
+
+            def do_GET(self):
+                self._handle()
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self._handle()
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+
+            def handle_error(self, request, client_address):
+                # timeout으로 클라이언트가 먼저 끊은 경우라 무시
+                pass
+
+        self.server = Server((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def client_kwargs(self) -> dict:
+        ''' InstagramClient가 이 서버를 바라보도록 하는 base url 인자 '''
+        return {"api_url": self.url, "graph_url": self.url, "web_url": self.url}
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
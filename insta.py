@@ -1,89 +1,175 @@
-import os, requests, schemas
-
-from dotenv import load_dotenv
-from fastapi import HTTPException
-
-# 환경변수 로드
-load_dotenv()
-# 인스타 로그인 및 프로필 정보 가져오기 및 유저 관련 API
-app_id = os.getenv('INSTA_APP_ID')
-secret_id = os.getenv('INSTA_APP_SECRET_ID')
-redirect_url = "https://letstikitaka.com/redirect"
-# authorize_url = f"https://api.instagram.com/oauth/authorize?client_id={app_id}&redirect_uri={redirect_url}&scope=user_profile,user_media&response_type=code"
-get_short_token_url = "https://api.instagram.com/oauth/access_token"
-get_user_name_url = "https://graph.instagram.com/me?fields=username&access_token="
-get_user_info_url = "https://i.instagram.com/api/v1/users/web_profile_info/?username="
-get_long_token_url = f"https://graph.instagram.com/access_token?grant_type=ig_exchange_token&client_secret={secret_id}&access_token="
-refresh_token_url = "https://graph.instagram.com/refresh_access_token?grant_type=ig_refresh_token&access_token="
-
-
-# 단기 토큰 얻기
-def get_short_token(code: str):
-    data = {
-        'client_id': app_id,
-        'client_secret': secret_id,
-        'code': code,
-        'grant_type': 'authorization_code',
-        'redirect_uri': redirect_url
-    }
-    headers = {'Content-Type': 'application/x-www-form-urlencoded', 'charset': 'UTF-8', 'Accept': '*/*'}
-    try:
-        res = requests.post(get_short_token_url, headers = headers, data = data).json()
-        # 유효하지 않은 코드면
-        if 'error_type' in res:
-            raise HTTPException(status_code=404, detail=res['error_message'])
-            # 적절한 페이지로 이동시키기
-        else: return res["access_token"]
-    except Exception as ex:
-        print(ex.args)
-
-
-# 장기 토큰 얻기
-def get_long_token(short_access_token: str):
-    try:
-        res = requests.get(get_long_token_url+short_access_token).json()
-        return res
-    except Exception as ex:
-        print(ex.args)
-
-
-def get_refresh_token(long_access_token: str):
-    try:
-        refresh_token = requests.get(refresh_token_url+long_access_token).json()
-        return refresh_token
-    except Exception as ex:
-        return -1
-
-
-# 엑세스 토큰으로 user info 반환
-def get_user_info(access_token: str):
-    try:
-        # 엑세스 토큰을 통해 user 정보 받아오기에 필요한 username을 가져온다.
-        username = requests.get(get_user_name_url + access_token).json()["username"]
-        
-        # 만약 헤더 오류 시 아래 api로 대체
-        # user_info = requests.get(f'https://www.instagram.com/web/search/topsearch/?query={username}')
-        
-        # 헤더 정보에 대해서는 좀 더 알아보고 나중에 수정
-        headers = {
-            'user-agent':'Mozilla/5.0 (iPhone; CPU iPhone OS 12_3_1 like Mac OS X) \
-                AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148 Instagram 105.0.0.11.118 \
-                    (iPhone11,8; iOS 12_3_1; en_US; en-US; scale=2.00; 828x1792; 165586599)'
-        }
-        # username으로 user 정보 가져오는 api 호출
-        user_info = requests.get(get_user_info_url + username, headers=headers).json()['data']['user']
-        
-        insta_id = user_info['id']
-        full_name = user_info['full_name']
-        follower = user_info['edge_followed_by']['count']
-        following = user_info['edge_follow']['count']
-        profile_image_url = user_info['profile_pic_url']
-
-        user_create_data = schemas.UserCreate(insta_id=insta_id, username=username,\
-        full_name=full_name, follower=follower, following=following, \
-            profile_image_url=profile_image_url)
-
-        return user_create_data
-
-    except Exception as ex:
-        print(ex.args)
\ No newline at end of file
+import logging
+import os
+from functools import partial
+
+import anyio
+import requests
+import schemas
+
+from cache import TTLCache
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# 환경변수 로드
+load_dotenv()
+# 인스타 로그인 및 프로필 정보 가져오기 및 유저 관련 API
+app_id = os.getenv('INSTA_APP_ID')
+secret_id = os.getenv('INSTA_APP_SECRET_ID')
+redirect_url = "https://letstikitaka.com/redirect"
+
+# 로컬 가짜 서버로 테스트할 때는 주소를 바꿔서 사용
+api_url = os.getenv('INSTA_API_URL', 'https://api.instagram.com')
+graph_url = os.getenv('INSTA_GRAPH_URL', 'https://graph.instagram.com')
+web_url = os.getenv('INSTA_WEB_URL', 'https://i.instagram.com')
+
+# authorize_url = f"https://api.instagram.com/oauth/authorize?client_id={app_id}&redirect_uri={redirect_url}&scope=user_profile,user_media&response_type=code"
+
+# 연결/응답 대기 시간(초), 재시도 횟수와 간격, 커넥션 풀 크기, async에서 동시에 보낼 요청 수
+INSTA_CONNECT_TIMEOUT = float(os.getenv('INSTA_CONNECT_TIMEOUT', '3'))
+INSTA_READ_TIMEOUT = float(os.getenv('INSTA_READ_TIMEOUT', '5'))
+INSTA_RETRIES = int(os.getenv('INSTA_RETRIES', '2'))
+INSTA_BACKOFF = float(os.getenv('INSTA_BACKOFF', '0.3'))
+INSTA_POOL_SIZE = int(os.getenv('INSTA_POOL_SIZE', '20'))
+INSTA_MAX_CONCURRENCY = int(os.getenv('INSTA_MAX_CONCURRENCY', '20'))
+# 프로필 캐시 유지 시간(초), 0이면 캐시하지 않음
+INSTA_PROFILE_TTL = float(os.getenv('INSTA_PROFILE_TTL', '300'))
+
+# 헤더 정보에 대해서는 좀 더 알아보고 나중에 수정
+user_info_headers = {
+    'user-agent':'Mozilla/5.0 (iPhone; CPU iPhone OS 12_3_1 like Mac OS X) \
+        AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148 Instagram 105.0.0.11.118 \
+            (iPhone11,8; iOS 12_3_1; en_US; en-US; scale=2.00; 828x1792; 165586599)'
+}
+
+
+class InstagramClient:
+    ''' keep-alive 커넥션 풀을 쓰는 인스타그램 API client, 모든 요청에 timeout과 재시도 적용
+    a로 시작하는 메소드는 async 라우터에서 쓰는 비동기 버전 '''
+
+    def __init__(self, connect_timeout: float = INSTA_CONNECT_TIMEOUT, read_timeout: float = INSTA_READ_TIMEOUT,
+                 retries: int = INSTA_RETRIES, backoff: float = INSTA_BACKOFF, pool_size: int = INSTA_POOL_SIZE,
+                 max_concurrency: int = INSTA_MAX_CONCURRENCY,
+                 api_url: str = api_url, graph_url: str = graph_url, web_url: str = web_url,
+                 profile_ttl: float = INSTA_PROFILE_TTL):
+        self.get_short_token_url = f"{api_url}/oauth/access_token"
+        self.get_user_name_url = f"{graph_url}/me?fields=username&access_token="
+        self.get_user_info_url = f"{web_url}/api/v1/users/web_profile_info/?username="
+        self.get_long_token_url = f"{graph_url}/access_token?grant_type=ig_exchange_token&client_secret={secret_id}&access_token="
+        self.refresh_token_url = f"{graph_url}/refresh_access_token?grant_type=ig_refresh_token&access_token="
+        self.timeout = (connect_timeout, read_timeout)
+        # 코드 교환(POST)은 한 번만 쓸 수 있으므로 GET만 재시도
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset({"GET"}), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.max_concurrency = max_concurrency
+        self._limiter = None
+        # access_token -> username, username -> 프로필
+        # 캐시가 없을 때도 같은 키의 동시 요청은 upstream 호출 한 번으로 합쳐짐
+        self.usernames = TTLCache(profile_ttl)
+        self.profiles = TTLCache(profile_ttl)
+
+    def _get(self, url: str, **kwargs) -> dict:
+        return self.session.get(url, timeout=self.timeout, **kwargs).json()
+
+    # 단기 토큰 얻기
+    def get_short_token(self, code: str):
+        data = {
+            'client_id': app_id,
+            'client_secret': secret_id,
+            'code': code,
+            'grant_type': 'authorization_code',
+            'redirect_uri': redirect_url
+        }
+        headers = {'Content-Type': 'application/x-www-form-urlencoded', 'charset': 'UTF-8', 'Accept': '*/*'}
+        try:
+            res = self.session.post(self.get_short_token_url, headers=headers, data=data, timeout=self.timeout).json()
+            # 유효하지 않은 코드면
+            if 'error_type' in res:
+                raise HTTPException(status_code=404, detail=res['error_message'])
+                # 적절한 페이지로 이동시키기
+            else: return res["access_token"]
+        except Exception as ex:
+            logger.warning("get_short_token failed: %r", ex)
+
+    # 장기 토큰 얻기
+    def get_long_token(self, short_access_token: str):
+        try:
+            return self._get(self.get_long_token_url + short_access_token)
+        except Exception as ex:
+            logger.warning("get_long_token failed: %r", ex)
+
+    def get_refresh_token(self, long_access_token: str):
+        try:
+            return self._get(self.refresh_token_url + long_access_token)
+        except Exception as ex:
+            logger.warning("get_refresh_token failed: %r", ex)
+            return -1
+
+    # 엑세스 토큰으로 user info 반환
+    def get_user_info(self, access_token: str):
+        try:
+            # web_profile_info는 username으로만 조회되므로 엑세스 토큰으로 username을 먼저 가져온다.
+            username = self.usernames.get_or_load(
+                access_token, lambda: self._get(self.get_user_name_url + access_token)["username"])
+            return self.profiles.get_or_load(username, lambda: self._get_profile(username))
+
+        except Exception as ex:
+            logger.warning("get_user_info failed: %r", ex)
+
+    def _get_profile(self, username: str) -> schemas.UserCreate:
+        # 만약 헤더 오류 시 아래 api로 대체
+        # user_info = requests.get(f'https://www.instagram.com/web/search/topsearch/?query={username}')
+
+        # username으로 user 정보 가져오는 api 호출
+        user_info = self._get(self.get_user_info_url + username, headers=user_info_headers)['data']['user']
+
+        return schemas.UserCreate(insta_id=user_info['id'], username=username,
+                                  full_name=user_info['full_name'],
+                                  follower=user_info['edge_followed_by']['count'],
+                                  following=user_info['edge_follow']['count'],
+                                  profile_image_url=user_info['profile_pic_url'])
+
+    async def _run(self, fn, *args):
+        # 스레드에서 실행하되 동시에 max_concurrency개까지만
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self.max_concurrency)
+        return await anyio.to_thread.run_sync(partial(fn, *args), limiter=self._limiter)
+
+    async def aget_short_token(self, code: str):
+        return await self._run(self.get_short_token, code)
+
+    async def aget_long_token(self, short_access_token: str):
+        return await self._run(self.get_long_token, short_access_token)
+
+    async def aget_refresh_token(self, long_access_token: str):
+        return await self._run(self.get_refresh_token, long_access_token)
+
+    async def aget_user_info(self, access_token: str):
+        return await self._run(self.get_user_info, access_token)
+
+
+client = InstagramClient()
+
+
+# 기존 함수 이름으로도 사용할 수 있도록 기본 client에 위임
+def get_short_token(code: str):
+    return client.get_short_token(code)
+
+
+def get_long_token(short_access_token: str):
+    return client.get_long_token(short_access_token)
+
+
+def get_refresh_token(long_access_token: str):
+    return client.get_refresh_token(long_access_token)
+
+
+def get_user_info(access_token: str):
+    return client.get_user_info(access_token)
@@ -1,24 +1,32 @@
 # main.py
 # 서버 시작과 API들을 관리하는 파일?
 
+import logging
+import os
 from os import access
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Header
-from starlette.responses import RedirectResponse
+from fastapi import Depends, FastAPI, HTTPException, Header
+from starlette.responses import PlainTextResponse, RedirectResponse
 
 from starlette.middleware.cors import CORSMiddleware
-from utils import check_db_connected
-import models, crud, insta
-from database import SessionLocal, engine
+from utils import check_db_connected, require_admin
+import crud, insta, vote_counter, expiry, voice_jobs, storage, question_bank, token_service, pagination
+import metrics
+import database
+from database import SessionLocal, async_engine
+from broker import broker
 from routers import users, comments, questions
 
-models.Base.metadata.create_all(bind=engine)
+# 테이블/컬럼/인덱스는 시작 전에 migrate.py로 만듦 (Dockerfile CMD)
 
 app = FastAPI()
 
 # 환경변수 로드
 load_dotenv()
 
+# expiry 스케줄러 등의 로그 출력
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'))
+
 app.include_router(users.router)
 app.include_router(questions.router)
 app.include_router(comments.router)
@@ -30,17 +38,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 목록 API의 다음 페이지 cursor
+    expose_headers=[pagination.NEXT_CURSOR_HEADER],
 )
 
+# 라우트별 응답 시간, 상태 코드, 요청당 쿼리 수/DB 시간 (/metrics), CORS preflight까지 재도록 가장 바깥에 둠
+app.add_middleware(metrics.MetricsMiddleware)
+for name, (instrumented, _) in database.engines().items():
+    metrics.instrument_engine(instrumented, name)
+
 
 @app.on_event("startup") # 시작할 때 질문 추가하는 코드
 async def app_startup():
     await check_db_connected()
     db = SessionLocal()
-    questions = crud.get_random_question(db, "challenge")
-    if len(questions) == 0:
-        crud.insert_questions(db)
+    # 랜덤 질문을 메모리에 올리고, questions.txt에 새로 추가된 질문만 넣은 뒤 다시 올림
+    question_bank.bank.load(db)
+    if crud.insert_questions(db, existing=question_bank.bank.pairs()):
+        question_bank.bank.load(db)
     db.close()
+    vote_counter.counter.start()
+    expiry.scheduler.start()
+    voice_jobs.queue.start()
+
+
+@app.on_event("shutdown") # 종료할 때 모아둔 투표수 반영
+async def app_shutdown():
+    voice_jobs.queue.stop()
+    storage.uploader.shutdown()
+    expiry.scheduler.stop()
+    vote_counter.counter.stop()
+    await async_engine.dispose()
+    if database.read_replica:
+        await database.async_read_engine.dispose()
 
 
 # 접속시 자동으로 문서페이지로 이동
@@ -49,6 +79,57 @@ def main():
     return RedirectResponse(url="/docs/")
 
 
+# 커넥션 풀 상태 (checkout 중인 커넥션, overflow, checkout 대기시간 분포, invalidate 횟수), replica를 쓰면 read 풀 포함
+# 아래 통계/지표 API는 내부 상태가 드러나므로 B-11과 같은 관리자 토큰 필요
+@app.get("/api/v1/pool-stats", status_code=200, dependencies=[Depends(require_admin)])
+def get_pool_stats():
+    return {name: database.pool_status(*pool) for name, pool in database.engines().items()}
+
+
+# 토큰 발급/리프레쉬 upstream 호출 수와 캐시, 동시 요청 합치기로 아낀 호출 수
+@app.get("/api/v1/token-stats", status_code=200, dependencies=[Depends(require_admin)])
+def get_token_stats():
+    return token_service.service.stats()
+
+
+def runtime_metrics() -> list:
+    ''' /metrics에 함께 내보낼 커넥션 풀, 토큰 캐시, SSE broker 상태 '''
+    pools = {name: database.pool_status(*pool) for name, pool in database.engines().items()}
+    lines = []
+    for field, kind, help in (("size", "gauge", "Connection pool size"),
+                              ("checked_out", "gauge", "Connections checked out"),
+                              ("overflow", "gauge", "Overflow connections open"),
+                              ("invalidations", "counter", "Connections invalidated")):
+        lines += metrics.family_lines(f"db_pool_{field}", kind, help, ("engine",),
+                                      [((name,), status[field]) for name, status in pools.items()])
+    lines += metrics.family_lines("db_pool_checkout_wait_ms", "histogram", "Connection checkout wait in ms",
+                                  ("engine",), [((name,), status["checkout_wait_ms"])
+                                                for name, status in pools.items()])
+
+    tokens = token_service.service.stats()
+    for field, help in (("upstream_calls", "Instagram token API calls"),
+                        ("cache_hits", "Token requests served from cache"),
+                        ("coalesced", "Token requests merged into a concurrent call")):
+        lines += metrics.family_lines(f"token_{field}_total", "counter", help, ("operation",),
+                                      [((operation,), stats[field]) for operation, stats in tokens.items()])
+
+    if hasattr(broker, "stats"):
+        stats = broker.stats()
+        for name, field, kind, help in (("sse_channels", "channels", "gauge", "SSE channels with subscribers"),
+                                        ("sse_subscribers", "subscribers", "gauge", "SSE subscribers"),
+                                        ("sse_published_total", "published", "counter", "SSE messages published"),
+                                        ("sse_delivered_total", "delivered", "counter", "SSE messages delivered")):
+            lines += metrics.family_lines(name, kind, help, (), [((), stats[field])])
+    return lines
+
+
+# 요청 지표와 runtime_metrics를 Prometheus text 형식으로 (스크래핑용, 문서에는 노출하지 않음)
+# Prometheus에서는 authorization.credentials에 ADMIN_TOKEN을 지정
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_admin)])
+def get_metrics():
+    return PlainTextResponse(metrics.render(runtime_metrics), media_type=metrics.CONTENT_TYPE)
+
+
 # A-1
 # 인스타그램 로그인 페이지로 이동한다.
 # 앱 접속 시 프론트에 유효한 토큰이 없다면 인스타 연동 페이지로 이동
@@ -62,7 +143,8 @@ def main():
 # 프론트에서 발급 받은 토큰 저장 후 user_info_change_by_access_token 호출
 @app.get("/api/v1/refresh-token", status_code=200)
 def get_refresh_token(long_access_token: str = Header(default=None)):
-    res = insta.get_refresh_token(long_access_token=long_access_token)
+    # 같은 토큰의 동시 리프레쉬는 한 번만 호출하고, 만료 직전까지는 이전 결과를 반환
+    res = token_service.service.refresh(long_access_token)
     # 토큰이 만료되었다면
     if res == -1:
         return -1;
@@ -84,12 +166,10 @@ def get_insta_token_by_code(code: str):
     # 코드가 없으면
     # if code is None:
         # raise HTTPException(status_code=421, detail="code is not found")
-    # 단기 실행 토큰 발급
-    short_token = insta.get_short_token(code)
-    # 장기 실행 토큰 발급
+    # 단기 실행 토큰 발급 후 장기 실행 토큰 발급, 같은 코드의 중복 요청은 같은 결과를 반환
     # {access_token: 'access_token', token_type: 'token_type', expires_in: 5184000}
-    return insta.get_long_token(short_token)
+    return token_service.service.exchange_code(code)
 
 @app.get("/api/v1/insta/get-long-token", status_code=200)
 def get_insta_token_by_code(short_token: str = Header(default=None)):
-    return insta.get_long_token(short_token)
\ No newline at end of file
+    return token_service.service.get_long_token(short_token)
\ No newline at end of file
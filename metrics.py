@@ -0,0 +1,281 @@
+# metrics.py
+# 서버 내부 지표(히스토그램, 카운터)를 모아두는 파일
+# 요청별 지표(라우트별 응답 시간, 상태 코드, 처리 중인 요청 수, 요청당 쿼리 수/DB 시간)는 MetricsMiddleware와
+# instrument_engine으로 모으고, main.py의 /metrics에서 Prometheus text 형식으로 내보냄
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4"  # PlainTextResponse가 charset=utf-8을 붙임
+PREFIX = "tikitaka_"
+
+# 요청 응답 시간, 요청당 DB 시간(초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# 요청당 쿼리 수, N+1이면 위쪽 bucket으로 몰림
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    ''' 누적 bucket 히스토그램, 값은 bucket 상한(le) 기준으로 센다 '''
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # 마지막은 +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative, running = {}, 0
+        for le, count in zip(list(self.buckets) + ["+Inf"], counts):
+            running += count
+            cumulative[str(le)] = running
+        return {"buckets": cumulative, "count": running, "sum": total}
+
+
+class Counter:
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge(Counter):
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+
+class Family:
+    ''' label 값 조합별 지표, 처음 쓰는 조합이면 factory로 만듦 '''
+
+    def __init__(self, kind: str, help: str, label_names: Sequence[str], factory: Callable):
+        self.kind = kind
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._factory = factory
+        self._children: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def items(self) -> List[Tuple[Tuple, object]]:
+        with self._lock:
+            return list(self._children.items())
+
+
+def histogram(help: str, label_names: Sequence[str], buckets: Sequence[float]) -> Family:
+    return Family("histogram", help, label_names, lambda: Histogram(buckets))
+
+
+def counter(help: str, label_names: Sequence[str] = ()) -> Family:
+    return Family("counter", help, label_names, Counter)
+
+
+def gauge(help: str, label_names: Sequence[str] = ()) -> Family:
+    return Family("gauge", help, label_names, Gauge)
+
+
+http_requests = counter("HTTP requests by route and status", ("method", "route", "status"))
+http_latency = histogram("HTTP request latency in seconds", ("method", "route"), LATENCY_BUCKETS)
+http_in_flight = gauge("HTTP requests being processed")
+request_queries = histogram("SQL statements per HTTP request", ("method", "route"), QUERY_COUNT_BUCKETS)
+request_db_seconds = histogram("Time spent in SQL per HTTP request in seconds", ("method", "route"),
+                               LATENCY_BUCKETS)
+query_budget_exceeded = counter("HTTP requests that ran more SQL statements than their route's query_budget",
+                                ("method", "route"))
+db_queries = counter("SQL statements executed", ("engine",))
+db_seconds = counter("Time spent in SQL in seconds", ("engine",))
+
+registry: Dict[str, Family] = {
+    "http_requests_total": http_requests,
+    "http_request_duration_seconds": http_latency,
+    "http_requests_in_flight": http_in_flight,
+    "http_request_db_queries": request_queries,
+    "http_request_db_seconds": request_db_seconds,
+    "http_request_query_budget_exceeded_total": query_budget_exceeded,
+    "db_queries_total": db_queries,
+    "db_query_seconds_total": db_seconds,
+}
+
+
+class RequestStats:
+    ''' 요청 하나에서 실행된 쿼리 수와 DB 시간, 스레드풀/greenlet으로 복사된 context에서도 같은 객체를 고침
+    응답을 다 보낸 뒤(closed) 같은 context에서 도는 BackgroundTasks의 쿼리는 세지 않음 '''
+    __slots__ = ("queries", "db_seconds", "closed")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.closed = False
+
+
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+
+def active_request() -> RequestStats | None:
+    ''' 응답을 보내는 중인 요청의 RequestStats, 요청 밖이거나 응답을 다 보낸 뒤면 None '''
+    stats = current_request.get()
+    return None if stats is None or stats.closed else stats
+
+
+def instrument_engine(engine, name: str):
+    ''' engine(async는 sync_engine)의 쿼리 수와 시간을 전체 합계와 현재 요청에 기록 '''
+    queries, seconds = db_queries.labels(name), db_seconds.labels(name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_start = time.perf_counter()
+        queries.inc()
+        stats = active_request()
+        if stats is not None:
+            stats.queries += 1
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._metrics_start
+        seconds.inc(elapsed)
+        stats = active_request()
+        if stats is not None:
+            stats.db_seconds += elapsed
+
+
+def query_budget(max_queries: int):
+    ''' 라우트 함수가 요청 하나에 실행할 수 있는 SQL 문 수, 데이터 양과 상관없는 상수여야 함 (N+1 방지)
+    @router.get(...) 바로 아래에 붙임, 넘으면 MetricsMiddleware가 경고 로그와 지표를 남기고
+    tests/test_query_budget.py는 넘은 SQL을 출력하고 실패함 '''
+    def decorator(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorator
+
+
+class MetricsMiddleware:
+    ''' 순수 ASGI middleware, 라우팅이 끝난 뒤 scope["endpoint"]로 라우트 경로(/api/v1/comments/{comment_id} 등)를 찾아 기록
+    매칭되는 라우트가 없으면(404, CORS preflight) route="unmatched" 로 모아서 label 수가 늘지 않게 함 '''
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[Callable, Tuple[str, int | None]] | None = None
+
+    def route_of(self, scope) -> Tuple[str, int | None]:
+        ''' (라우트 경로, query_budget) '''
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched", None
+        if self._routes is None:
+            self._routes = {route.endpoint: (route.path, getattr(route.endpoint, "query_budget", None))
+                            for route in scope["app"].routes if hasattr(route, "endpoint")}
+        return self._routes.get(endpoint, ("unmatched", None))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # 응답 시작 전에 예외가 나면 ServerErrorMiddleware가 500을 보냄
+        elapsed = None
+
+        async def send_with_status(message):
+            nonlocal status, elapsed
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            # 마지막 body를 보낸 시점에서 측정을 끝냄, 이후 BackgroundTasks는 지연 시간과 쿼리 수에 넣지 않음
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                elapsed = time.perf_counter() - start
+                stats.closed = True
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        in_flight = http_in_flight.labels()
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if elapsed is None:
+                elapsed = time.perf_counter() - start
+            in_flight.dec()
+            current_request.reset(token)
+            route, budget = self.route_of(scope)
+            labels = (scope["method"], route)
+            http_requests.labels(*labels, str(status)).inc()
+            http_latency.labels(*labels).observe(elapsed)
+            request_queries.labels(*labels).observe(stats.queries)
+            request_db_seconds.labels(*labels).observe(stats.db_seconds)
+            if budget is not None and stats.queries > budget:
+                query_budget_exceeded.labels(*labels).inc()
+                logger.warning("%s %s ran %d SQL statements (query_budget %d)", *labels, stats.queries, budget)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def histogram_lines(name: str, label_names: Sequence[str], label_values: Sequence, snapshot: Dict) -> List[str]:
+    ''' Histogram.snapshot()을 _bucket, _sum, _count 줄로 '''
+    lines = []
+    for le, count in snapshot["buckets"].items():
+        le_label = f'le="{le}"'
+        lines.append(f"{name}_bucket{_labels(label_names, label_values, le_label)} {count}")
+    lines.append(f"{name}_sum{_labels(label_names, label_values)} {snapshot['sum']}")
+    lines.append(f"{name}_count{_labels(label_names, label_values)} {snapshot['count']}")
+    return lines
+
+
+def family_lines(name: str, kind: str, help: str, label_names: Sequence[str] = (),
+                 samples: Iterable[Tuple[Sequence, object]] = ()) -> List[str]:
+    ''' 지표 하나의 HELP, TYPE과 샘플 줄, 샘플 값은 숫자 또는 Histogram.snapshot() '''
+    name = PREFIX + name
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for label_values, value in samples:
+        if isinstance(value, dict):
+            lines += histogram_lines(name, label_names, label_values, value)
+        else:
+            lines.append(f"{name}{_labels(label_names, label_values)} {value}")
+    return lines
+
+
+def render(*collectors: Callable[[], List[str]]) -> str:
+    ''' registry의 요청 지표와 collectors(풀, 토큰 캐시 등 다른 모듈 상태)가 만든 줄을 합쳐 /metrics 본문으로 '''
+    lines = []
+    for name, family in registry.items():
+        samples = [(values, child.snapshot() if isinstance(child, Histogram) else child.value)
+                   for values, child in family.items()]
+        lines += family_lines(name, family.kind, family.help, family.label_names, samples)
+    for collect in collectors:
+        lines += collect()
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,24 @@
+# migrate.py
+# db 테이블을 models에 맞추는 파일: 없는 테이블 생성, 기존 테이블에 새 컬럼/인덱스 추가
+# 서버(워커)마다 import 시점에 실행하지 않고 배포할 때 uvicorn 시작 전에 한 번만 실행
+#
+# python migrate.py
+
+import logging
+
+import models
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+
+def migrate(bind=engine):
+    models.Base.metadata.create_all(bind=bind)
+    models.create_missing_columns(bind)
+    models.create_missing_indexes(bind)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate()
+    logger.info("database schema is up to date")
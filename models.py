@@ -2,7 +2,8 @@
 # db 테이블을 구성하는 파일
 
 from sqlite3 import Timestamp
-from sqlalchemy import Column, Integer, String, ForeignKey, TIMESTAMP, Boolean, MetaData
+from sqlalchemy import Column, Integer, String, ForeignKey, TIMESTAMP, Boolean, MetaData, Index, inspect, false
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.orm import relationship
 
 from database import Base
@@ -47,6 +48,14 @@ class User(Base):
 
 class Question(Base):
     __tablename__ = "question"
+    __table_args__ = (
+        # 유저별 유효한/만료된 질문 조회 (async_crud.get_valid_*_by_userid, get_expired_questions_by_userid)
+        Index("ix_question_user_valid", "user_id", "is_deleted", "expired", "type"),
+        # 만료 처리 대상 조회 (crud.expire_questions)
+        Index("ix_question_expiry", "expired", "created_at"),
+        # D-6 만료된 질문 목록 (created_at, id) 순 페이지네이션
+        Index("ix_question_user_history", "user_id", "is_deleted", "expired", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     content = Column(String(word_limit["Question_content_limit"]))
@@ -82,30 +91,47 @@ class Question(Base):
 
 class Comment(Base):
     __tablename__ = "comment"
+    __table_args__ = (
+        # 질문별 답변, 타입별 답변 조회 (async_crud.get_comments_by_questionid, get_valid_comments)
+        Index("ix_comment_question_type", "question_id", "type"),
+        # D-2 질문별 답변 (created_at, id) 순 페이지네이션
+        Index("ix_comment_question_created", "question_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     type = Column(String(20))
     content = Column(String(word_limit["Comment_content_limit"]))
     question_id = Column(Integer, ForeignKey("question.id"))
+    # 질문이 삭제되면 같이 soft delete, 기존 행은 server_default로 false
+    is_deleted = Column(Boolean, default=False, server_default=false(), nullable=False)
+    # 음성 답변 작업 상태 (crud.CommentStatus), 텍스트 답변과 기존 행은 done
+    status = Column(String(20), default="done", server_default="done", nullable=False)
     created_at = Column(TIMESTAMP, default=Timestamp.now())
     updated_at = Column(TIMESTAMP, default=Timestamp.now())
 
-    def __init__(self, content: str, type: str, question_id: int):
+    def __init__(self, content: str, type: str, question_id: int, status: str = "done"):
         self.content = content
         self.type = type
         self.question_id = question_id
+        self.is_deleted = False
+        self.status = status
         self.created_at = Timestamp.now()
         self.updated_at = self.created_at
 
 
 class VoteOption(Base):
     __tablename__ = "vote_option"
+    __table_args__ = (
+        # 질문별 선택지 조회 (async_crud.get_vote_options, get_vote_options_by_questionids)
+        Index("ix_vote_option_question", "question_id", "num"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     num = Column(Integer)
     content = Column(String(word_limit["Vote_option_limit"]))
     count = Column(Integer)
     question_id = Column(Integer, ForeignKey("question.id"))
+    is_deleted = Column(Boolean, default=False, server_default=false(), nullable=False)
     created_at = Column(TIMESTAMP, default=Timestamp.now())
     updated_at = Column(TIMESTAMP, default=Timestamp.now())
 
@@ -114,12 +140,18 @@ class VoteOption(Base):
         self.content = content
         self.count = 0
         self.question_id = question_id
+        self.is_deleted = False
         self.created_at = Timestamp.now()
         self.updated_at = self.created_at
 
 
 class RandomQuestion(Base):
     __tablename__ = "random_question"
+    __table_args__ = (
+        # 타입별 랜덤 질문 조회
+        Index("ix_random_question_type", "type"),
+    )
+
     id = Column(Integer, primary_key=True, autoincrement=True)
     content = Column(String(word_limit["Question_content_limit"]))
     type = Column(String(20))
@@ -130,4 +162,31 @@ class RandomQuestion(Base):
         self.content = content
         self.type = type
         self.created_at = Timestamp.now()
-        self.updated_at = self.created_at
\ No newline at end of file
+        self.updated_at = self.created_at
+
+
+def create_missing_indexes(engine):
+    ''' create_all은 이미 있는 테이블에 인덱스를 추가하지 않으므로 없는 인덱스만 따로 생성 '''
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+
+
+def create_missing_columns(engine):
+    ''' create_all은 이미 있는 테이블에 컬럼을 추가하지 않으므로 새로 생긴 컬럼만 ALTER TABLE로 추가
+    추가하는 컬럼은 nullable이거나 server_default가 있어야 함 '''
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
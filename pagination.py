@@ -0,0 +1,68 @@
+# pagination.py
+# 목록 API의 keyset(cursor) 페이지네이션, (created_at, id) 순서로 마지막 행 다음부터 가져옴
+# Page는 FastAPI 의존성으로 쓰므로 annotation을 문자열로 만드는 __future__ import를 쓰지 않음
+
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_
+
+# 한 페이지 최대 크기
+PAGE_SIZE_MAX = 100
+# 다음 페이지 cursor를 담는 응답 헤더, 응답 본문(리스트) 형태는 그대로 둠
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Page:
+    ''' limit, cursor query parameter, limit이 없으면 전체를 순서대로 반환 '''
+
+    def __init__(self, limit: Optional[int] = Query(default=None, ge=1, le=PAGE_SIZE_MAX),
+                 cursor: Optional[str] = Query(default=None)):
+        self.limit = limit
+        self.after = decode_cursor(cursor) if cursor else None
+        self.next_cursor = None
+
+    def rows(self, rows: List) -> List:
+        ''' paginate로 가져온 limit + 1개 중 limit개만 남기고, 더 있으면 마지막 행으로 next_cursor 설정 '''
+        if self.limit is None or len(rows) <= self.limit:
+            return rows
+        rows = rows[:self.limit]
+        self.next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+        return rows
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
+def paginate(stmt, model, page: Optional[Page]):
+    ''' (created_at, id) 오름차순 정렬 후 cursor 다음 행부터 limit + 1개(다음 페이지 여부 확인용) '''
+    stmt = stmt.order_by(model.created_at, model.id)
+    if page is None:
+        return stmt
+    if page.after is not None:
+        created_at, id = page.after
+        # (created_at, id) > cursor, 앞의 >= 조건으로 인덱스 range scan
+        stmt = stmt.where(model.created_at >= created_at) \
+            .where(or_(model.created_at > created_at, and_(model.created_at == created_at, model.id > id)))
+    if page.limit is not None:
+        stmt = stmt.limit(page.limit + 1)
+    return stmt
+
+
+def set_next_cursor(response: Response, page: Page):
+    if page.next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
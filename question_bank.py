@@ -0,0 +1,77 @@
+# question_bank.py
+# B-4 랜덤 질문을 타입별로 메모리에 올려두고 DB 조회 없이 뽑아주는 파일, main.py 시작 시 로드
+
+import hashlib
+import random
+import threading
+from typing import Dict, List, NamedTuple, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+import fastjson, models, schemas
+from database import SessionLocal
+
+
+class Snapshot(NamedTuple):
+    ''' 한 번 load한 결과, 목록/JSON/ETag가 항상 같은 load에서 나오도록 통째로 교체 '''
+    by_type: Dict[str, List[Dict]]
+    json: Dict[str, bytes]
+    etag: str
+
+
+class QuestionBank:
+    ''' 타입별 랜덤 질문 목록, 질문 재등록(seed) 후에는 load로 다시 읽어서 교체
+    질문은 schemas.RandomQuestion 형태의 dict로 두고, 타입별 전체 목록은 JSON으로 미리 인코딩해 둠 '''
+
+    def __init__(self):
+        self._snapshot: Snapshot | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def load(self, db: Session):
+        rows = db.query(models.RandomQuestion).order_by(models.RandomQuestion.id).all()
+        by_type = {}
+        for row in rows:
+            by_type.setdefault(row.type, []).append(schemas.RandomQuestion.from_orm(row).dict())
+        encoded = {question_type: fastjson.dumps(questions) for question_type, questions in by_type.items()}
+
+        # 내용이 바뀌면 ETag도 바뀜
+        digest = hashlib.sha1()
+        for row in rows:
+            digest.update(f"{row.id}|{row.type}|{row.content}\n".encode())
+        with self._lock:
+            self._snapshot = Snapshot(by_type, encoded, f'"{digest.hexdigest()}"')
+
+    def reload(self):
+        db = SessionLocal()
+        try:
+            self.load(db)
+        finally:
+            db.close()
+
+    def snapshot(self) -> Snapshot:
+        ''' 현재 load 결과, 읽는 쪽은 이 참조 하나로만 읽어서 중간에 reload되어도 섞이지 않음 '''
+        snapshot = self._snapshot
+        if snapshot is None:
+            self.reload()
+            snapshot = self._snapshot
+        return snapshot
+
+    def pairs(self) -> Set[Tuple[str, str]]:
+        ''' 불러온 질문들의 (content, type), 중복 없이 추가할 때 사용 '''
+        snapshot = self._snapshot
+        by_type = snapshot.by_type if snapshot is not None else {}
+        return {(question["content"], question["type"]) for questions in by_type.values() for question in questions}
+
+    def get(self, question_type: str) -> List[Dict]:
+        return self.snapshot().by_type.get(question_type, [])
+
+    def sample(self, question_type: str, count: int) -> List[Dict]:
+        questions = self.get(question_type)
+        return random.sample(questions, min(count, len(questions)))
+
+
+bank = QuestionBank()
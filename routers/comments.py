@@ -1,44 +1,23 @@
-from typing import List
+from typing import List, Optional
 
-import boto3
-import shutil
-
-from botocore.exceptions import ClientError
-from fastapi import APIRouter, UploadFile, Form, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, Form, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 import sys, os
 
 sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
-import schemas, crud, voice_alteration
-from database import get_db
+import schemas, crud, async_crud, vote_counter, voice_alteration, voice_effects, voice_jobs, pagination, etags, fastjson
+import metrics
+from broker import broker, event_stream
+from database import AsyncReadSessionLocal, get_db, get_async_db, get_async_read_db
 
 router = APIRouter(
     prefix="/api/v1/comments",
     tags=["comments"],
 )
 
-client_s3 = boto3.client(
-    's3',
-    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-    aws_secret_access_key=os.getenv('AWS_SECRET_KEY')
-)
-
-
-# S3 Bucket
-def upload_file(location, file):
-    try:
-        client_s3.upload_file(
-            location,
-            os.getenv('AWS_S3_BUCKET_NAME'),
-            file,
-            ExtraArgs={'ContentType': 'video/mp4'}
-        )
-    except ClientError as e:
-        print(f'Credential error => {e}')
-    except Exception as e:
-        print(f"Another error => {e}")
-
 
 # F-3
 # comment 데이터 hard 삭제
@@ -49,100 +28,154 @@ def delete_comment(comment_id: int, db: Session = Depends(get_db)):
 
 # D-7
 # user_id를 path variable로 받아 해당 user의 유효한 질문들의 답변들을 반환
+# 오래된 순, limit을 주면 limit개씩 반환하고 다음 페이지 cursor는 X-Next-Cursor 헤더로 전달
+# 목록 응답은 response_model 검증 없이 컬럼 조회 결과를 바로 인코딩 (D-8, D-2도 같음)
 @router.get('/users/{user_id}/text', response_model=List[schemas.Comment], status_code=200)
-def show_valid_comments(user_id: int, db: Session = Depends(get_db)):
-    comments = crud.get_valid_comments(db, user_id=user_id, type=crud.CommentType.text)
-    return comments
+@metrics.query_budget(2)
+async def show_valid_comments(user_id: int, page: pagination.Page = Depends(),
+                              db: AsyncSession = Depends(get_async_read_db)):
+    comments = await async_crud.get_valid_comments(db, user_id=user_id, type=crud.CommentType.text, page=page)
+    response = fastjson.json_response(fastjson.rows(comments))
+    pagination.set_next_cursor(response, page)
+    return response
 
 
 # D-8
-# user_id를 path variable로 받아 해당 user의 유효한 질문들의 음성답변들을 반환
+# user_id를 path variable로 받아 해당 user의 유효한 질문들의 음성답변들을 반환 (페이지네이션은 D-7과 같음)
+# 변조/업로드가 끝나지 않았거나 실패한 음성 답변은 제외 (crud.visible_comment_filter)
 @router.get('/users/{user_id}/sound', response_model=List[schemas.Comment], status_code=200)
-def show_valid_sound_comments(user_id: int, db: Session = Depends(get_db)):
-    comments = crud.get_valid_comments(db, user_id=user_id, type=crud.CommentType.sound)
-    return comments
+@metrics.query_budget(2)
+async def show_valid_sound_comments(user_id: int, page: pagination.Page = Depends(),
+                                    db: AsyncSession = Depends(get_async_read_db)):
+    comments = await async_crud.get_valid_comments(db, user_id=user_id, type=crud.CommentType.sound, page=page)
+    response = fastjson.json_response(fastjson.rows(comments))
+    pagination.set_next_cursor(response, page)
+    return response
 
 
 # D-9
 # user_id를 path variable로 받아 해당 user의 유효한 질문들의 투표답변들을 반환
+# 투표 질문과 선택지를 질문마다 조회하지 않고 한 번에 조회해서 질문별로 묶음
 @router.get('/users/{user_id}/vote', response_model=List[schemas.VoteResult], status_code=200)
-def show_valid_vote_options(user_id: int, db: Session = Depends(get_db)):
+@metrics.query_budget(2)
+async def show_valid_vote_options(user_id: int, db: AsyncSession = Depends(get_async_read_db)):
 
     # user_id가 존재하는지 check
-    crud.get_user(db=db, user_id=user_id)
-    vote_questions = crud.get_valid_votequestions_by_userid(db, user_id=user_id)
+    await async_crud.get_user(db=db, user_id=user_id)
+    results = await async_crud.get_valid_vote_results_by_userid(db, user_id=user_id)
     # 해당 user_id에 vote_question이 없는 경우
-    if len(vote_questions) < 1:
+    if len(results) < 1:
         raise HTTPException(status_code=404, detail="This id has no vote_questions")
 
-    voteResults = []
-    for question in vote_questions:
-        vote_options = crud.get_vote_options(db, question.id)
-        vote_option_contents = [vote_options[i].content for i in range(len(vote_options))]
-        vote_count = [vote_options[i].count for i in range(len(vote_options))]
-
-        updated_time_list = sorted(
-            [vote_options[i].updated_at for i in range(len(vote_options))])  # 옵션객체.updated_at 셋 중 가장최근시간
-        updated_at = updated_time_list[len(vote_options) - 1]  # 가장 최근에 업데이트된 시간
-
-        voteResults.append(schemas.VoteResult(question_id=question.id, options=vote_option_contents, count=vote_count,
-                                              created_at=question.created_at, updated_at=updated_at))
-
-    return voteResults
+    return [result for _, result in results]
 
 
 # D-2
-# question_id를 path variable로 받아서 해당 question에 해당하는 comment들을 반환
+# question_id를 path variable로 받아서 해당 question에 해당하는 comment들을 반환 (페이지네이션은 D-7과 같음)
 @router.get('/questions/{question_id}', response_model=List[schemas.Comment], status_code=200)
-def show_comments(question_id: int, db: Session = Depends(get_db)):
-    question = crud.get_question(db, question_id=question_id)
+@metrics.query_budget(2)
+async def show_comments(question_id: int, page: pagination.Page = Depends(),
+                        db: AsyncSession = Depends(get_async_read_db)):
+    question = await async_crud.get_question(db, question_id=question_id)
     if question is None:
         raise HTTPException(status_code=404, detail="question is not found")
 
-    comments = crud.get_comments_by_questionid(db, question_id=question_id)
-    # comments.sort(key=lambda x: x.created_at)
-    return comments
+    comments = await async_crud.get_comments_by_questionid(db, question_id=question_id, page=page)
+    response = fastjson.json_response(fastjson.rows(comments))
+    pagination.set_next_cursor(response, page)
+    return response
 
 
 # D-5
 # 투표 질문 클릭시 투표 옵션 및 결과 반환
+# 폴링용: If-None-Match가 현재 버전(투표수 합, 최근 updated_at)과 같으면 선택지를 읽지 않고 304
 @router.get('/vote/{question_id}', response_model=schemas.VoteResult, status_code=200)
-def show_vote_result(question_id: int, db: Session = Depends(get_db)):
-    vote_question = crud.get_question(db, question_id=question_id)
-    if vote_question.type != crud.QuestionType.vote:
+@metrics.query_budget(3)
+async def show_vote_result(question_id: int, response: Response, if_none_match: Optional[str] = Header(default=None),
+                           db: AsyncSession = Depends(get_async_read_db)):
+    version = await async_crud.get_vote_result_version(db, question_id=question_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="question is not found")
+    if version.type != crud.QuestionType.vote:
         raise HTTPException(status_code=404, detail="not vote question")
-    vote_options = crud.get_vote_options(db, question_id)
+    etag = etags.make_etag("vote", question_id, version.options, version.total, version.updated_at)
+    if etags.matches(if_none_match, etag):
+        return etags.not_modified(etag)
+
+    vote_question = await async_crud.get_question(db, question_id=question_id)
+    vote_options = await async_crud.get_vote_options(db, question_id)
     vote_option_contents = [vote_options[i].content for i in range(len(vote_options))]
     vote_count = [vote_options[i].count for i in range(len(vote_options))]
+    updated_at = version.updated_at  # 가장 최근에 업데이트된 시간
 
-    updated_time_list = sorted(
-        [vote_options[i].updated_at for i in range(len(vote_options))])  # 옵션객체.updated_at 셋 중 가장최근시간
-    updated_at = updated_time_list[len(vote_options) - 1]  # 가장 최근에 업데이트된 시간
-
+    etags.set_etag(response, etag)
     return schemas.VoteResult(question_id=question_id, options=vote_option_contents, count=vote_count,
                               created_at=vote_question.created_at, updated_at=updated_at)
 
 
+# SSE 응답 헤더, 프록시(nginx)가 버퍼링하지 않도록 함
+stream_headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+# D-11
+# 투표 결과 실시간 구독 (Server-Sent Events), 현재 결과를 먼저 보내고 투표가 반영될 때마다 새 결과(VoteResult)를 보냄
+@router.get('/vote/{question_id}/stream', status_code=200)
+async def stream_vote_result(question_id: int):
+    # 구독을 먼저 해야 현재 결과를 읽는 사이의 투표도 놓치지 않음
+    subscription = broker.subscribe(f"question:{question_id}")
+    try:
+        # 스트림이 끝날 때까지 커넥션을 잡고 있지 않도록 의존성 대신 직접 열고 닫음
+        async with AsyncReadSessionLocal() as db:
+            question = await async_crud.get_question(db, question_id=question_id)
+            if question is None or question.type != crud.QuestionType.vote:
+                raise HTTPException(status_code=404, detail="not vote question")
+            results = await async_crud.get_vote_results(db, question_id)
+    except Exception:
+        subscription.close()
+        raise
+    return StreamingResponse(event_stream(subscription, [result.json() for _, result in results]),
+                             media_type="text/event-stream", headers=stream_headers)
+
+
+# D-12
+# user의 유효한 투표 질문 전체의 결과 실시간 구독, 메시지 형식은 D-11과 같음
+@router.get('/users/{user_id}/vote/stream', status_code=200)
+async def stream_valid_vote_results(user_id: int):
+    subscription = broker.subscribe(f"user:{user_id}")
+    try:
+        async with AsyncReadSessionLocal() as db:
+            await async_crud.get_user(db=db, user_id=user_id)
+            results = await async_crud.get_valid_vote_results_by_userid(db, user_id=user_id)
+    except Exception:
+        subscription.close()
+        raise
+    return StreamingResponse(event_stream(subscription, [result.json() for _, result in results]),
+                             media_type="text/event-stream", headers=stream_headers)
+
+
 # D-3
 # comment_id를 path variable로 받아 해당 comment를 반환
 @router.get('/{comment_id}', response_model=schemas.Comment, status_code=200)
-def show_comment(comment_id: int, db: Session = Depends(get_db)):
-    comment = crud.get_comment(db, comment_id=comment_id)
+@metrics.query_budget(1)
+async def show_comment(comment_id: int, db: AsyncSession = Depends(get_async_db)):
+    comment = await async_crud.get_comment(db, comment_id=comment_id)
     if comment is None:
         raise HTTPException(status_code=404, detail="comment is not found")
     return comment
 
 
 # C-4
-# 투표 답변(comment) 저장
+# 투표 답변(comment) 저장, 증가량은 vote_counter가 모아서 반영
 @router.put('/vote/{vote_comment_id}', response_model=schemas.VoteOption)
+@metrics.query_budget(3)
 def update_vote_count(vote_comment_id: int, db: Session = Depends(get_db)):
-    return crud.update_vote_count(db, vote_comment_id)
+    return vote_counter.counter.add(db, vote_comment_id)
 
 
 # C-5
 # 텍스트 답변 저장
 @router.post('/text', response_model=schemas.Comment, status_code=201)
+@metrics.query_budget(4)
 def create_comment(comment: schemas.CommentCreate, db: Session = Depends(get_db)):
     if len(comment.content) > 100:
         raise HTTPException(status_code=404, detail="글자수 초과")
@@ -152,9 +185,16 @@ def create_comment(comment: schemas.CommentCreate, db: Session = Depends(get_db)
 
 
 # C-6
-# .wav 파일과 question_id를 form 데이터로 받아 해당 파일 음성 변조해 s3 bucket에 파일 저장,  url도 db에 저장
-@router.post('/voice', response_model=schemas.Comment, status_code=201)
-def create_sound_comment(file: UploadFile, question_id: int = Form(), db: Session = Depends(get_db)):
+# .webm 파일과 question_id, 변조 프리셋(high, low, robot)을 form 데이터로 받아 작업 등록 후 202 반환
+# 큐가 차 있으면 503, 파일이 VOICE_MAX_UPLOAD_BYTES보다 크면 413
+# 음성 변조, s3 저장, url db 저장은 voice_jobs 작업 큐에서 처리하고 C-7로 상태 확인
+@router.post('/voice', response_model=schemas.Comment, status_code=202)
+@metrics.query_budget(4)
+def create_sound_comment(file: UploadFile, question_id: int = Form(),
+                         preset: str = Form(default=voice_alteration.default_preset), db: Session = Depends(get_db)):
+    if preset not in voice_effects.presets:
+        raise HTTPException(status_code=415, detail="unsupported voice preset")
+
     question = crud.get_question(db, question_id=question_id)
     if question is None:
         raise HTTPException(status_code=404, detail="question is not found")
@@ -162,26 +202,33 @@ def create_sound_comment(file: UploadFile, question_id: int = Form(), db: Sessio
     if question.comment_type == crud.CommentType.text:
         raise HTTPException(status_code=415, detail="Unsupported comment type.")
 
-    comment = crud.create_sound_comment(db, question_id=question_id)
-
-    # temp 폴더 생성
-    if not os.path.exists('./temp'):
-        os.mkdir('./temp')
-
-    # 클라이언트에서 보낸 음성 파일 저장
-    file_path = "temp/" + str(comment.id)
-    
-    with open(f"{file_path}.webm", "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # 음성 변조 후, s3에 저장
-    voice_alteration.voice_alteration(f"{file_path}.webm", comment.id)
-    upload_file(f"{file_path}.mp4", f"{str(comment.id)}.mp4")
-    os.remove(f"{file_path}.wav")
-    os.remove(f"{file_path}.webm")
-    os.remove(f"{file_path}.mp4")
-
-    # url update
-    comment = crud.update_sound_comment(db, comment_id=comment.id,
-                                        content=f"https://tikitaka-s3.s3.ap-northeast-2.amazonaws.com/{comment.id}.mp4")
+    # 큐 자리를 먼저 잡고 음성 파일을 spool에 받은 뒤 답변 저장, commit 전에 spool 파일 이름을 답변 id로 바꿔
+    # 중간에 실패하면 답변도 파일도 남지 않고, 저장된 답변은 재시작해도 spool에서 다시 처리됨
+    spool = voice_jobs.queue.reserve()
+    try:
+        spool.write(file.file, voice_jobs.VOICE_MAX_UPLOAD_BYTES)
+        comment = crud.create_sound_comment(
+            db, question_id=question_id,
+            on_created=lambda comment_id: spool.rename(voice_jobs.queue.spool_path(comment_id, preset)))
+    except BaseException:
+        voice_jobs.queue.release(spool)
+        raise
+
+    voice_jobs.queue.submit(spool, comment.id, preset)
     return comment
+
+
+# C-7
+# 음성 답변 작업 상태 반환, 완료되면 url 포함
+@router.get('/voice/{comment_id}', response_model=schemas.VoiceJob, status_code=200)
+@metrics.query_budget(1)
+async def show_voice_job(comment_id: int, db: AsyncSession = Depends(get_async_db)):
+    job = voice_jobs.queue.get(comment_id)
+    if job is not None:
+        return job
+
+    # 이 서버에 작업 기록이 없으면 (재시작, 다른 워커) db에 저장된 상태로 판단
+    comment = await async_crud.get_comment(db, comment_id=comment_id)
+    if comment is None or comment.type != crud.CommentType.sound:
+        raise HTTPException(status_code=404, detail="voice comment is not found")
+    return schemas.VoiceJob(comment_id=comment_id, status=comment.status, attempts=1, url=comment.content or None)
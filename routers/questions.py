@@ -1,35 +1,71 @@
 import random
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 import sys, os
 
 sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
-import schemas, crud, models
-from database import get_db
+import schemas, crud, async_crud, models, question_bank, pagination, etags, fastjson
+import metrics
+from database import get_db, get_async_read_db
+from utils import require_admin
 
 router = APIRouter(
     prefix="/api/v1/questions",
     tags=["questions"],
 )
 
+# 랜덤 질문 전체 목록을 브라우저가 캐시할 시간(초)
+RANDOM_QUESTION_MAX_AGE = int(os.getenv('RANDOM_QUESTION_MAX_AGE', '3600'))
+
 
 # B-4
-# 원하는 type을 query parameter로 받아 해당 type인 질문을 랜덤으로 반환
+# 원하는 type을 query parameter로 받아 해당 type인 질문들을 반환, count를 주면 그 중 count개를 랜덤으로 반환
+# DB 대신 메모리의 question_bank에서 조회, 전체 목록은 로드할 때 인코딩해 둔 JSON을 그대로 반환
 @router.get('/random', response_model=List[schemas.RandomQuestion], status_code=200)
-def show_random_question(type: str, db: Session = Depends(get_db)):
-    questions = crud.get_random_question(db, question_type=type)
-    if len(questions) == 0:
+@metrics.query_budget(0)
+async def show_random_question(type: str, count: Optional[int] = Query(default=None, ge=1),
+                               if_none_match: Optional[str] = Header(default=None)):
+    if not question_bank.bank.loaded:
+        await run_in_threadpool(question_bank.bank.reload)
+
+    if count is not None:
+        questions = question_bank.bank.sample(type, count)
+        if len(questions) == 0:
+            raise HTTPException(status_code=404, detail="questions are not found")
+        # 뽑을 때마다 결과가 달라지므로 캐시하지 않음
+        return fastjson.json_response(questions, headers={"Cache-Control": "no-store"})
+
+    # ETag와 본문을 같은 load 결과에서 읽음
+    snapshot = question_bank.bank.snapshot()
+    etag = snapshot.etag
+    # ETag는 type과 상관없이 같으므로 없는 type은 304보다 먼저 404
+    body = snapshot.json.get(type)
+    if body is None:
         raise HTTPException(status_code=404, detail="questions are not found")
+    if etags.matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return fastjson.json_response(body, headers={"Cache-Control": f"public, max-age={RANDOM_QUESTION_MAX_AGE}",
+                                                 "ETag": etag})
+
 
-    return questions
+# B-11
+# questions.txt를 다시 읽어 랜덤 질문 테이블과 메모리의 question_bank를 재시작 없이 갱신 (관리자용)
+@router.post('/random/reload', status_code=200, dependencies=[Depends(require_admin)])
+def reload_random_questions(db: Session = Depends(get_db)):
+    result = crud.sync_questions(db)
+    question_bank.bank.load(db)
+    return result
 
 
 # F-2
 # question 데이터 soft 삭제
 @router.delete('/{question_id}', status_code=204)
+@metrics.query_budget(4)
 def delete_question(question_id: int, db: Session = Depends(get_db)):
     return crud.delete_question_by_question_id(db, question_id)
 
@@ -37,6 +73,7 @@ def delete_question(question_id: int, db: Session = Depends(get_db)):
 # B-10
 # 투표 질문 저장
 @router.post('/vote/', status_code=201)
+@metrics.query_budget(3)
 def create_vote_question(vote_with_option: schemas.VoteCreate, db: Session = Depends(get_db)):
     # 글자수 제한 검사
     if len(vote_with_option.content) > models.word_limit["Question_content_limit"]:
@@ -54,11 +91,10 @@ def create_vote_question(vote_with_option: schemas.VoteCreate, db: Session = Dep
         "Max_option_count"]:
         raise HTTPException(status_code=415, detail="number of options out of range")
 
-    vote_question = schemas.BaseVote(content=vote_with_option.content, user_id=vote_with_option.user_id)
-    created_question = crud.create_vote_question(db, vote_question=vote_question)
-    created_option = crud.create_vote_option(db, created_question.id, vote_with_option.option)
+    # 질문과 선택지를 한 트랜잭션으로 저장
+    question_id = crud.create_vote_question(db, vote_question=vote_with_option)
 
-    return {"question_id": created_question.id, "option": created_option}
+    return {"question_id": question_id, "option": vote_with_option.option}
 
 
 # B-9
@@ -81,53 +117,72 @@ def create_question(question: schemas.QuestionCreate, db: Session = Depends(get_
 
 
 # D-10
-# inbox에서 question 상세보기
+# inbox에서 question 상세보기, If-None-Match가 현재 버전과 같으면 버전 컬럼만 조회하고 304
 @router.get('/{question_id}', response_model=schemas.Question, status_code=200)
-def get_question(question_id: int, db: Session = Depends(get_db)):
-    question = crud.get_question(db, question_id=question_id)
-    if question is None:
+@metrics.query_budget(2)
+async def get_question(question_id: int, response: Response, if_none_match: Optional[str] = Header(default=None),
+                       db: AsyncSession = Depends(get_async_read_db)):
+    version = await async_crud.get_question_version(db, question_id=question_id)
+    if version is None:
         raise HTTPException(status_code=404, detail="question is not found")
-    return question
+    etag = etags.make_etag("question", question_id, version.updated_at, version.expired)
+    if etags.matches(if_none_match, etag):
+        return etags.not_modified(etag)
+
+    etags.set_etag(response, etag)
+    return await async_crud.get_question(db, question_id=question_id)
 
 
 # D-6
 # user_id를 path variable로 받아서 user에 해당하는 질문들을 반환
+# 오래된 질문 순, limit을 주면 limit개씩 반환하고 다음 페이지 cursor는 X-Next-Cursor 헤더로 전달
+# 답변과 투표 선택지는 질문마다 조회하지 않고 페이지의 질문들에 대해 한 번씩만 조회
 @router.get('/history/{user_id}', response_model=List[schemas.QuestionWithAnswer], status_code=200)
-def show_expired_questions(user_id: int, db: Session = Depends(get_db)):
+@metrics.query_budget(4)
+async def show_expired_questions(user_id: int, page: pagination.Page = Depends(),
+                                 db: AsyncSession = Depends(get_async_read_db)):
     response = []
     # user 존재 확인
-    crud.get_user(db, user_id=user_id)
-    questions = crud.get_expired_questions_by_userid(db=db, user_id=user_id)
+    await async_crud.get_user(db, user_id=user_id)
+    questions = await async_crud.get_expired_questions_by_userid(db=db, user_id=user_id, page=page)
+
+    # 투표 외 질문들은 답변, 투표 질문은 선택지
+    comments = await async_crud.get_comments_by_questionids(db, [q.id for q in questions if q.type == "normal"])
+    vote_options = await async_crud.get_vote_options_by_questionids(
+        db, [q.id for q in questions if q.type != "normal"])
 
     for q in questions:
-        answers = []
-        # 투표 외 질문들
         if q.type == "normal":
-            comments = crud.get_comments_by_questionid(db, q.id)
-            for c in comments:
-                answer = {"id": c.id, "val": c.content}
-                answers.append(answer)
-            question_with_answer = schemas.QuestionWithAnswer(question=q.content, type=q.type, answer=answers)
-            response.append(question_with_answer)
-
+            answers = [{"id": c.id, "val": c.content} for c in comments.get(q.id, [])]
         else:
-            vote_options = crud.get_vote_options(db, q.id)
-            for v in vote_options:
-                answer = {"id": v.id, "val": v.content, "count": v.count}
-                answers.append(answer)
-            vote_question_with_answer = schemas.QuestionWithAnswer(question=q.content, type=q.type, answer=answers)
-            response.append(vote_question_with_answer)
+            answers = [{"id": v.id, "val": v.content, "count": v.count} for v in vote_options.get(q.id, [])]
+
+        # schemas.QuestionWithAnswer 형태의 dict
+        response.append({"question": q.content, "type": q.type, "answer": answers})
 
-    return response
+    http_response = fastjson.json_response(response)
+    pagination.set_next_cursor(http_response, page)
+    return http_response
 
 
 # C-2
-# 링크 접속 시 질문 내용 반환
+# 링크 접속 시 질문 내용 반환, D-10과 같은 ETag 사용 (만료 여부는 304 전에 확인)
 @router.get('/url/', response_model=schemas.Question)
-def get_question_from_url(question_id: int, db: Session = Depends(get_db)):
-    return crud.get_valid_questions(db=db, question_id=question_id)
+@metrics.query_budget(2)
+async def get_question_from_url(question_id: int, response: Response,
+                                if_none_match: Optional[str] = Header(default=None),
+                                db: AsyncSession = Depends(get_async_read_db)):
+    version = await async_crud.get_question_version(db, question_id=question_id)
+    async_crud.check_valid_question(version)
+    etag = etags.make_etag("question", question_id, version.updated_at, version.expired)
+    if etags.matches(if_none_match, etag):
+        return etags.not_modified(etag)
+
+    etags.set_etag(response, etag)
+    return await async_crud.get_question(db, question_id=question_id)
 
 
 @router.get('/vote_options/', response_model=List[schemas.VoteOption], status_code=200)
-def get_vote_option_by_question_id(question_id: int, db: Session = Depends(get_db)):
-    return crud.get_vote_options(db=db, question_id=question_id)
\ No newline at end of file
+@metrics.query_budget(1)
+async def get_vote_option_by_question_id(question_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    return await async_crud.get_vote_options(db=db, question_id=question_id)
\ No newline at end of file
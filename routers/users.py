@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 import sys, os
 sys.path.append(os.path.dirname(os.path.abspath(os.path.dirname(__file__))))
-import schemas, crud, insta
-from database import get_db
+import schemas, crud, async_crud, insta
+import metrics
+from database import get_db, get_async_db
 
 router = APIRouter(
     prefix="/api/v1/users",
@@ -18,6 +20,7 @@ router = APIRouter(
 # 또는 링크 생성 시 user 정보 업데이트를 위해 호출
 # 프론트에서는 나중에 user 정보 조회를 위해 user_id 로컬에 저장하기
 @router.put("/by-access-token")
+@metrics.query_budget(3)
 def user_info_change_by_access_token(access_token: str = Header(default=None), db: Session = Depends(get_db)):
     # 엑세스 토큰으로 user 정보 가져옴
     user_info = insta.get_user_info(access_token=access_token)
@@ -51,20 +54,24 @@ def update_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
 # A-6
 # user_id를 path variable로 받아서 해당 user의 정보를 반환한다.
 @router.get('/{user_id}', response_model=schemas.User)
-def show_user(user_id: int, db: Session = Depends(get_db)):
-    return crud.get_user(db, user_id=user_id)
+@metrics.query_budget(1)
+async def show_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.get_user(db, user_id=user_id)
 
 
 # A-7
 # user_id를 path variable로 받아서 해당 유저를 soft delete한다.
+# 질문, 답변, 투표 선택지까지 삭제하며 질문이 많으면 응답 후 배치로 삭제
 @router.delete('/{user_id}', status_code=204)
-def delete_user(user_id: int, db: Session = Depends(get_db)):
-    return crud.delete_user(db=db, user_id=user_id)
+@metrics.query_budget(6)
+def delete_user(user_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    return crud.delete_user(db=db, user_id=user_id, background_tasks=background_tasks)
 
 
 # B-8
 # 질문 공유를 위한 url을 생성
 @router.get('/url/', response_model=str)
-def get_question_url(user_id: int, question_id: int, db: Session = Depends(get_db)):
-    insta_id = crud.get_user(db, user_id=user_id).insta_id
+@metrics.query_budget(1)
+async def get_question_url(user_id: int, question_id: int, db: AsyncSession = Depends(get_async_db)):
+    insta_id = (await async_crud.get_user(db, user_id=user_id)).insta_id
     return f'http://localhost:3000/{insta_id}/{question_id}'
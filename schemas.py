@@ -132,3 +132,11 @@ class QuestionWithAnswer(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class VoiceJob(BaseModel):
+    comment_id: int
+    status: str  # queued, processing, done, failed
+    attempts: int
+    url: Optional[str] = None  # 완료되면 s3 url
+    error: Optional[str] = None  # 마지막 실패 사유
@@ -0,0 +1,77 @@
+# storage.py
+# S3 bucket 업로드 파일, 공유 커넥션 풀을 쓰는 client 하나로 메모리 버퍼를 바로 스트리밍
+# 업로드는 개수가 제한된 스레드 풀에서 실행되고 실패는 StorageError로 알림
+
+import io
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import boto3
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from dotenv import load_dotenv
+
+# 환경변수 로드
+load_dotenv()
+
+bucket_name = os.getenv('AWS_S3_BUCKET_NAME')
+region_name = os.getenv('AWS_REGION', 'ap-northeast-2')
+# 로컬 S3 (minio, moto server 등)로 테스트할 때만 지정
+endpoint_url = os.getenv('AWS_S3_ENDPOINT_URL')
+
+# 동시에 올릴 파일 수와 파일 하나당 multipart 동시 전송 수
+S3_UPLOAD_WORKERS = int(os.getenv('S3_UPLOAD_WORKERS', '8'))
+S3_MULTIPART_CONCURRENCY = int(os.getenv('S3_MULTIPART_CONCURRENCY', '4'))
+
+
+class StorageError(Exception):
+    pass
+
+
+class S3Uploader:
+    ''' 공유 client(커넥션 풀) + 제한된 업로드 스레드 풀 '''
+
+    def __init__(self, workers: int = S3_UPLOAD_WORKERS, multipart_concurrency: int = S3_MULTIPART_CONCURRENCY):
+        self.client = boto3.client(
+            's3',
+            region_name=region_name,
+            endpoint_url=endpoint_url,
+            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+            aws_secret_access_key=os.getenv('AWS_SECRET_KEY'),
+            # 모든 업로드 스레드가 동시에 multipart 전송해도 커넥션이 모자라지 않게
+            config=Config(max_pool_connections=workers * multipart_concurrency,
+                          connect_timeout=5, read_timeout=30,
+                          retries={'max_attempts': 3, 'mode': 'standard'}),
+        )
+        # 음성 답변은 대부분 수백 KB라 한 번에, 큰 파일만 8MB 단위 multipart
+        self.transfer_config = TransferConfig(multipart_threshold=8 * 1024 * 1024,
+                                              multipart_chunksize=8 * 1024 * 1024,
+                                              max_concurrency=multipart_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="s3-upload")
+
+    def upload_fileobj(self, fileobj, key: str, content_type: str):
+        ''' 파일 객체를 스트리밍 업로드, 실패하면 StorageError '''
+        if not bucket_name:
+            raise StorageError("AWS_S3_BUCKET_NAME is not set")
+        try:
+            self.client.upload_fileobj(fileobj, bucket_name, key, ExtraArgs={'ContentType': content_type},
+                                       Config=self.transfer_config)
+        except (BotoCoreError, ClientError, S3UploadFailedError) as ex:
+            raise StorageError(f"failed to upload {key}: {ex}") from ex
+
+    def upload(self, key: str, data: bytes, content_type: str) -> Future:
+        ''' 메모리의 data를 업로드 스레드 풀에서 올리고 Future 반환 '''
+        return self._executor.submit(self.upload_fileobj, io.BytesIO(data), key, content_type)
+
+    def get_url(self, key: str) -> str:
+        if endpoint_url:
+            return f"{endpoint_url.rstrip('/')}/{bucket_name}/{key}"
+        return f"https://{bucket_name}.s3.{region_name}.amazonaws.com/{key}"
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+uploader = S3Uploader()
@@ -0,0 +1,79 @@
+# tests/conftest.py
+# 테스트 공통 설정: 임시 sqlite(또는 TEST_DATABASE_URL) DB를 DATABASE_URL로 지정하고 app과 세션을 fixture로 제공
+#
+# python -m pytest
+# TEST_DATABASE_URL=mysql+pymysql://.../tikitaka_test python -m pytest
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# database는 import할 때 엔진을 만들므로 프로젝트 모듈보다 먼저 지정, 테이블을 지우므로 이름에 test가 들어간 DB만 허용
+TEST_DB_URL = os.getenv('TEST_DATABASE_URL') or \
+    "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="tikitaka_test_"), "test.sqlite3")
+if os.getenv('TEST_DATABASE_URL') and "test" not in TEST_DB_URL.rsplit("/", 1)[-1]:
+    raise RuntimeError("TEST_DATABASE_URL must point at a database whose name contains 'test'")
+os.environ["DATABASE_URL"] = TEST_DB_URL
+for name in ("DATABASE_REPLICA_URL", "MYSQL_REPLICA_HOST"):
+    os.environ.pop(name, None)
+os.environ["QUESTIONS_FILE"] = os.path.join(ROOT, "questions.txt")
+os.environ["VOICE_SPOOL_DIR"] = tempfile.mkdtemp(prefix="tikitaka_spool_")
+
+
+@pytest.fixture(scope="session")
+def database():
+    ''' 테이블을 새로 만든 database 모듈 '''
+    import database, migrate, models
+
+    models.Base.metadata.drop_all(bind=database.engine)
+    migrate.migrate(database.engine)
+    return database
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    ''' startup/shutdown까지 실행되는 TestClient, 세션 전체에서 하나 '''
+    import main
+    from fastapi.testclient import TestClient
+
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def db(database):
+    db = database.SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def user_id(db) -> int:
+    ''' 테스트마다 새 user '''
+    from .support import make_user
+
+    return make_user(db)
+
+
+@pytest.fixture
+def voice_queue(client, monkeypatch, tmp_path):
+    ''' 프로세스 풀 대신 스레드 풀, ffmpeg 대신 고정 결과, S3 대신 StubUploader를 쓰는 voice_jobs.queue '''
+    from concurrent.futures import ThreadPoolExecutor
+    import storage, voice_alteration, voice_jobs
+    from .support import StubUploader
+
+    queue = voice_jobs.VoiceJobQueue(workers=2, max_pending=4, max_retries=1, spool_dir=str(tmp_path))
+    monkeypatch.setattr(queue, "_create_executor", lambda: ThreadPoolExecutor(max_workers=2))
+    monkeypatch.setattr(voice_alteration, "voice_alteration", lambda data, preset: b"mp4:" + data)
+    monkeypatch.setattr(storage, "uploader", StubUploader())
+    monkeypatch.setattr(voice_jobs, "queue", queue)
+    queue.start()
+    yield queue
+    queue.stop()
@@ -0,0 +1,112 @@
+# tests/support.py
+# 테스트 데이터 생성과 SQL 기록 도우미 (conftest가 DATABASE_URL을 지정한 뒤 import됨)
+
+import time
+import uuid
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import event
+
+import crud, metrics, models, schemas
+
+
+def make_user(db) -> int:
+    name = uuid.uuid4().hex[:20]
+    user = models.User(schemas.UserCreate(insta_id=name, username=name, full_name=name, follower=0, following=0,
+                                          profile_image_url=""))
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def make_questions(db, user_id: int, n: int, comments_per_question: int = 0, expired: bool = False,
+                   comment_types=(crud.CommentType.text, crud.CommentType.sound)) -> List[int]:
+    ''' 일반 질문 n개와 질문마다 답변을 만들고 질문 id 목록을 반환, 답변 created_at은 1초 간격 '''
+    now = datetime.now()
+    table = models.Question.__table__
+    question_ids = [db.execute(table.insert().values(
+        content=f"question {i}", user_id=user_id, type=crud.QuestionType.normal,
+        comment_type=crud.CommentType.anything, expired=expired, is_deleted=False,
+        created_at=now - (timedelta(days=2) if expired else timedelta(minutes=i + 1)), updated_at=now))
+        .inserted_primary_key[0] for i in range(n)]
+    rows = [{"type": comment_types[j % len(comment_types)], "content": f"comment {j}", "question_id": question_id,
+             "is_deleted": False, "created_at": now - timedelta(seconds=comments_per_question - j),
+             "updated_at": now}
+            for question_id in question_ids for j in range(comments_per_question)]
+    if rows:
+        db.execute(models.Comment.__table__.insert(), rows)
+    db.commit()
+    return question_ids
+
+
+def make_vote_questions(db, user_id: int, n: int, options=("a", "b", "c"), expired: bool = False) -> List[int]:
+    question_ids = [crud.create_vote_question(db, schemas.VoteCreate(content=f"vote {i}", user_id=user_id,
+                                                                     option=list(options)))
+                    for i in range(n)]
+    if expired:
+        db.execute(models.Question.__table__.update().where(models.Question.id.in_(question_ids))
+                   .values(expired=True))
+        db.commit()
+    return question_ids
+
+
+class RequestStatements:
+    ''' 요청 처리 중(metrics.active_request()가 있는 context)에 실행된 (SQL, parameters, executemany)만 기록
+    스케줄러, 투표 반영 스레드, 응답 후 BackgroundTasks 등 요청 밖의 쿼리는 제외 '''
+
+    def __init__(self, engines):
+        self.engines = list(engines)
+        self.executed = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if metrics.active_request() is not None:
+            self.executed.append((statement, parameters, executemany))
+
+    @property
+    def statements(self) -> List[str]:
+        return [statement for statement, _, _ in self.executed]
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._record)
+
+
+class StubUploader:
+    ''' storage.uploader 대신 쓰는 업로더, 처음 fail번은 StorageError로 실패하고 올린 key를 기록 '''
+
+    def __init__(self, fail: int = 0):
+        self.fail = fail
+        self.keys = []
+
+    def upload(self, key: str, data: bytes, content_type: str) -> Future:
+        import storage
+
+        future = Future()
+        if self.fail:
+            self.fail -= 1
+            future.set_exception(storage.StorageError("stub upload failed"))
+        else:
+            self.keys.append(key)
+            future.set_result(None)
+        return future
+
+    def get_url(self, key: str) -> str:
+        return f"https://stub-bucket/{key}"
+
+
+def wait_for_job(queue, comment_id: int, timeout: float = 10):
+    ''' 음성 답변 작업이 done/failed가 될 때까지 기다림 '''
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(comment_id)
+        if job is not None and job.status in (crud.CommentStatus.done, crud.CommentStatus.failed):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"voice job {comment_id} did not finish")
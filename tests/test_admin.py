@@ -0,0 +1,39 @@
+# tests/test_admin.py
+# 관리자 API(B-11, /metrics, pool/token 통계)는 ADMIN_TOKEN이 맞을 때만 응답
+
+import pytest
+
+import utils
+
+ADMIN_ROUTES = [
+    ("GET", "/metrics"),
+    ("GET", "/api/v1/pool-stats"),
+    ("GET", "/api/v1/token-stats"),
+    ("POST", "/api/v1/questions/random/reload"),
+]
+ROUTE_IDS = [f"{method} {path}" for method, path in ADMIN_ROUTES]
+
+
+@pytest.fixture
+def admin_token(monkeypatch) -> str:
+    monkeypatch.setattr(utils, "ADMIN_TOKEN", "secret-admin")
+    return "secret-admin"
+
+
+@pytest.mark.parametrize("method,path", ADMIN_ROUTES, ids=ROUTE_IDS)
+def test_admin_routes_reject_missing_or_wrong_token(client, admin_token, method, path):
+    assert client.request(method, path).status_code == 403
+    assert client.request(method, path, headers={"admin-token": "wrong"}).status_code == 403
+    assert client.request(method, path, headers={"Authorization": "Bearer wrong"}).status_code == 403
+
+
+@pytest.mark.parametrize("method,path", ADMIN_ROUTES, ids=ROUTE_IDS)
+def test_admin_routes_accept_token(client, admin_token, method, path):
+    assert client.request(method, path, headers={"admin-token": admin_token}).status_code == 200
+    assert client.request(method, path, headers={"Authorization": f"Bearer {admin_token}"}).status_code == 200
+
+
+@pytest.mark.parametrize("method,path", ADMIN_ROUTES, ids=ROUTE_IDS)
+def test_admin_routes_are_disabled_without_admin_token(client, monkeypatch, method, path):
+    monkeypatch.setattr(utils, "ADMIN_TOKEN", None)
+    assert client.request(method, path, headers={"admin-token": ""}).status_code == 403
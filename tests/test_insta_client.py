@@ -0,0 +1,71 @@
+# tests/test_insta_client.py
+# InstagramClient를 로컬 가짜 인스타그램 서버(fake_instagram.py)에 붙여서
+# GET만 재시도하는지, 재시도와 응답 대기가 제한되는지, keep-alive 커넥션을 다시 쓰는지 확인
+
+import time
+
+import anyio
+
+import insta
+from fake_instagram import FakeInstagram
+
+
+def make_client(fake: FakeInstagram, **kwargs) -> insta.InstagramClient:
+    options = {"retries": 2, "backoff": 0, "profile_ttl": 0, **kwargs}
+    return insta.InstagramClient(**options, **fake.client_kwargs())
+
+
+def test_get_is_retried_on_5xx():
+    with FakeInstagram(fail_first=2) as fake:
+        token = make_client(fake).get_long_token("short")
+    assert token["access_token"] == "long-short"
+    assert fake.requests == 3
+
+
+def test_get_retries_are_bounded():
+    with FakeInstagram(fail_first=10) as fake:
+        assert make_client(fake).get_refresh_token("long") == {"error": "unavailable"}
+    # 처음 요청 + 재시도 2번
+    assert fake.requests == 3
+
+
+def test_code_exchange_is_not_retried():
+    ''' 인가 코드는 한 번만 쓸 수 있으므로 POST는 실패해도 다시 보내지 않음 '''
+    with FakeInstagram(fail_first=1) as fake:
+        assert make_client(fake).get_short_token("code") is None
+    assert fake.requests == 1
+
+
+def test_read_timeout_is_bounded():
+    with FakeInstagram(delay=2.0) as fake:
+        client = make_client(fake, read_timeout=0.2, retries=1)
+        started = time.monotonic()
+        assert client.get_user_info("token") is None
+        elapsed = time.monotonic() - started
+    # 응답을 기다리지 않고 (시도 2번 x 0.2초) 뒤에 포기
+    assert elapsed < 1.5
+    assert fake.requests == 2
+
+
+def test_connections_are_reused():
+    with FakeInstagram() as fake:
+        client = make_client(fake)
+        for i in range(20):
+            assert client.get_user_info(f"token{i}").username == f"user_token{i}"
+    assert fake.requests == 40
+    assert fake.connections == 1
+
+
+def test_async_calls_are_limited():
+    ''' 동시에 보낸 async 요청도 max_concurrency개 커넥션만 사용 '''
+    with FakeInstagram(delay=0.05) as fake:
+        client = make_client(fake, max_concurrency=4)
+
+        async def main():
+            async with anyio.create_task_group() as group:
+                for i in range(16):
+                    group.start_soon(client.aget_long_token, f"short{i}")
+
+        anyio.run(main)
+    assert fake.requests == 16
+    assert fake.connections <= 4
@@ -0,0 +1,28 @@
+# tests/test_migrate.py
+# migrate.py가 기존 테이블에 빠진 컬럼/인덱스를 추가하고, 여러 번 실행해도 그대로인지 확인
+
+import os
+
+from sqlalchemy import create_engine, inspect
+
+import migrate, models
+
+
+def test_migrate_adds_missing_columns_and_indexes(tmp_path):
+    engine = create_engine("sqlite:///" + os.path.join(tmp_path, "old.sqlite3"))
+    models.Base.metadata.create_all(bind=engine)
+    # 컬럼/인덱스가 추가되기 전의 스키마
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_comment_question_created")
+        conn.exec_driver_sql("ALTER TABLE comment DROP COLUMN status")
+        conn.exec_driver_sql("INSERT INTO comment (type, content, question_id, is_deleted) VALUES ('text', 'old', 1, 0)")
+
+    migrate.migrate(engine)
+    migrate.migrate(engine)
+
+    inspector = inspect(engine)
+    assert "status" in {column["name"] for column in inspector.get_columns("comment")}
+    assert "ix_comment_question_created" in {index["name"] for index in inspector.get_indexes("comment")}
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT status FROM comment").scalar() == "done"
+    engine.dispose()
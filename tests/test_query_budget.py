@@ -0,0 +1,179 @@
+# tests/test_query_budget.py
+# 라우트마다 @metrics.query_budget(n)으로 정한 SQL 문 수를 넘지 않는지 확인하는 N+1 회귀 검사
+# 데이터가 적은 user와 많은 user로 같은 라우트를 호출해서, 예산을 넘거나 데이터가 많을 때 문 수가 늘면 실패
+
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+import insta, models, voice_alteration, vote_counter
+from fake_instagram import FakeInstagram
+from .support import RequestStatements, make_questions, make_user, make_vote_questions
+
+# (질문 수, 질문마다 답변 수)
+SIZES = {"small": (2, 2), "large": (20, 10)}
+
+# 스트림은 끝나지 않아서 TestClient로 호출하지 않음 (구독 전 조회는 D-5, D-9와 같은 함수)
+SKIPPED = {"/api/v1/comments/vote/{question_id}/stream", "/api/v1/comments/users/{user_id}/vote/stream"}
+
+# (method, path, 요청 인자) - path의 {user_id} 등과 요청 인자는 seed 결과(ids)로 채움
+CASES = [
+    ("GET", "/api/v1/users/{user_id}", None),
+    ("GET", "/api/v1/users/url/?user_id={user_id}&question_id={question_id}", None),
+    ("GET", "/api/v1/questions/random?type=normal", None),
+    ("GET", "/api/v1/questions/{question_id}", None),
+    ("GET", "/api/v1/questions/url/?question_id={question_id}", None),
+    ("GET", "/api/v1/questions/history/{user_id}", None),
+    ("GET", "/api/v1/questions/history/{user_id}?limit=5", None),
+    ("GET", "/api/v1/questions/vote_options/?question_id={vote_question_id}", None),
+    ("GET", "/api/v1/comments/users/{user_id}/text", None),
+    ("GET", "/api/v1/comments/users/{user_id}/sound", None),
+    ("GET", "/api/v1/comments/users/{user_id}/vote", None),
+    ("GET", "/api/v1/comments/questions/{question_id}", None),
+    ("GET", "/api/v1/comments/questions/{question_id}?limit=5", None),
+    ("GET", "/api/v1/comments/vote/{vote_question_id}", None),
+    ("GET", "/api/v1/comments/{comment_id}", None),
+    ("GET", "/api/v1/comments/voice/{sound_comment_id}", None),
+    # A-3
+    ("PUT", "/api/v1/users/by-access-token", lambda ids: {"headers": {"access-token": ids["insta_id"]}}),
+    # A-7, 질문이 많아도 DELETE_BATCH_SIZE 이하면 한 트랜잭션에서 삭제
+    ("DELETE", "/api/v1/users/{deleted_user_id}", None),
+    # B-10
+    ("POST", "/api/v1/questions/vote/", lambda ids: {"json": {"content": "budget vote", "user_id": ids["user_id"],
+                                                              "option": ["a", "b", "c", "d"]}}),
+    # C-4
+    ("PUT", "/api/v1/comments/vote/{vote_option_id}", None),
+    # C-5
+    ("POST", "/api/v1/comments/text", lambda ids: {"json": {"content": "budget", "question_id": ids["question_id"]}}),
+    # C-6
+    ("POST", "/api/v1/comments/voice", lambda ids: {"data": {"question_id": str(ids["question_id"])},
+                                                    "files": {"file": ("voice.webm", b"webm", "audio/webm")}}),
+    # F-2
+    ("DELETE", "/api/v1/questions/{deleted_question_id}", None),
+]
+CASE_IDS = [f"{method} {path}" for method, path, _ in CASES]
+
+
+def seed(db, n_questions: int, n_comments: int) -> dict:
+    ''' 유효한 질문, 만료된 질문, 투표 질문(유효/만료)과 삭제할 user를 만들고 path에 넣을 id들을 반환 '''
+    user_id = make_user(db)
+    valid = make_questions(db, user_id, n_questions, n_comments)
+    make_questions(db, user_id, n_questions, n_comments, expired=True)
+    votes = make_vote_questions(db, user_id, n_questions)
+    make_vote_questions(db, user_id, n_questions, expired=True)
+    deleted_user_id = make_user(db)
+    make_questions(db, deleted_user_id, n_questions, n_comments)
+    make_vote_questions(db, deleted_user_id, n_questions)
+
+    comments = {row.type: row.id for row in db.query(models.Comment.type, models.Comment.id)
+                .filter(models.Comment.question_id == valid[0])}
+    option = db.query(models.VoteOption).filter(models.VoteOption.question_id == votes[0]).first()
+    return {"user_id": user_id, "insta_id": db.get(models.User, user_id).insta_id, "question_id": valid[0],
+            "vote_question_id": votes[0], "comment_id": comments["text"], "sound_comment_id": comments["sound"],
+            "vote_option_id": option.id, "deleted_question_id": valid[-1], "deleted_user_id": deleted_user_id}
+
+
+@pytest.fixture(scope="module")
+def sizes(database) -> dict:
+    db = database.SessionLocal()
+    try:
+        return {size: seed(db, *counts) for size, counts in SIZES.items()}
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="module")
+def instagram():
+    ''' A-3이 부르는 인스타그램 API를 가짜 서버로, username은 user_{access_token}, 프로필 id는 access_token '''
+    with FakeInstagram() as fake, pytest.MonkeyPatch.context() as patch:
+        patch.setattr(insta, "client", insta.InstagramClient(retries=0, profile_ttl=0, **fake.client_kwargs()))
+        yield fake
+
+
+def route_budgets(app) -> dict:
+    ''' (method, 라우트 경로) -> query_budget '''
+    return {(method, route.path): getattr(route.endpoint, "query_budget", None)
+            for route in app.routes if hasattr(route, "methods") for method in route.methods}
+
+
+def route_template(app, method: str, path: str) -> str | None:
+    ''' Starlette처럼 앞에서부터 처음 맞는 라우트의 경로 '''
+    for route in app.routes:
+        if method in getattr(route, "methods", ()) and route.path_regex.match(path):
+            return route.path
+    return None
+
+
+def check_budget(database, client, sizes, method: str, path: str, kwargs):
+    import main
+
+    counts, statements = {}, {}
+    for size, ids in sizes.items():
+        with RequestStatements(engine for engine, _ in database.engines().values()) as recorder:
+            response = client.request(method, path.format(**ids), **(kwargs(ids) if kwargs else {}))
+        assert response.status_code < 400, (size, response.status_code, response.text)
+        counts[size], statements[size] = len(recorder.statements), recorder.statements
+
+    template = route_template(main.app, method, path.format(**sizes["small"]).split("?")[0])
+    budget = route_budgets(main.app).get((method, template))
+    assert budget is not None, f"{method} {template} has no @metrics.query_budget"
+    assert counts["small"] <= budget and counts["large"] <= budget, statements
+    assert counts["large"] <= counts["small"], f"statement count grows with data: {counts}"
+
+
+@pytest.mark.parametrize("method,path,kwargs", CASES, ids=CASE_IDS)
+def test_route_stays_within_query_budget(database, client, sizes, instagram, voice_queue, monkeypatch,
+                                         method, path, kwargs):
+    # 변조가 바로 끝나면 C-6 요청 스레드에서 작업 완료 처리(답변 UPDATE)까지 실행되므로 요청이 끝날 때까지 잡아둠
+    released = threading.Event()
+    altered = voice_alteration.voice_alteration
+    monkeypatch.setattr(voice_alteration, "voice_alteration",
+                        lambda data, preset: released.wait(10) and altered(data, preset))
+    try:
+        check_budget(database, client, sizes, method, path, kwargs)
+    finally:
+        released.set()
+
+
+def test_direct_vote_stays_within_query_budget(database, client, sizes, monkeypatch):
+    ''' VOTE_FLUSH_INTERVAL=0이면 C-4가 요청 안에서 바로 count를 올림 '''
+    monkeypatch.setattr(vote_counter, "counter", vote_counter.VoteCounter(interval=0))
+    check_budget(database, client, sizes, "PUT", "/api/v1/comments/vote/{vote_option_id}", None)
+
+
+def test_every_read_route_is_checked(sizes):
+    ''' routers/의 GET 라우트(스트림 제외)는 모두 CASES에 있어야 함 '''
+    import main
+    from routers import comments, questions, users
+
+    prefixes = tuple(router.prefix for router in (comments.router, questions.router, users.router))
+    covered = {route_template(main.app, method, path.format(**sizes["small"]).split("?")[0])
+               for method, path, _ in CASES if method == "GET"}
+    missing = [template for (method, template) in route_budgets(main.app)
+               if method == "GET" and template.startswith(prefixes) and template not in SKIPPED
+               and template not in covered]
+    assert missing == []
+
+
+def test_background_tasks_are_not_counted(client, db, monkeypatch):
+    ''' A-7이 응답 후 BackgroundTasks로 질문을 배치 삭제해도 요청의 쿼리 수, 지연 시간에 넣지 않음 '''
+    import crud, main, metrics
+
+    monkeypatch.setattr(crud, "DELETE_BATCH_SIZE", 2)
+    user_id = make_user(db)
+    make_questions(db, user_id, 5, 2)
+    labels = ("DELETE", "/api/v1/users/{user_id}")
+    exceeded = metrics.query_budget_exceeded.labels(*labels).value
+    before = metrics.request_queries.labels(*labels).snapshot()
+
+    response = client.delete(f"/api/v1/users/{user_id}")
+    assert response.status_code == 204
+    # 배치 삭제는 끝났지만 요청에서 센 쿼리는 user 삭제까지만
+    assert db.query(models.Question).filter(models.Question.user_id == user_id,
+                                            models.Question.is_deleted == False).count() == 0
+    after = metrics.request_queries.labels(*labels).snapshot()
+    assert after["count"] == before["count"] + 1
+    assert after["sum"] - before["sum"] <= route_budgets(main.app)[labels]
+    assert metrics.query_budget_exceeded.labels(*labels).value == exceeded
@@ -0,0 +1,120 @@
+# tests/test_query_plans.py
+# 라우트가 실제로 실행하는 SQL(async_crud 조회, 쓰기 경로의 UPDATE)과 백그라운드 작업의 SQL을
+# 시드된 DB에서 EXPLAIN 해서, 인덱스 없이 테이블을 처음부터 끝까지 읽는 쿼리가 있으면 실패
+
+import pytest
+from sqlalchemy import event
+
+import crud
+from .support import RequestStatements, make_questions, make_user, make_vote_questions
+
+# 운영 데이터처럼 대부분의 질문은 만료된 상태
+USERS = 20
+VALID_QUESTIONS = 5
+EXPIRED_QUESTIONS = 40
+
+# (method, path) - path의 {user_id} 등은 시드 결과로 채움
+ROUTES = [
+    ("GET", "/api/v1/users/{user_id}"),
+    ("GET", "/api/v1/users/url/?user_id={user_id}&question_id={question_id}"),
+    ("GET", "/api/v1/questions/{question_id}"),
+    ("GET", "/api/v1/questions/url/?question_id={question_id}"),
+    ("GET", "/api/v1/questions/history/{user_id}"),
+    ("GET", "/api/v1/questions/history/{user_id}?limit=5&cursor={cursor}"),
+    ("GET", "/api/v1/questions/vote_options/?question_id={vote_question_id}"),
+    ("GET", "/api/v1/comments/users/{user_id}/text"),
+    ("GET", "/api/v1/comments/users/{user_id}/text?limit=5&cursor={cursor}"),
+    ("GET", "/api/v1/comments/users/{user_id}/sound"),
+    ("GET", "/api/v1/comments/users/{user_id}/vote"),
+    ("GET", "/api/v1/comments/questions/{question_id}"),
+    ("GET", "/api/v1/comments/questions/{question_id}?limit=5&cursor={cursor}"),
+    ("GET", "/api/v1/comments/vote/{vote_question_id}"),
+    ("GET", "/api/v1/comments/{comment_id}"),
+    ("PUT", "/api/v1/comments/vote/{vote_option_id}"),
+    ("DELETE", "/api/v1/questions/{deleted_question_id}"),
+    ("DELETE", "/api/v1/users/{deleted_user_id}"),
+]
+
+
+def full_scans(conn, statement: str, parameters) -> list:
+    ''' EXPLAIN 결과에서 전체 스캔하는 테이블 목록 '''
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+        # detail 예: "SCAN question", "SEARCH question USING INDEX ix_question_user_valid (user_id=?)"
+        return [row[-1] for row in rows if row[-1].startswith("SCAN ")]
+    rows = conn.exec_driver_sql("EXPLAIN " + statement, parameters).mappings().fetchall()
+    return [f"{row['table']} (type=ALL)" for row in rows if row["type"] == "ALL"]
+
+
+def check_plans(database, executed: list) -> list:
+    ''' 실행된 SELECT/UPDATE/DELETE 중 전체 스캔이 있는 (SQL, 스캔) 목록, executemany는 첫 파라미터로 확인 '''
+    failures = []
+    with database.engine.connect() as conn:
+        for statement, parameters, executemany in executed:
+            if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+            scans = full_scans(conn, statement, parameters[0] if executemany else parameters)
+            if scans:
+                failures.append((" ".join(statement.split()), scans))
+    return failures
+
+
+@pytest.fixture(scope="module")
+def ids(database, client):
+    ''' user마다 유효한/만료된 질문과 투표 질문, 답변을 넣고 검사할 user의 id들을 반환 '''
+    from pagination import encode_cursor
+    import models
+
+    db = database.SessionLocal()
+    try:
+        for _ in range(USERS):
+            user_id = make_user(db)
+            valid = make_questions(db, user_id, VALID_QUESTIONS, 4)
+            make_questions(db, user_id, EXPIRED_QUESTIONS, 4, expired=True)
+            votes = make_vote_questions(db, user_id, 3)
+            make_vote_questions(db, user_id, 3, expired=True)
+        deleted_user_id = make_user(db)
+        make_questions(db, deleted_user_id, 3, 2)
+        if database.engine.dialect.name == "sqlite":
+            db.execute("ANALYZE")
+        else:
+            db.execute("ANALYZE TABLE user, question, comment, vote_option, random_question")
+        db.commit()
+        comment = db.query(models.Comment).filter(models.Comment.question_id == valid[0]).first()
+        option = db.query(models.VoteOption).filter(models.VoteOption.question_id == votes[0]).first()
+        return {"user_id": user_id, "question_id": valid[0], "vote_question_id": votes[0],
+                "comment_id": comment.id, "vote_option_id": option.id, "deleted_question_id": valid[-1],
+                "deleted_user_id": deleted_user_id, "cursor": encode_cursor(comment.created_at, comment.id)}
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("method,path", ROUTES, ids=[f"{method} {path}" for method, path in ROUTES])
+def test_route_queries_use_indexes(database, client, ids, method, path):
+    with RequestStatements(engine for engine, _ in database.engines().values()) as recorder:
+        response = client.request(method, path.format(**ids))
+    assert response.status_code < 400, response.text
+    assert recorder.executed, "route ran no SQL"
+    assert check_plans(database, recorder.executed) == []
+
+
+def test_background_queries_use_indexes(database, ids):
+    ''' expiry 스케줄러, 투표 반영, 대량 계정 배치 삭제 '''
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters, executemany))
+
+    event.listen(database.engine, "before_cursor_execute", record)
+    db = database.SessionLocal()
+    try:
+        user_id = make_user(db)
+        make_questions(db, user_id, 3, 2)
+        executed.clear()
+        crud.expire_questions(db, batch_size=100)
+        crud.add_vote_counts(db, {ids["vote_option_id"]: 1})
+        crud.delete_questions_in_batches(user_id, batch_size=100)
+    finally:
+        db.close()
+        event.remove(database.engine, "before_cursor_execute", record)
+    assert check_plans(database, executed) == []
@@ -0,0 +1,16 @@
+# tests/test_random_questions.py
+# B-4 랜덤 질문: ETag가 맞으면 304, 없는 type은 ETag가 맞아도 404
+
+def test_etag_is_revalidated(client):
+    response = client.get("/api/v1/questions/random?type=normal")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    assert client.get("/api/v1/questions/random?type=normal", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_unknown_type_is_not_found_even_with_matching_etag(client):
+    etag = client.get("/api/v1/questions/random?type=normal").headers["ETag"]
+
+    response = client.get("/api/v1/questions/random?type=unknown", headers={"If-None-Match": etag})
+    assert response.status_code == 404
@@ -0,0 +1,119 @@
+# tests/test_read_replica.py
+# 읽기/쓰기 세션 분리 확인: primary와 replica로 쓸 sqlite 파일 두 개에 같은 id, 다른 내용의 데이터를 넣고
+# GET 라우트가 replica 내용을, 쓰기와 primary 전용 조회(A-6, D-3)가 primary 내용을 돌려주는지 본다
+# database는 import 시 엔진을 만들므로 replica 설정 유무, DB_READ_FROM_REPLICA=false 세 경우를 각각 새 프로세스에서 실행
+
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import migrate, models
+from .conftest import ROOT
+
+SCENARIOS = {
+    # 이름: (replica 사용, 환경변수)
+    "replica": (True, {}),
+    "no replica": (False, {}),
+    "replica disabled": (False, {"DB_READ_FROM_REPLICA": "false"}),
+}
+
+# 새 프로세스에서 현재 환경변수로 main을 불러와 라우트별로 어느 DB 내용이 오는지 JSON으로 출력
+PROBE = '''
+import json
+import database, main, models
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import InvalidRequestError
+
+result = {"read_replica": database.read_replica, "engines": sorted(database.engines())}
+with TestClient(main.app) as client:
+    result["D-10"] = client.get("/api/v1/questions/1").json()["content"]
+    result["D-7"] = client.get("/api/v1/comments/users/1/text").json()[0]["content"]
+    result["D-2"] = client.get("/api/v1/comments/questions/1").json()[0]["content"]
+    result["vote options"] = client.get("/api/v1/questions/vote_options/?question_id=2").json()[0]["content"]
+    result["A-6"] = client.get("/api/v1/users/1").json()["username"]
+    result["D-3"] = client.get("/api/v1/comments/1").json()["content"]
+    result["B-1 status"] = client.post("/api/v1/questions/", json={
+        "content": "written", "user_id": 1, "type": "normal", "comment_type": "anything"}).status_code
+    result["C-5 status"] = client.post("/api/v1/comments/text",
+                                       json={"content": "written", "question_id": 1}).status_code
+
+db = database.ReadSessionLocal()
+try:
+    db.get(models.User, 1).username = "changed"
+    db.flush()
+    result["read-only flush"] = "accepted"
+except InvalidRequestError:
+    result["read-only flush"] = "rejected"
+finally:
+    db.close()
+print(json.dumps(result))
+'''
+
+
+def seed(url: str, label: str):
+    ''' user, 질문, 답변, 투표 질문을 넣음, 내용에 label을 붙여 어느 DB에서 읽었는지 구분 '''
+    engine = create_engine(url)
+    migrate.migrate(engine)
+    now = datetime.now()
+    common = {"is_deleted": False, "created_at": now, "updated_at": now}
+    with Session(engine) as db:
+        db.execute(models.User.__table__.insert(), [{
+            "insta_id": "replica", "username": label, "full_name": label, "follower": 0, "following": 0,
+            "profile_image_url": "", **common}])
+        db.execute(models.Question.__table__.insert(), [
+            {"content": label, "user_id": 1, "comment_type": "anything", "type": "normal", "expired": False, **common},
+            {"content": label, "user_id": 1, "comment_type": "anything", "type": "vote", "expired": False, **common}])
+        db.execute(models.Comment.__table__.insert(), [
+            {"type": "text", "question_id": 1, "content": label, "status": "done", **common}])
+        db.execute(models.VoteOption.__table__.insert(), [
+            {"num": 1, "content": label, "count": 0, "question_id": 2, **common}])
+        db.commit()
+    engine.dispose()
+
+
+def written(url: str) -> dict:
+    ''' probe가 쓴 질문, 답변 수 '''
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        counts = {table: conn.exec_driver_sql(f"SELECT COUNT(*) FROM {table} WHERE content = 'written'").scalar()
+                  for table in ("question", "comment")}
+    engine.dispose()
+    return counts
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_reads_use_replica_and_writes_use_primary(tmp_path, scenario):
+    uses_replica, extra = SCENARIOS[scenario]
+    urls = {label: "sqlite:///" + os.path.join(tmp_path, f"{label}.sqlite3") for label in ("primary", "replica")}
+    for label, url in urls.items():
+        seed(url, label)
+
+    env = {key: value for key, value in os.environ.items()
+           if key not in ("DATABASE_REPLICA_URL", "MYSQL_REPLICA_HOST", "DB_READ_FROM_REPLICA")}
+    env.update({"DATABASE_URL": urls["primary"], **extra})
+    if scenario != "no replica":
+        env["DATABASE_REPLICA_URL"] = urls["replica"]
+    probe = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env, capture_output=True, text=True,
+                           timeout=60)
+    assert probe.returncode == 0, probe.stderr
+    result = json.loads(probe.stdout.strip().splitlines()[-1])
+
+    read_label = "replica" if uses_replica else "primary"
+    assert result["read_replica"] is uses_replica
+    assert result["engines"] == sorted(["sync", "async"] + (["read", "async_read"] if uses_replica else []))
+    # GET 조회는 read 세션
+    assert {route: result[route] for route in ("D-10", "D-2", "D-7", "vote options")} == \
+           dict.fromkeys(("D-10", "D-2", "D-7", "vote options"), read_label)
+    # 방금 쓴 내용을 읽는 조회는 primary
+    assert (result["A-6"], result["D-3"]) == ("primary", "primary")
+    # 쓰기는 primary에만
+    assert (result["B-1 status"], result["C-5 status"]) == (201, 201)
+    assert written(urls["primary"]) == {"question": 1, "comment": 1}
+    assert written(urls["replica"]) == {"question": 0, "comment": 0}
+    assert result["read-only flush"] == "rejected"
@@ -0,0 +1,71 @@
+# tests/test_soft_delete.py
+# is_deleted로 지운 선택지/답변은 투표(C-4)와 조회(D-2, D-3, D-5, D-9)에서 없는 것으로 취급
+# user(A-7), 질문(F-2)을 지우면 질문의 답변, 투표 선택지까지 같이 지움
+
+import pytest
+
+import crud, models
+from .support import make_questions, make_vote_questions
+
+
+def soft_delete(db, model, id: int):
+    db.query(model).filter(model.id == id).update({model.is_deleted: True})
+    db.commit()
+
+
+def test_deleted_vote_option_is_not_votable_or_listed(client, db, user_id):
+    question_id = make_vote_questions(db, user_id, 1, options=("kept", "deleted"))[0]
+    kept, deleted = db.query(models.VoteOption).filter(models.VoteOption.question_id == question_id) \
+        .order_by(models.VoteOption.num).all()
+    soft_delete(db, models.VoteOption, deleted.id)
+
+    assert client.put(f"/api/v1/comments/vote/{deleted.id}").status_code == 404
+    assert client.put(f"/api/v1/comments/vote/{kept.id}").status_code == 200
+    assert client.get(f"/api/v1/comments/vote/{question_id}").json()["options"] == ["kept"]
+    assert client.get(f"/api/v1/comments/users/{user_id}/vote").json()[0]["options"] == ["kept"]
+    assert [option["content"] for option in
+            client.get(f"/api/v1/questions/vote_options/?question_id={question_id}").json()] == ["kept"]
+
+
+def test_deleted_comment_is_not_listed(client, db, user_id):
+    question_id = make_questions(db, user_id, 1, comments_per_question=2, comment_types=("text",))[0]
+    kept, deleted = db.query(models.Comment).filter(models.Comment.question_id == question_id) \
+        .order_by(models.Comment.id).all()
+    soft_delete(db, models.Comment, deleted.id)
+
+    assert [comment["id"] for comment in client.get(f"/api/v1/comments/questions/{question_id}").json()] == [kept.id]
+    assert [comment["id"] for comment in client.get(f"/api/v1/comments/users/{user_id}/text").json()] == [kept.id]
+    assert client.get(f"/api/v1/comments/{deleted.id}").status_code == 404
+
+
+def live_rows(db, question_ids) -> dict:
+    ''' 질문들과 그 답변, 투표 선택지 중 is_deleted == False인 행 수 '''
+    return {model.__tablename__: db.query(model).filter(
+                (model.id if model is models.Question else model.question_id).in_(question_ids),
+                model.is_deleted == False).count()
+            for model in (models.Question, models.Comment, models.VoteOption)}
+
+
+@pytest.mark.parametrize("batch_size", [100, 2], ids=["one transaction", "background batches"])
+def test_delete_user_deletes_questions_comments_and_options(client, db, user_id, monkeypatch, batch_size):
+    ''' 질문 수가 DELETE_BATCH_SIZE 이하면 요청 안에서, 넘으면 응답 후 배치로 삭제 '''
+    monkeypatch.setattr(crud, "DELETE_BATCH_SIZE", batch_size)
+    question_ids = make_questions(db, user_id, 3, comments_per_question=2) + make_vote_questions(db, user_id, 2)
+
+    assert client.delete(f"/api/v1/users/{user_id}").status_code == 204
+    db.expire_all()
+    assert live_rows(db, question_ids) == {"question": 0, "comment": 0, "vote_option": 0}
+    assert db.get(models.User, user_id).is_deleted
+    assert client.delete(f"/api/v1/users/{user_id}").status_code == 405
+
+
+def test_delete_question_deletes_comments_and_options(client, db, user_id):
+    question_id = make_questions(db, user_id, 1, comments_per_question=2)[0]
+    vote_id = make_vote_questions(db, user_id, 1)[0]
+
+    for id in (question_id, vote_id):
+        assert client.delete(f"/api/v1/questions/{id}").status_code == 204
+    db.expire_all()
+    assert live_rows(db, [question_id, vote_id]) == {"question": 0, "comment": 0, "vote_option": 0}
+    for id in (question_id, vote_id):
+        assert client.delete(f"/api/v1/questions/{id}").status_code == 405
@@ -0,0 +1,99 @@
+# tests/test_storage.py
+# S3Uploader를 moto의 가짜 S3에 올려서 업로드 결과, 실패 시 StorageError, botocore 재시도,
+# 여러 업로드 스레드가 client(커넥션 풀) 하나를 같이 쓰는지 확인
+
+import threading
+from concurrent.futures import wait
+
+import boto3
+import pytest
+from botocore.exceptions import EndpointConnectionError
+from botocore.retries import standard
+from moto import mock_s3
+
+import storage
+
+BUCKET = "tikitaka-test"
+
+
+@pytest.fixture
+def uploader(monkeypatch):
+    ''' 가짜 S3에 bucket을 만들고 그 bucket으로 올리는 S3Uploader '''
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_KEY", "testing")
+    monkeypatch.setattr(storage, "bucket_name", BUCKET)
+    monkeypatch.setattr(storage, "endpoint_url", None)
+    # 재시도 대기 없이 바로 다시 보냄
+    monkeypatch.setattr(standard.ExponentialBackoff, "delay_amount", lambda self, context: 0)
+    with mock_s3():
+        uploader = storage.S3Uploader(workers=4, multipart_concurrency=2)
+        uploader.client.create_bucket(Bucket=BUCKET,
+                                      CreateBucketConfiguration={"LocationConstraint": storage.region_name})
+        yield uploader
+        uploader.shutdown()
+
+
+def fail_sends(uploader, times: int) -> list:
+    ''' PutObject 요청을 처음 times번 커넥션 오류로 실패시키고, 보낸 횟수를 담을 목록을 반환 '''
+    sent = []
+
+    def before_send(request, **kwargs):
+        sent.append(request.url)
+        if len(sent) <= times:
+            raise EndpointConnectionError(endpoint_url=request.url)
+
+    uploader.client.meta.events.register("before-send.s3.PutObject", before_send)
+    return sent
+
+
+def test_upload_stores_object(uploader):
+    uploader.upload("1.mp4", b"mp4 data", "video/mp4").result()
+
+    stored = uploader.client.get_object(Bucket=BUCKET, Key="1.mp4")
+    assert stored["Body"].read() == b"mp4 data"
+    assert stored["ContentType"] == "video/mp4"
+    assert uploader.get_url("1.mp4") == f"https://{BUCKET}.s3.{storage.region_name}.amazonaws.com/1.mp4"
+
+
+def test_missing_bucket_raises_storage_error(uploader, monkeypatch):
+    monkeypatch.setattr(storage, "bucket_name", "missing-bucket")
+    with pytest.raises(storage.StorageError):
+        uploader.upload("1.mp4", b"mp4 data", "video/mp4").result()
+
+
+def test_transient_error_is_retried(uploader):
+    sent = fail_sends(uploader, times=2)
+    uploader.upload("retried.mp4", b"mp4 data", "video/mp4").result()
+
+    assert len(sent) == 3
+    assert uploader.client.get_object(Bucket=BUCKET, Key="retried.mp4")["Body"].read() == b"mp4 data"
+
+
+def test_retries_are_bounded(uploader):
+    sent = fail_sends(uploader, times=10)
+    with pytest.raises(storage.StorageError):
+        uploader.upload("lost.mp4", b"mp4 data", "video/mp4").result()
+    # retries={'max_attempts': 3}은 처음 요청 + 재시도 3번
+    assert len(sent) == 4
+
+
+def test_concurrent_uploads_share_one_client(uploader, monkeypatch):
+    threads = set()
+    upload_fileobj = uploader.upload_fileobj
+
+    def recorded(fileobj, key: str, content_type: str):
+        threads.add(threading.current_thread().name)
+        return upload_fileobj(fileobj, key, content_type)
+
+    def no_new_clients(*args, **kwargs):
+        raise AssertionError("uploads must reuse the shared client")
+
+    monkeypatch.setattr(uploader, "upload_fileobj", recorded)
+    monkeypatch.setattr(boto3, "client", no_new_clients)
+    futures = [uploader.upload(f"{i}.mp4", bytes([i]) * 1024, "video/mp4") for i in range(40)]
+    wait(futures)
+
+    assert [future.exception() for future in futures] == [None] * 40
+    assert len(threads) > 1 and all(name.startswith("s3-upload") for name in threads)
+    keys = {item["Key"] for item in uploader.client.list_objects_v2(Bucket=BUCKET)["Contents"]}
+    assert keys == {f"{i}.mp4" for i in range(40)}
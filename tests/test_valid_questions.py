@@ -0,0 +1,27 @@
+# tests/test_valid_questions.py
+# D-7, D-8은 유효한 질문(crud.valid_question_filter)이 없는 user면 404
+# 24시간이 지났지만 아직 만료 처리(expiry)되지 않은 질문만 있어도 유효한 질문이 없는 것으로 취급
+
+from datetime import timedelta
+
+import crud, models
+from .support import make_questions
+
+
+def test_user_with_only_stale_questions_is_not_found(client, db, user_id):
+    question_id = make_questions(db, user_id, 1, comments_per_question=2)[0]
+    db.query(models.Question).filter(models.Question.id == question_id) \
+        .update({models.Question.created_at: crud.get_expire_line() - timedelta(minutes=1)})
+    db.commit()
+
+    for type in ("text", "sound"):
+        assert client.get(f"/api/v1/comments/users/{user_id}/{type}").status_code == 404
+
+
+def test_user_with_valid_question_and_no_comments_gets_empty_list(client, db, user_id):
+    make_questions(db, user_id, 1)
+
+    for type in ("text", "sound"):
+        response = client.get(f"/api/v1/comments/users/{user_id}/{type}")
+        assert response.status_code == 200
+        assert response.json() == []
@@ -0,0 +1,152 @@
+# tests/test_voice_jobs.py
+# C-6/C-7 음성 답변 작업 큐: 답변 상태가 db에 남는지, 실패/미완료 답변이 D-8에서 빠지는지,
+# 큐 자리와 업로드 크기 제한, 재시작 후 spool 복구, stop()의 재시도 timer 취소
+
+import os
+import time
+
+import pytest
+
+import crud, models, storage, voice_alteration, voice_jobs
+from .support import StubUploader, make_questions, wait_for_job
+
+
+def post_voice(client, question_id: int, data: bytes = b"webm", preset: str = "high"):
+    return client.post("/api/v1/comments/voice", data={"question_id": str(question_id), "preset": preset},
+                       files={"file": ("voice.webm", data, "audio/webm")})
+
+
+def sound_comments(client, user_id: int) -> list:
+    return [comment["id"] for comment in client.get(f"/api/v1/comments/users/{user_id}/sound").json()]
+
+
+def comment_status(db, comment_id: int) -> str:
+    db.expire_all()
+    return db.get(models.Comment, comment_id).status
+
+
+def test_done_comment_is_listed_with_url(client, db, user_id, voice_queue):
+    question_id = make_questions(db, user_id, 1)[0]
+    response = post_voice(client, question_id)
+    assert response.status_code == 202, response.text
+    comment_id = response.json()["id"]
+
+    job = wait_for_job(voice_queue, comment_id)
+    assert job.status == crud.CommentStatus.done
+    assert comment_status(db, comment_id) == crud.CommentStatus.done
+    assert comment_id in sound_comments(client, user_id)
+    assert storage.uploader.keys == [f"{comment_id}.mp4"]
+    assert os.listdir(voice_queue.spool_dir) == []
+
+
+def test_failed_comment_is_marked_and_hidden(client, db, user_id, voice_queue, monkeypatch):
+    def broken(data, preset):
+        raise RuntimeError("ffmpeg failed")
+
+    monkeypatch.setattr(voice_alteration, "voice_alteration", broken)
+    question_id = make_questions(db, user_id, 1)[0]
+    comment_id = post_voice(client, question_id).json()["id"]
+
+    job = wait_for_job(voice_queue, comment_id)
+    assert job.status == crud.CommentStatus.failed
+    assert job.attempts == voice_queue.max_retries + 1
+    assert comment_status(db, comment_id) == crud.CommentStatus.failed
+    assert comment_id not in sound_comments(client, user_id)
+    assert os.listdir(voice_queue.spool_dir) == []
+
+    # 메모리 기록이 없어도 C-7은 db 상태로 답함
+    voice_queue._finished.clear()
+    assert client.get(f"/api/v1/comments/voice/{comment_id}").json()["status"] == crud.CommentStatus.failed
+
+
+def test_unfinished_comment_is_hidden(client, db, user_id, voice_queue):
+    question_id = make_questions(db, user_id, 1)[0]
+    # 작업 없이 답변만 queued로 저장된 상태
+    comment = crud.create_sound_comment(db, question_id=question_id)
+    assert comment.status == crud.CommentStatus.queued
+    assert comment.id not in sound_comments(client, user_id)
+    assert client.get(f"/api/v1/comments/voice/{comment.id}").json()["status"] == crud.CommentStatus.queued
+
+
+def test_too_large_upload_creates_nothing(client, db, user_id, voice_queue, monkeypatch):
+    monkeypatch.setattr(voice_jobs, "VOICE_MAX_UPLOAD_BYTES", 1024)
+    question_id = make_questions(db, user_id, 1)[0]
+
+    response = post_voice(client, question_id, data=b"x" * 2048)
+    assert response.status_code == 413
+    assert db.query(models.Comment).filter(models.Comment.question_id == question_id).count() == 0
+    assert voice_queue._reserved == 0
+    assert os.listdir(voice_queue.spool_dir) == []
+
+
+def test_full_queue_creates_nothing(client, db, user_id, voice_queue):
+    question_id = make_questions(db, user_id, 1)[0]
+    spools = [voice_queue.reserve() for _ in range(voice_queue.max_pending)]
+    try:
+        response = post_voice(client, question_id)
+        assert response.status_code == 503
+        assert db.query(models.Comment).filter(models.Comment.question_id == question_id).count() == 0
+    finally:
+        for spool in spools:
+            voice_queue.release(spool)
+    assert voice_queue._reserved == 0
+
+
+def test_failed_insert_releases_reservation(client, db, user_id, voice_queue, monkeypatch):
+    def broken(db, question_id, on_created=None):
+        on_created(0)
+        raise RuntimeError("insert failed")
+
+    monkeypatch.setattr(crud, "create_sound_comment", broken)
+    question_id = make_questions(db, user_id, 1)[0]
+    with pytest.raises(RuntimeError):
+        post_voice(client, question_id)
+    assert voice_queue._reserved == 0
+    assert os.listdir(voice_queue.spool_dir) == []
+
+
+def test_start_recovers_spooled_jobs(client, db, user_id, voice_queue):
+    question_id = make_questions(db, user_id, 1)[0]
+    pending = crud.create_sound_comment(db, question_id=question_id)
+    finished = crud.create_sound_comment(db, question_id=question_id)
+    crud.update_sound_comment(db, comment_id=finished.id, content="https://stub-bucket/done.mp4")
+    # 이전 프로세스가 남긴 파일: 처리할 답변, 이미 끝난 답변, 답변 저장 전에 끊긴 업로드
+    for name in (f"{pending.id}.low.webm", f"{finished.id}.low.webm", "upload.tmp"):
+        with open(os.path.join(voice_queue.spool_dir, name), "wb") as file:
+            file.write(b"webm")
+
+    recovered = voice_jobs.VoiceJobQueue(workers=1, max_retries=0, spool_dir=voice_queue.spool_dir)
+    recovered._create_executor = voice_queue._create_executor
+    recovered.start()
+    try:
+        assert wait_for_job(recovered, pending.id).status == crud.CommentStatus.done
+    finally:
+        recovered.stop()
+    assert comment_status(db, pending.id) == crud.CommentStatus.done
+    assert recovered.get(finished.id) is None
+    assert os.listdir(voice_queue.spool_dir) == []
+
+
+def test_stop_cancels_retry_timers_and_keeps_spool(client, db, user_id, voice_queue, monkeypatch):
+    monkeypatch.setattr(storage, "uploader", StubUploader(fail=1))
+    question_id = make_questions(db, user_id, 1)[0]
+    comment_id = post_voice(client, question_id).json()["id"]
+
+    # 첫 업로드가 실패하면 1초 뒤 재시도 timer가 걸림
+    deadline = time.monotonic() + 5
+    while comment_id not in voice_queue._timers and time.monotonic() < deadline:
+        time.sleep(0.01)
+    timer = voice_queue._timers[comment_id]
+    voice_queue.stop()
+
+    assert timer.finished.is_set()
+    assert voice_queue._timers == {}
+    assert voice_queue.get(comment_id) is None
+    assert comment_status(db, comment_id) == crud.CommentStatus.queued
+    assert os.listdir(voice_queue.spool_dir) == [f"{comment_id}.high.webm"]
+
+
+def test_stale_retry_timer_is_ignored(voice_queue):
+    ''' stop()에서 정리된 뒤(다시 start()됐더라도) 늦게 실행된 재시도 timer는 아무것도 하지 않음 '''
+    voice_queue._run(10 ** 9)
+    assert voice_queue.get(10 ** 9) is None
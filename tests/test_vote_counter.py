@@ -0,0 +1,41 @@
+# tests/test_vote_counter.py
+# C-4 동시 투표에서 증가분이 사라지지 않는지 확인 (메모리에서 모아 반영하는 경우와 요청마다 바로 반영하는 경우)
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import crud, models, schemas, vote_counter
+
+VOTES = 2000
+CONCURRENCY = 32
+
+
+@pytest.mark.parametrize("interval", [vote_counter.VOTE_FLUSH_INTERVAL, 0], ids=["coalesced", "direct"])
+def test_parallel_votes_are_not_lost(client, db, user_id, monkeypatch, interval):
+    question_id = crud.create_vote_question(db, schemas.VoteCreate(content="vote", user_id=user_id,
+                                                                   option=["a", "b"]))
+    voted, other = [option.id for option in db.query(models.VoteOption)
+                    .filter(models.VoteOption.question_id == question_id).order_by(models.VoteOption.num)]
+
+    counter = vote_counter.VoteCounter(interval)
+    monkeypatch.setattr(vote_counter, "counter", counter)
+    counter.start()
+    try:
+        with ThreadPoolExecutor(CONCURRENCY) as pool:
+            responses = list(pool.map(lambda _: client.put(f"/api/v1/comments/vote/{voted}"), range(VOTES)))
+    finally:
+        # 스레드를 멈추고 남은 증가량까지 반영
+        counter.stop()
+    counter.flush()
+
+    assert [response.status_code for response in responses] == [200] * VOTES
+    # 응답의 count는 (반영 전 증가량을 포함해) 1 이상 VOTES 이하
+    assert all(1 <= response.json()["count"] <= VOTES for response in responses)
+    db.expire_all()
+    assert db.get(models.VoteOption, voted).count == VOTES
+    assert db.get(models.VoteOption, other).count == 0
+
+
+def test_vote_on_missing_option_is_404(client):
+    assert client.put("/api/v1/comments/vote/999999").status_code == 404
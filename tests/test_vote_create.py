@@ -0,0 +1,44 @@
+# tests/test_vote_create.py
+# B-10 투표 질문 생성: 질문과 선택지를 SQL 3번(user 확인, 질문 INSERT, 선택지 multi-row INSERT) 안에 저장하고
+# 선택지 저장이 실패하면 질문도 남지 않는지 확인
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+import crud, models, schemas
+from .support import RequestStatements
+
+OPTIONS = ["a", "b", "c", "d"]
+
+
+def test_vote_question_is_created_in_three_statements(database, client, db, user_id):
+    with RequestStatements([database.engine]) as recorder:
+        response = client.post("/api/v1/questions/vote/",
+                               json={"content": "vote", "user_id": user_id, "option": OPTIONS})
+    assert response.status_code == 201, response.text
+    assert len(recorder.statements) <= 3, recorder.statements
+
+    question_id = response.json()["question_id"]
+    options = db.query(models.VoteOption).filter(models.VoteOption.question_id == question_id) \
+        .order_by(models.VoteOption.num).all()
+    assert [(option.num, option.content, option.count) for option in options] == \
+           [(i + 1, content, 0) for i, content in enumerate(OPTIONS)]
+
+
+def test_failed_option_insert_rolls_back_question(database, db, user_id):
+    def fail_option_insert(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO VOTE_OPTION"):
+            raise OperationalError(statement, parameters, Exception("option insert failed"))
+
+    vote = schemas.VoteCreate(content="rolled back", user_id=user_id, option=OPTIONS)
+    event.listen(database.engine, "before_cursor_execute", fail_option_insert)
+    try:
+        with pytest.raises(OperationalError):
+            crud.create_vote_question(db, vote)
+    finally:
+        event.remove(database.engine, "before_cursor_execute", fail_option_insert)
+
+    assert db.query(models.Question).filter(models.Question.user_id == user_id).count() == 0
+    assert db.query(models.VoteOption).join(models.Question, models.VoteOption.question_id == models.Question.id) \
+        .filter(models.Question.user_id == user_id).count() == 0
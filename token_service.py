@@ -0,0 +1,88 @@
+# token_service.py
+# A-2, A-8 토큰 발급/리프레쉬를 같은 토큰끼리 합치고 결과를 만료 직전까지 재사용하는 파일
+
+import logging
+import os
+import time
+
+import insta
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# 만료까지 이 시간(초)보다 적게 남은 결과는 재사용하지 않음
+TOKEN_EXPIRY_MARGIN = float(os.getenv('TOKEN_EXPIRY_MARGIN', '3600'))
+# 인증 코드는 한 번만 교환할 수 있으므로 중복 요청(새로고침, 재시도)에 같은 결과를 주기 위해 잠깐 보관
+TOKEN_CODE_TTL = float(os.getenv('TOKEN_CODE_TTL', '600'))
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '10000'))
+
+
+class TokenError(Exception):
+    ''' upstream이 토큰을 주지 않은 경우, 캐시하지 않고 호출자에게 원래 응답을 돌려줌 '''
+
+    def __init__(self, response):
+        super().__init__(response)
+        self.response = response
+
+
+class TokenService:
+    ''' 같은 토큰(코드)으로 동시에 들어온 교환/리프레쉬는 upstream 호출 한 번으로 합치고
+    결과는 expires_in - TOKEN_EXPIRY_MARGIN 동안 캐시, 돌려줄 때 expires_in은 남은 시간으로 바꿈 '''
+
+    def __init__(self, expiry_margin: float = TOKEN_EXPIRY_MARGIN, code_ttl: float = TOKEN_CODE_TTL,
+                 maxsize: int = TOKEN_CACHE_SIZE):
+        self.expiry_margin = expiry_margin
+        self.refreshed = TTLCache(0, maxsize)  # long_access_token -> (expires_at, res)
+        self.long_tokens = TTLCache(0, maxsize)  # short_token -> (expires_at, res)
+        self.exchanged = TTLCache(code_ttl, maxsize)  # code -> (expires_at, res)
+
+    def _ttl(self, item) -> float:
+        return item[0] - time.time() - self.expiry_margin
+
+    @staticmethod
+    def _stamp(res) -> tuple:
+        # 토큰이 없는 응답(만료, 잘못된 토큰)은 캐시하지 않음
+        if not isinstance(res, dict) or 'access_token' not in res:
+            raise TokenError(res)
+        return time.time() + res.get('expires_in', 0), res
+
+    @staticmethod
+    def _remaining(item) -> dict:
+        expires_at, res = item
+        return {**res, 'expires_in': int(expires_at - time.time())}
+
+    def _load(self, cache: TTLCache, key, fetch, ttl=None):
+        try:
+            return self._remaining(cache.get_or_load(key, lambda: self._stamp(fetch()), ttl or self._ttl))
+        except TokenError as ex:
+            return ex.response
+
+    def refresh(self, long_access_token: str):
+        ''' insta.get_refresh_token과 같은 값을 반환(실패 시 -1) '''
+        return self._load(self.refreshed, long_access_token,
+                          lambda: insta.get_refresh_token(long_access_token=long_access_token))
+
+    def get_long_token(self, short_token: str):
+        return self._load(self.long_tokens, short_token, lambda: insta.get_long_token(short_token))
+
+    def exchange_code(self, code: str):
+        ''' 코드 -> 단기 토큰 -> 장기 토큰 '''
+        def fetch():
+            short_token = insta.get_short_token(code)
+            return insta.get_long_token(short_token)
+
+        return self._load(self.exchanged, code, fetch,
+                          lambda item: min(self.exchanged.ttl, self._ttl(item)))
+
+    def stats(self) -> dict:
+        ''' upstream 호출 수(loads)와 아낀 호출 수(캐시 hit + 합쳐진 동시 요청) '''
+        result = {}
+        for name, cache in (("refresh", self.refreshed), ("long_token", self.long_tokens),
+                            ("code", self.exchanged)):
+            stats = cache.stats()
+            result[name] = {"upstream_calls": stats["loads"], "cache_hits": stats["hits"],
+                            "coalesced": stats["coalesced"], "avoided": stats["hits"] + stats["coalesced"]}
+        return result
+
+
+service = TokenService()
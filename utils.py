@@ -1,13 +1,30 @@
-import databases
-from database import DB_URL
+import os
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException
+from sqlalchemy import text
+from database import async_engine
+
+# 관리자 API(B-11, /metrics, pool/token 통계) 호출용 토큰, 없으면 관리자 API 비활성화
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
 
 
 async def check_db_connected():
     try:
-        database = databases.Database(DB_URL)
-        if not database.is_connected:
-            await database.connect()
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
         # print("Database is connected")
     except Exception as e:
        # print("Looks like there is some problem in connection")
        raise e
+
+
+def require_admin(admin_token: Optional[str] = Header(default=None),
+                  authorization: Optional[str] = Header(default=None)):
+    ''' 관리자 API 의존성, admin-token 헤더나 Authorization: Bearer(Prometheus 스크래핑)가 ADMIN_TOKEN과 같아야 통과 '''
+    token = admin_token
+    if token is None and authorization and authorization[:7].lower() == "bearer ":
+        token = authorization[7:]
+    if not ADMIN_TOKEN or not secrets.compare_digest((token or "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="admin token is not valid")
@@ -1,18 +1,36 @@
-from pydub import AudioSegment
 import os
+import subprocess
 
-# ffmpeg_path = "/venv/bin"
-# os.environ["PATH"] += os.pathsep + ffmpeg_path
+import voice_effects
 
+# ffmpeg 실행 파일 경로
+ffmpeg_path = os.getenv('FFMPEG_PATH', 'ffmpeg')
 
-def voice_alteration(filepath: str, comment_id: int):
-    sound = AudioSegment.from_file(filepath, "webm")
-    sound.export(f"temp/{comment_id}.wav", format="wav")
-    sound = AudioSegment.from_file(f"temp/{comment_id}.wav", format=filepath[-3:])
+# 변조는 48000Hz mono 16bit PCM으로 디코딩해서 하고 결과는 44100Hz로 저장
+decode_sample_rate = 48000
+output_sample_rate = 44100
+default_preset = os.getenv('VOICE_PRESET', 'high')
 
-    octaves = 0.7
-    new_sample_rate = int(sound.frame_rate * (1.8 ** octaves))
-    hipitch_sound = sound._spawn(sound.raw_data, overrides={'frame_rate': new_sample_rate})
-    hipitch_sound = hipitch_sound.set_frame_rate(44100)
-    # export / save pitch changed sound
-    hipitch_sound.export(f"temp/{comment_id}.mp4", format="mp4")
+
+class VoiceAlterationError(Exception):
+    pass
+
+
+def run_ffmpeg(arguments: list, data: bytes) -> bytes:
+    ''' 파일 없이 stdin으로 넣고 stdout으로 받음 '''
+    result = subprocess.run([ffmpeg_path, "-hide_banner", "-loglevel", "error"] + arguments,
+                            input=data, capture_output=True)
+    if result.returncode != 0:
+        raise VoiceAlterationError(result.stderr.decode(errors="replace").strip())
+    return result.stdout
+
+
+def voice_alteration(data: bytes, preset: str = default_preset, input_format: str = "webm") -> bytes:
+    ''' 업로드된 음성(bytes)을 파일 저장 없이 변조해 mp4(bytes)로 반환 '''
+    pcm = run_ffmpeg(["-f", input_format, "-i", "pipe:0", "-vn", "-ac", "1", "-ar", str(decode_sample_rate),
+                      "-f", "s16le", "pipe:1"], data)
+    altered = voice_effects.apply_preset(pcm, preset)
+    # 파이프로 내보내려면 moov를 앞에 두는 fragmented mp4로 저장
+    return run_ffmpeg(["-f", "s16le", "-ac", "1", "-ar", str(decode_sample_rate), "-i", "pipe:0",
+                       "-ar", str(output_sample_rate), "-c:a", "aac",
+                       "-f", "mp4", "-movflags", "frag_keyframe+empty_moov", "pipe:1"], altered)
@@ -0,0 +1,103 @@
+# voice_effects.py
+# 음성 답변 목소리 변조용 DSP, raw PCM(numpy 배열)을 받아 벡터 연산으로 처리
+from __future__ import annotations
+
+from typing import Callable, Dict
+
+import numpy as np
+
+# STFT 프레임 길이와 hop (75% overlap)
+frame_size = 2048
+hop_size = frame_size // 4
+
+
+def stft(samples: np.ndarray) -> np.ndarray:
+    ''' (프레임 수, frame_size // 2 + 1) 복소 스펙트럼 '''
+    window = np.hanning(frame_size).astype(np.float32)
+    # 앞뒤를 채워서 처음과 끝 샘플도 프레임 중앙에 오도록 함
+    padded = np.pad(samples, (frame_size // 2, frame_size // 2 + hop_size))
+    n_frames = 1 + (len(padded) - frame_size) // hop_size
+    stride = padded.strides[0]
+    frames = np.lib.stride_tricks.as_strided(padded, shape=(n_frames, frame_size),
+                                             strides=(stride * hop_size, stride), writeable=False)
+    return np.fft.rfft(frames * window, axis=1).astype(np.complex64)
+
+
+def istft(spectrum: np.ndarray, length: int) -> np.ndarray:
+    ''' stft의 역변환, overlap-add 후 window 제곱합으로 정규화 '''
+    window = np.hanning(frame_size).astype(np.float32)
+    frames = np.fft.irfft(spectrum, n=frame_size, axis=1).astype(np.float32) * window
+    n_frames = len(frames)
+    output = np.zeros((n_frames + 3) * hop_size, dtype=np.float32)
+    norm = np.zeros_like(output)
+    # frame_size = 4 * hop_size 이므로 hop 단위 4조각씩 나눠 한꺼번에 더함
+    for k in range(frame_size // hop_size):
+        chunk = frames[:, k * hop_size:(k + 1) * hop_size].reshape(-1)
+        output[k * hop_size:k * hop_size + len(chunk)] += chunk
+        norm[k * hop_size:k * hop_size + len(chunk)] += np.tile(window[k * hop_size:(k + 1) * hop_size] ** 2,
+                                                                 n_frames)
+    output /= np.maximum(norm, 1e-8)
+    start = frame_size // 2
+    return output[start:start + length]
+
+
+def time_stretch(spectrum: np.ndarray, rate: float) -> np.ndarray:
+    ''' phase vocoder, rate > 1 이면 빨라지고(짧아지고) rate < 1 이면 느려짐 '''
+    n_frames, n_bins = spectrum.shape
+    steps = np.arange(0, n_frames - 1, rate)
+    index = steps.astype(np.int64)
+    alpha = (steps - index)[:, None].astype(np.float32)
+
+    magnitude = np.abs(spectrum)
+    phase = np.angle(spectrum)
+    stretched_magnitude = (1 - alpha) * magnitude[index] + alpha * magnitude[index + 1]
+
+    # 각 bin이 hop 동안 원래 진행해야 하는 위상과 실제 위상 차이로 순간 주파수를 구하고 누적
+    expected = (2 * np.pi * hop_size * np.arange(n_bins) / frame_size).astype(np.float32)
+    delta = phase[index + 1] - phase[index] - expected
+    delta -= np.float32(2 * np.pi) * np.round(delta / np.float32(2 * np.pi))
+    phase_advance = expected + delta
+    stretched_phase = phase[0] + np.cumsum(np.vstack([np.zeros((1, n_bins), np.float32), phase_advance[:-1]]), axis=0)
+    return stretched_magnitude * (np.cos(stretched_phase) + 1j * np.sin(stretched_phase)).astype(np.complex64)
+
+
+def resample(samples: np.ndarray, length: int) -> np.ndarray:
+    ''' 선형 보간으로 length 길이에 맞춤 '''
+    positions = np.linspace(0, len(samples) - 1, length)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def pitch_shift(samples: np.ndarray, semitones: float) -> np.ndarray:
+    ''' 길이(재생 시간)는 그대로 두고 음높이만 semitones 만큼 바꿈 '''
+    ratio = 2 ** (semitones / 12)
+    # 1/ratio 배로 늘린 뒤 원래 길이로 리샘플하면 음높이만 ratio 배가 됨
+    stretched = istft(time_stretch(stft(samples), 1 / ratio), int(round(len(samples) * ratio)))
+    return resample(stretched, len(samples))
+
+
+def robotize(samples: np.ndarray) -> np.ndarray:
+    ''' 위상을 모두 0으로 만들어 hop 주기의 기계음으로 바꿈 '''
+    return istft(np.abs(stft(samples)), len(samples))
+
+
+def limit(samples: np.ndarray, peak: float = 0.95) -> np.ndarray:
+    ''' 변조 후 peak를 넘으면 클리핑되지 않도록 전체 음량을 낮춤 '''
+    max_value = np.max(np.abs(samples))
+    return samples * (peak / max_value) if max_value > peak else samples
+
+
+# 익명화 프리셋, 기본값 high는 이전과 같은 1.8 ** 0.7 배(약 7 반음) 높이되 재생 시간은 유지
+presets: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "high": lambda samples: pitch_shift(samples, 12 * np.log2(1.8 ** 0.7)),
+    "low": lambda samples: pitch_shift(samples, -5),
+    "robot": lambda samples: robotize(pitch_shift(samples, -2)),
+}
+
+
+def apply_preset(pcm: bytes, preset: str) -> bytes:
+    ''' 16bit mono PCM bytes에 프리셋을 적용해 같은 형식으로 반환 '''
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768
+    if len(samples) == 0:
+        return pcm
+    altered = limit(presets[preset](samples))
+    return (np.clip(altered, -1, 1) * 32767).astype(np.int16).tobytes()
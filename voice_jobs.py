@@ -0,0 +1,345 @@
+# voice_jobs.py
+# C-6 음성 답변을 요청 밖에서 처리하는 작업 큐
+# 음성 변조는 프로세스 풀, S3 업로드는 storage.uploader 스레드 풀에서 실행
+# 업로드 원본은 끝날 때까지 spool 디렉터리에 두고, 재시작하면 남은 파일로 작업을 다시 등록
+from __future__ import annotations
+
+import fcntl
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from fastapi import HTTPException
+
+import crud, models, schemas, storage, voice_alteration, voice_effects
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# 동시에 변조할 프로세스 수, 대기+처리 중 작업 최대 수, 실패 시 재시도 횟수
+VOICE_WORKERS = int(os.getenv('VOICE_WORKERS', '2'))
+VOICE_QUEUE_SIZE = int(os.getenv('VOICE_QUEUE_SIZE', '100'))
+VOICE_MAX_RETRIES = int(os.getenv('VOICE_MAX_RETRIES', '2'))
+# 끝난 작업의 상태를 메모리에 남겨둘 개수
+VOICE_JOB_HISTORY = 10000
+# 업로드 원본을 보관할 디렉터리 (재시작해도 남아 있어야 함), 업로드 파일 최대 크기
+VOICE_SPOOL_DIR = os.getenv('VOICE_SPOOL_DIR', 'voice_spool')
+VOICE_MAX_UPLOAD_BYTES = int(os.getenv('VOICE_MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+
+# 작업 상태는 답변의 status 컬럼과 같은 값
+JobStatus = crud.CommentStatus
+
+# 답변 저장 전 업로드는 임시 이름, 저장 후에는 "{comment_id}.{preset}.webm"
+SPOOL_TEMP_SUFFIX = ".tmp"
+SPOOL_SUFFIX = ".webm"
+SPOOL_CHUNK_SIZE = 64 * 1024
+
+
+class Spool:
+    ''' 디스크에 받아둔 업로드 원본, 작업이 끝날 때까지 파일 잠금을 잡고 있어 다른 워커가 복구하지 않음 '''
+
+    def __init__(self, path: str, file):
+        self.path = path
+        self.file = file
+
+    @classmethod
+    def create(cls, directory: str) -> Spool:
+        fd, path = tempfile.mkstemp(suffix=SPOOL_TEMP_SUFFIX, dir=directory)
+        file = os.fdopen(fd, "w+b")
+        fcntl.flock(file, fcntl.LOCK_EX)
+        return cls(path, file)
+
+    @classmethod
+    def claim(cls, path: str) -> Spool | None:
+        ''' 잡고 있는 프로세스가 없는 spool 파일이면 잠가서 반환, 아니면 None '''
+        try:
+            file = open(path, "r+b")
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # 잠그는 사이에 원래 주인이 지우거나 이름을 바꿨으면 다른 파일
+            if os.stat(path).st_ino != os.fstat(file.fileno()).st_ino:
+                raise FileNotFoundError(path)
+        except (BlockingIOError, FileNotFoundError):
+            file.close()
+            return None
+        return cls(path, file)
+
+    def write(self, source, limit: int):
+        ''' source를 limit 바이트까지 복사, 넘으면 413 '''
+        size = 0
+        while chunk := source.read(SPOOL_CHUNK_SIZE):
+            size += len(chunk)
+            if size > limit:
+                raise HTTPException(status_code=413, detail="voice file is too large")
+            self.file.write(chunk)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def read(self) -> bytes:
+        self.file.seek(0)
+        return self.file.read()
+
+    def rename(self, path: str):
+        os.replace(self.path, path)
+        self.path = path
+
+    def close(self):
+        ''' 파일은 남겨두고 잠금만 풂, 다음 start()에서 다시 처리 '''
+        self.file.close()
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self.file.close()
+
+
+def parse_spool_name(name: str) -> tuple | None:
+    ''' "{comment_id}.{preset}.webm" 이면 (comment_id, preset), 아니면 None '''
+    if not name.endswith(SPOOL_SUFFIX):
+        return None
+    comment_id, _, preset = name[:-len(SPOOL_SUFFIX)].partition(".")
+    if not comment_id.isdigit() or preset not in voice_effects.presets:
+        return None
+    return int(comment_id), preset
+
+
+class VoiceJobQueue:
+    ''' 크기가 제한된 작업 큐, 변조나 업로드가 실패하면 max_retries번까지 다시 실행 '''
+
+    def __init__(self, workers: int = VOICE_WORKERS, max_pending: int = VOICE_QUEUE_SIZE,
+                 max_retries: int = VOICE_MAX_RETRIES, spool_dir: str = VOICE_SPOOL_DIR):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.spool_dir = spool_dir
+        self._executor = None
+        self._jobs = {}  # 처리 중인 작업, comment_id: schemas.VoiceJob
+        self._spools = {}  # 처리 중인 작업의 (업로드 원본 Spool, 프리셋), 끝나서 db에 저장할 때까지 보관
+        self._results = {}  # 변조가 끝난 mp4, 업로드만 실패하면 변조 없이 업로드만 재시도
+        self._finished = OrderedDict()  # 끝난 작업, 최근 VOICE_JOB_HISTORY개만 보관
+        self._timers = {}  # 재시도를 기다리는 작업의 timer, stop()에서 취소
+        self._reserved = 0  # reserve() 후 아직 submit()/release() 하지 않은 자리
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._executor is not None:
+                return
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._executor = self._create_executor()
+        self._recover()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # fork하면 부모의 스레드, 커넥션 상태가 복사되므로 spawn 사용
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def stop(self):
+        ''' 재시도 대기 중인 작업은 실행하지 않고 spool 파일로 남김, 실행 중인 변조는 끝날 때까지 기다림 '''
+        with self._lock:
+            executor, self._executor = self._executor, None
+            timers, self._timers = self._timers, {}
+        for comment_id, timer in timers.items():
+            timer.cancel()
+            self._leave(comment_id)
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def reserve(self) -> Spool:
+        ''' 업로드를 받기 전에 큐 자리를 잡고 spool 파일을 만듦, 자리가 없으면 503 '''
+        with self._lock:
+            if self._executor is None:
+                raise HTTPException(status_code=503, detail="voice queue is not running")
+            if len(self._jobs) + self._reserved >= self.max_pending:
+                raise HTTPException(status_code=503, detail="voice queue is full")
+            self._reserved += 1
+        try:
+            return Spool.create(self.spool_dir)
+        except BaseException:
+            with self._lock:
+                self._reserved -= 1
+            raise
+
+    def release(self, spool: Spool):
+        ''' 작업으로 등록하지 못한 reserve() 자리를 돌려주고 파일을 지움 '''
+        spool.remove()
+        with self._lock:
+            self._reserved -= 1
+
+    def spool_path(self, comment_id: int, preset: str) -> str:
+        return os.path.join(self.spool_dir, f"{comment_id}.{preset}{SPOOL_SUFFIX}")
+
+    def submit(self, spool: Spool, comment_id: int,
+               preset: str = voice_alteration.default_preset) -> schemas.VoiceJob:
+        ''' reserve()한 자리를 작업으로 등록, spool은 spool_path(comment_id, preset)로 옮겨져 있어야 함 '''
+        job = schemas.VoiceJob(comment_id=comment_id, status=JobStatus.queued, attempts=0)
+        with self._lock:
+            self._reserved -= 1
+            self._jobs[comment_id] = job
+            self._spools[comment_id] = (spool, preset)
+        self._run(comment_id)
+        return job
+
+    def get(self, comment_id: int) -> schemas.VoiceJob | None:
+        return self._jobs.get(comment_id) or self._finished.get(comment_id)
+
+    def _recover(self):
+        ''' 이전 프로세스가 끝내지 못한 spool 파일을 다시 작업으로 등록, 다른 워커가 잡고 있는 파일은 건너뜀 '''
+        recovered = []
+        db = SessionLocal()
+        try:
+            for name in sorted(os.listdir(self.spool_dir)):
+                if not name.endswith((SPOOL_SUFFIX, SPOOL_TEMP_SUFFIX)):
+                    continue
+                spool = Spool.claim(os.path.join(self.spool_dir, name))
+                if spool is None:
+                    continue
+                parsed = parse_spool_name(name)
+                comment = db.get(models.Comment, parsed[0]) if parsed else None
+                # 답변 저장 전에 끊긴 업로드, 삭제됐거나 이미 끝난 답변
+                if comment is None or comment.status not in (JobStatus.queued, JobStatus.processing):
+                    spool.remove()
+                    continue
+                with self._lock:
+                    self._jobs[comment.id] = schemas.VoiceJob(comment_id=comment.id, status=JobStatus.queued,
+                                                              attempts=0)
+                    self._spools[comment.id] = (spool, parsed[1])
+                recovered.append(comment.id)
+        finally:
+            db.close()
+        if recovered:
+            logger.info("recovered %d voice jobs from %s", len(recovered), self.spool_dir)
+        for comment_id in recovered:
+            self._run(comment_id)
+
+    def _run(self, comment_id: int):
+        with self._lock:
+            self._timers.pop(comment_id, None)
+            stopped = self._executor is None
+            job = self._jobs.get(comment_id)
+        # 재시도 timer가 실행되는 사이 stop()에서 이미 정리된 작업
+        if job is None:
+            return
+        if stopped:
+            self._leave(comment_id)
+            return
+
+        job.status = JobStatus.processing
+        job.attempts += 1
+        if comment_id in self._results:
+            self._upload(comment_id)
+            return
+
+        spool, preset = self._spools[comment_id]
+        future = self._submit(spool.read(), preset)
+        if future is None:
+            self._leave(comment_id)
+            return
+        future.add_done_callback(partial(self._altered, comment_id))
+
+    def _submit(self, data: bytes, preset: str):
+        ''' 변조 작업을 프로세스 풀에 넣음, stop() 이후면 None '''
+        with self._lock:
+            if self._executor is None:
+                return None
+            try:
+                return self._executor.submit(voice_alteration.voice_alteration, data, preset)
+            except BrokenProcessPool:
+                # 작업 프로세스가 비정상 종료되면 풀을 새로 만들어 계속 처리
+                logger.warning("voice process pool is broken, restarting")
+                self._executor.shutdown(wait=False)
+                self._executor = self._create_executor()
+                return self._executor.submit(voice_alteration.voice_alteration, data, preset)
+
+    def _altered(self, comment_id: int, future):
+        error = future.exception()
+        if error is not None:
+            self._retry(comment_id, error)
+            return
+        self._results[comment_id] = future.result()
+        self._upload(comment_id)
+
+    def _upload(self, comment_id: int):
+        key = f"{comment_id}.mp4"
+        future = storage.uploader.upload(key, self._results[comment_id], "video/mp4")
+        future.add_done_callback(partial(self._uploaded, comment_id, key))
+
+    def _uploaded(self, comment_id: int, key: str, future):
+        error = future.exception()
+        if error is not None:
+            self._retry(comment_id, error)
+            return
+        self._finish(self._jobs[comment_id], storage.uploader.get_url(key))
+
+    def _retry(self, comment_id: int, error: BaseException):
+        job = self._jobs[comment_id]
+        logger.warning("voice job %d failed (attempt %d): %r", comment_id, job.attempts, error)
+        job.error = repr(error)
+        if job.attempts > self.max_retries:
+            # 재시도를 다 쓰면 url 없이 failed로 남김
+            self._finish(job, None)
+            return
+
+        # 재시도 간격은 1, 2, 4 ... 초
+        job.status = JobStatus.queued
+        timer = threading.Timer(2 ** (job.attempts - 1), self._run, args=(comment_id,))
+        with self._lock:
+            stopped = self._executor is None
+            if not stopped:
+                self._timers[comment_id] = timer
+                timer.start()
+        if stopped:
+            self._leave(comment_id)
+
+    def _leave(self, comment_id: int):
+        ''' 종료 중이라 처리하지 못한 작업, failed로 남기지 않고 spool 파일을 두어 다음 start()에서 다시 처리 '''
+        with self._lock:
+            self._jobs.pop(comment_id, None)
+            self._results.pop(comment_id, None)
+            # stop()에서 취소한 timer가 이미 실행 중이었으면 _run에서 먼저 정리됨
+            entry = self._spools.pop(comment_id, None)
+        if entry is not None:
+            entry[0].close()
+
+    def _finish(self, job: schemas.VoiceJob, url: str | None):
+        ''' 결과를 답변에 저장한 뒤 spool 파일을 지움, 저장이 실패하면 파일을 남겨 다음 start()에서 다시 처리 '''
+        db = SessionLocal()
+        saved = False
+        try:
+            if url is not None:
+                # url update
+                crud.update_sound_comment(db, comment_id=job.comment_id, content=url)
+                job.url, job.error = url, None
+            else:
+                crud.fail_sound_comment(db, comment_id=job.comment_id)
+            saved = True
+        except Exception as ex:
+            logger.exception("failed to save result of voice comment %d", job.comment_id)
+            url, job.error = None, repr(ex)
+        finally:
+            db.close()
+        job.status = JobStatus.done if url is not None else JobStatus.failed
+
+        with self._lock:
+            del self._jobs[job.comment_id]
+            spool, _ = self._spools.pop(job.comment_id)
+            self._results.pop(job.comment_id, None)
+            self._finished[job.comment_id] = job
+            while len(self._finished) > VOICE_JOB_HISTORY:
+                self._finished.popitem(last=False)
+        if saved:
+            spool.remove()
+        else:
+            spool.close()
+
+
+queue = VoiceJobQueue()
@@ -0,0 +1,109 @@
+# vote_counter.py
+# C-4 투표수 증가를 메모리에서 모았다가 짧은 주기로 DB에 한 번에 반영하는 파일
+# 반영(commit) 후에는 바뀐 투표 결과를 broker로 실시간 구독자(SSE)에게 전달
+
+import logging
+import os
+import threading
+from collections import defaultdict
+
+from sqlalchemy.orm import Session
+
+import crud, schemas
+from broker import broker
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# 반영 주기(초), 0 이하이면 모으지 않고 요청마다 바로 DB에 반영
+VOTE_FLUSH_INTERVAL = float(os.getenv('VOTE_FLUSH_INTERVAL', '0.05'))
+
+
+class VoteCounter:
+    ''' vote_option_id별 증가량을 모아두었다가 interval마다 한 트랜잭션으로 반영 '''
+
+    def __init__(self, interval: float = VOTE_FLUSH_INTERVAL):
+        self.interval = interval
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="vote-counter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        ''' 종료 시 남은 증가량까지 모두 반영 '''
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def add(self, db: Session, vote_option_id: int) -> schemas.VoteOption:
+        if not self.enabled:
+            vote_option = schemas.VoteOption.from_orm(crud.update_vote_count(db, vote_option_id))
+            self.publish(db, [vote_option_id])
+            return vote_option
+
+        # 없는 선택지면 여기서 404
+        db_vote_option = crud.get_vote_option(db, vote_option_id)
+        with self._lock:
+            self._pending[vote_option_id] += 1
+            pending = self._pending[vote_option_id]
+
+        # 아직 반영되지 않은 증가량까지 더한 값으로 응답
+        vote_option = schemas.VoteOption.from_orm(db_vote_option)
+        return vote_option.copy(update={"count": vote_option.count + pending})
+
+    def flush(self) -> int:
+        with self._lock:
+            increments, self._pending = self._pending, defaultdict(int)
+        if not increments:
+            return 0
+
+        db = SessionLocal()
+        try:
+            crud.add_vote_counts(db, increments)
+            self.publish(db, increments.keys())
+        except Exception:
+            db.rollback()
+            # 실패한 증가량은 버리지 않고 다음 주기에 다시 반영
+            with self._lock:
+                for vote_option_id, n in increments.items():
+                    self._pending[vote_option_id] += n
+            logger.exception("failed to flush %d vote options", len(increments))
+            return 0
+        finally:
+            db.close()
+        return sum(increments.values())
+
+    @staticmethod
+    def publish(db: Session, vote_option_ids):
+        ''' 반영된 선택지가 속한 질문의 결과를 question:{id}, user:{id} 채널로 전달 '''
+        if not broker.active():
+            return
+        try:
+            for user_id, result in crud.get_vote_results_by_option_ids(db, vote_option_ids):
+                message = result.json()
+                broker.publish(f"question:{result.question_id}", message)
+                broker.publish(f"user:{user_id}", message)
+        except Exception:
+            # 전달 실패가 투표 반영에 영향을 주지 않도록 로그만 남김
+            logger.exception("failed to publish vote results")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+
+counter = VoteCounter()